@@ -0,0 +1,233 @@
+"""
+Benchmark suite for the LocalWriter request pipeline.
+Runs pythonpath/llm.py and pythonpath/batch.py against the mock SSE server
+from test_llm.py and prints the results as JSON, so runs from different
+releases can be diffed.
+
+Run: python bench_llm.py > bench_output.txt
+     python bench_llm.py --quick
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
+
+from llm import build_api_request, make_ssl_context, stream_response
+from batch import collect_response, run_parallel
+from async_llm import collect_async, run_async_parallel
+from test_llm import SSEHandler, start_mock_server
+
+
+def make_handler(token_count, first_token_delay=0.0):
+    """SSEHandler that waits first_token_delay seconds, then streams token_count chunks."""
+    chunk = 'data: {"choices":[{"text":"tok ","finish_reason":null}]}'
+
+    class Handler(SSEHandler):
+        chunks = [chunk] * token_count
+        captured_requests = []
+
+        def do_POST(self):
+            self.__class__.captured_requests.clear()
+            if first_token_delay:
+                time.sleep(first_token_delay)
+            super().do_POST()
+
+    return Handler
+
+
+class BenchServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connections (and adds a 1s SYN
+    # retry) once many requests are in flight
+    request_queue_size = 512
+    daemon_threads = True
+
+
+def serve(handler_class):
+    server, port = start_mock_server(handler_class, BenchServer)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "min": round(samples[0], 6),
+        "median": round(statistics.median(samples), 6),
+        "max": round(samples[-1], 6),
+    }
+
+
+def bench_build_api_request(iterations):
+    """Per-call cost of building a request, in microseconds."""
+    prompt = "The quick brown fox jumps over the lazy dog. " * 20
+    results = {}
+    for api_type in ("completions", "chat"):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            build_api_request(prompt, "http://localhost:11434", api_type=api_type,
+                              model="llama2", system_prompt="Be concise.", max_tokens=200)
+        elapsed = time.perf_counter() - started
+        results[api_type] = {"iterations": iterations,
+                             "us_per_call": round(elapsed / iterations * 1e6, 3)}
+    return results
+
+
+def bench_time_to_first_token(repeats, first_token_delay):
+    """Time from calling stream_response to the first appended chunk."""
+    server, endpoint = serve(make_handler(10, first_token_delay))
+    ssl_ctx = make_ssl_context()
+    try:
+        samples = []
+        for _ in range(repeats):
+            first = []
+            started = time.perf_counter()
+
+            def append(text):
+                if not first:
+                    first.append(time.perf_counter() - started)
+
+            stream_response(build_api_request("Hello", endpoint), "completions",
+                            ssl_ctx, append)
+            samples.append(first[0])
+        result = summarize(samples)
+        result["server_delay"] = first_token_delay
+        result["client_overhead_median"] = round(result["median"] - first_token_delay, 6)
+        return result
+    finally:
+        server.shutdown()
+
+
+def bench_streaming_throughput(token_count, repeats):
+    """Tokens per second that stream_response can parse and deliver."""
+    server, endpoint = serve(make_handler(token_count))
+    ssl_ctx = make_ssl_context()
+    try:
+        rates = []
+        for _ in range(repeats):
+            received = [0]
+
+            def append(text):
+                received[0] += 1
+
+            started = time.perf_counter()
+            stream_response(build_api_request("Hello", endpoint), "completions",
+                            ssl_ctx, append)
+            elapsed = time.perf_counter() - started
+            rates.append(received[0] / elapsed)
+        result = summarize(rates)
+        result["tokens_per_request"] = token_count
+        return result
+    finally:
+        server.shutdown()
+
+
+def bench_calc_batches(sizes, concurrencies, request_latency, tokens_per_cell):
+    """End-to-end throughput of a simulated Calc batch, in cells per second."""
+    server, endpoint = serve(make_handler(tokens_per_cell, request_latency))
+    ssl_ctx = make_ssl_context()
+    results = []
+    try:
+        for size in sizes:
+            cells = [f"cell {i}" for i in range(size)]
+            for concurrency in concurrencies:
+                filled = {}
+
+                def fetch(cell):
+                    request = build_api_request(cell, endpoint, max_tokens=tokens_per_cell)
+                    return collect_response(request, "completions", ssl_ctx)
+
+                started = time.perf_counter()
+                if concurrency > 1:
+                    run_parallel(cells, fetch, filled.__setitem__, max_workers=concurrency)
+                else:
+                    for cell in cells:
+                        filled[cell] = fetch(cell)
+                elapsed = time.perf_counter() - started
+                results.append({
+                    "cells": size,
+                    "concurrency": concurrency,
+                    "seconds": round(elapsed, 4),
+                    "cells_per_second": round(size / elapsed, 2),
+                })
+    finally:
+        server.shutdown()
+    return {"request_latency": request_latency, "tokens_per_cell": tokens_per_cell,
+            "runs": results}
+
+
+def bench_calc_batches_async(sizes, in_flight, request_latency, tokens_per_cell):
+    """The same simulated Calc batch on a single asyncio event loop thread."""
+    server, endpoint = serve(make_handler(tokens_per_cell, request_latency))
+    ssl_ctx = make_ssl_context()
+    results = []
+    try:
+        for size in sizes:
+            cells = [f"cell {i}" for i in range(size)]
+            for limit in in_flight:
+                filled = {}
+
+                async def fetch(cell):
+                    request = build_api_request(cell, endpoint, max_tokens=tokens_per_cell)
+                    return await collect_async(request, "completions", ssl_ctx)
+
+                started = time.perf_counter()
+                run_async_parallel(cells, fetch, filled.__setitem__, max_in_flight=limit)
+                elapsed = time.perf_counter() - started
+                results.append({
+                    "cells": size,
+                    "max_in_flight": limit,
+                    "seconds": round(elapsed, 4),
+                    "cells_per_second": round(size / elapsed, 2),
+                })
+    finally:
+        server.shutdown()
+    return {"request_latency": request_latency, "tokens_per_cell": tokens_per_cell,
+            "runs": results}
+
+
+def run(quick=False):
+    if quick:
+        sizes, concurrencies, in_flight = [10, 50], [1, 4], [4, 32]
+        build_iterations, repeats, token_count = 2000, 3, 500
+    else:
+        sizes, concurrencies, in_flight = [10, 100, 500], [1, 4, 16], [4, 16, 64, 256]
+        build_iterations, repeats, token_count = 20000, 10, 5000
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "quick": quick,
+        },
+        "build_api_request": bench_build_api_request(build_iterations),
+        "time_to_first_token": bench_time_to_first_token(repeats, first_token_delay=0.05),
+        "streaming_throughput": bench_streaming_throughput(token_count, repeats),
+        "calc_batch": bench_calc_batches(sizes, concurrencies, request_latency=0.02,
+                                         tokens_per_cell=20),
+        "calc_batch_async": bench_calc_batches_async(sizes, in_flight, request_latency=0.02,
+                                                     tokens_per_cell=20),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LocalWriter request pipeline.")
+    parser.add_argument("--quick", action="store_true", help="smaller runs for a fast check")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    results = json.dumps(run(quick=args.quick), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(results + "\n")
+    else:
+        print(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,9 +15,11 @@ echo "Creating package ${EXTENSION_NAME}.oxt..."
 zip -r "${EXTENSION_NAME}.oxt" \
     Accelerators.xcu \
     Addons.xcu \
+    Jobs.xcu \
     assets \
     description.xml \
     main.py \
+    warmup.py \
     pythonpath \
     META-INF \
     registration \
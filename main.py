@@ -5,35 +5,55 @@ import json
 import urllib.request
 import urllib.parse
 import ssl
-from com.sun.star.task import XJobExecutor
+from com.sun.star.task import XJobExecutor, XJob
 from com.sun.star.awt import MessageBoxButtons as MSG_BUTTONS
+from com.sun.star.awt.MessageBoxType import INFOBOX
 import uno
 import os
-import logging
 import re
+import subprocess
+import threading
+import time
 
 from com.sun.star.beans import PropertyValue
 from com.sun.star.container import XNamed
 
-from llm import (as_bool, is_openai_compatible, build_api_request,
-                 extract_content, make_ssl_context, stream_response)
-
-
-_debug_logging_enabled = False
+from llm import (as_bool, as_stop_list, is_openai_compatible, build_api_request,
+                 extract_content, make_ssl_context, retarget_request,
+                 BufferedSink, CancelToken, build_models_request, check_endpoint,
+                 describe_endpoint_status, prefix_cache_options, reserve_connections,
+                 stream_usage_options, warm_up)
+from batch import (as_int, collect_response, report_failure, run_parallel,
+                   stream_in_background)
+from config_store import get_store
+from response_cache import get_cache, stream_with_cache
+from metrics import RequestMetrics, get_recorder
+from progress import Progress, format_progress
+from chunking import chunk_paragraphs
+from tokens import get_calibration
+from balancer import get_balancer
+from retry import RetryPolicy, get_throttle
+from headless import find_documents, output_path, parse_args, split_sheet
+from jobs import (EDIT, EXTEND, JobEngine, JobSettings, RangeSink, WorkItem,
+                  cell_edit_prompt)
+from calc_data import (MAX_COLUMN, MAX_ROW, Area, DataArraySink, RangeData, area_of,
+                       clip_area, merge_areas)
+import debug_log
+
+
+_config_file_path = None
+# Text models tend to write after the edited version instead of stopping
+DEFAULT_EDIT_STOP_SEQUENCES = ["ORIGINAL VERSION:", "EDITED VERSION:", "END OF DOCUMENT"]
+# Cancel tokens of the generations currently running, stopped by "StopGeneration"
+_active_generations = set()
 
 def log_to_file(message):
-    if not _debug_logging_enabled:
-        return
-    log_dir = os.path.join(os.path.expanduser('~'), '.localwriter')
-    os.makedirs(log_dir, exist_ok=True)
-    log_file_path = os.path.join(log_dir, 'log.txt')
-    logging.basicConfig(filename=log_file_path, level=logging.INFO, format='%(asctime)s - %(message)s')
-    logging.info(message)
+    debug_log.log(message)
 
 
 # The MainJob is a UNO component derived from unohelper.Base class
-# and also the XJobExecutor, the implemented interface
-class MainJob(unohelper.Base, XJobExecutor):
+# and also the XJobExecutor, the implemented interface; XJob runs it at startup (warmup.py)
+class MainJob(unohelper.Base, XJobExecutor, XJob):
     def __init__(self, ctx):
         self.ctx = ctx
         # handling different situations (inside LibreOffice or other process)
@@ -45,70 +65,46 @@ class MainJob(unohelper.Base, XJobExecutor):
             self.sm = ctx.ServiceManager
             self.desktop = self.ctx.getServiceManager().createInstanceWithContext(
                 "com.sun.star.frame.Desktop", self.ctx)
-    
-
-    def get_config(self,key,default):
-  
-        name_file ="localwriter.json"
-        #path_settings = create_instance('com.sun.star.util.PathSettings')
-        
-        
-        path_settings = self.sm.createInstanceWithContext('com.sun.star.util.PathSettings', self.ctx)
-
-        user_config_path = getattr(path_settings, "UserConfig")
-
-        if user_config_path.startswith('file://'):
-            user_config_path = str(uno.fileUrlToSystemPath(user_config_path))
-        
-        # Ensure the path ends with the filename
-        config_file_path = os.path.join(user_config_path, name_file)
-
-        # Check if the file exists
-        if not os.path.exists(config_file_path):
-            return default
-
-        # Try to load the JSON content from the file
-        try:
-            with open(config_file_path, 'r') as file:
-                config_data = json.load(file)
-        except (IOError, json.JSONDecodeError):
-            return default
-
+        # Settings that take precedence over localwriter.json (command-line --set)
+        self.config_overrides = {}
+        self.cancel_token = CancelToken()
+        # (callback, interval) pairs told about the progress of every job
+        self.progress_listeners = []
+        # Cells, chunks or selections that ended with an error, for process_document
+        self.failed_items = 0
+
+    def get_config_store(self):
+        """Return the process-wide cache of localwriter.json."""
+        global _config_file_path
+        if _config_file_path is None:
+            name_file = "localwriter.json"
+            path_settings = self.sm.createInstanceWithContext('com.sun.star.util.PathSettings', self.ctx)
+            user_config_path = getattr(path_settings, "UserConfig")
+
+            if user_config_path.startswith('file://'):
+                user_config_path = str(uno.fileUrlToSystemPath(user_config_path))
+
+            # Ensure the path ends with the filename
+            _config_file_path = os.path.join(user_config_path, name_file)
+        return get_store(_config_file_path)
+
+    def get_config(self, key, default):
         # Return the value corresponding to the key, or the default value if the key is not found
-        return config_data.get(key, default)
+        if key in self.config_overrides:
+            return self.config_overrides[key]
+        return self.get_config_store().get(key, default)
 
     def set_config(self, key, value):
-        name_file = "localwriter.json"
-        
-        path_settings = self.sm.createInstanceWithContext('com.sun.star.util.PathSettings', self.ctx)
-        user_config_path = getattr(path_settings, "UserConfig")
-
-        if user_config_path.startswith('file://'):
-            user_config_path = str(uno.fileUrlToSystemPath(user_config_path))
-
-        # Ensure the path ends with the filename
-        config_file_path = os.path.join(user_config_path, name_file)
-
-        # Load existing configuration if the file exists
-        if os.path.exists(config_file_path):
-            try:
-                with open(config_file_path, 'r') as file:
-                    config_data = json.load(file)
-            except (IOError, json.JSONDecodeError):
-                config_data = {}
-        else:
-            config_data = {}
+        self.set_configs({key: value})
 
-        # Update the configuration with the new key-value pair
-        config_data[key] = value
-
-        # Write the updated configuration back to the file
+    def set_configs(self, values):
+        """Write several settings back with a single file write."""
+        store = self.get_config_store()
         try:
-            with open(config_file_path, 'w') as file:
-                json.dump(config_data, file, indent=4)
+            store.update(values)
         except IOError as e:
             # Handle potential IO errors (optional)
-            print(f"Error writing to {config_file_path}: {e}")
+            print(f"Error writing to {store.path}: {e}")
 
     def _as_bool(self, value):
         return as_bool(value)
@@ -118,7 +114,7 @@ class MainJob(unohelper.Base, XJobExecutor):
         compatibility_flag = self.get_config("openai_compatibility", False)
         return is_openai_compatible(endpoint, compatibility_flag)
 
-    def make_api_request(self, prompt, system_prompt="", max_tokens=70, api_type=None):
+    def make_api_request(self, prompt, system_prompt="", max_tokens=70, api_type=None, stop=None):
         endpoint = str(self.get_config("endpoint", "http://localhost:11434"))
         api_key = str(self.get_config("api_key", ""))
         if api_type is None:
@@ -126,9 +122,16 @@ class MainJob(unohelper.Base, XJobExecutor):
         model = str(self.get_config("model", ""))
         is_owui = self.get_config("is_openwebui", False)
         openai_compat = self.get_config("openai_compatibility", False)
+        options = {}
+        if self._as_bool(self.get_config("prefix_cache", True)):
+            options.update(prefix_cache_options(endpoint, openai_compat, is_owui,
+                                                self.get_config("keep_alive", "")))
+        if self._as_bool(self.get_config("stream_usage", True)):
+            # the token counts calibrate the estimator (see record_metrics)
+            options.update(stream_usage_options(endpoint, openai_compat, is_owui))
         return build_api_request(prompt, endpoint, api_key, api_type, model,
                                  is_owui, openai_compat, system_prompt, max_tokens,
-                                 log_fn=log_to_file)
+                                 log_fn=debug_log.log_fn(), stop=stop, options=options)
 
     def extract_content_from_response(self, chunk, api_type="completions"):
         return extract_content(chunk, api_type)
@@ -137,13 +140,356 @@ class MainJob(unohelper.Base, XJobExecutor):
         disable = self.get_config("disable_ssl_verification", False)
         return make_ssl_context(disable)
 
-    def stream_request(self, request, api_type, append_callback):
+    def stream_request(self, request, api_type, append_callback, stop=None, on_error=None):
+        """
+        Stream request into append_callback while the UI keeps running.
+        If on_error is given, a failed (not cancelled) request is passed to
+        it as an exception instead of only being written as "ERROR: ..." text.
+        """
         toolkit = self.ctx.getServiceManager().createInstanceWithContext(
             "com.sun.star.awt.Toolkit", self.ctx
         )
         ssl_ctx = self.get_ssl_context()
-        stream_response(request, api_type, ssl_ctx, append_callback,
-                        on_idle=toolkit.processEventsToIdle, log_fn=log_to_file)
+        metrics = self.metrics_factory()()
+        balancer = self.get_balancer()
+        retry = self.retry_policy()
+        chunks = []
+        errors = []
+
+        def stream(callback):
+            def append(chunk_text):
+                chunks.append(chunk_text)
+                callback(chunk_text)
+            return stream_in_background(request, api_type, ssl_ctx, append,
+                                        on_idle=toolkit.processEventsToIdle, log_fn=debug_log.log_fn(),
+                                        cancel=self.cancel_token, metrics=metrics, stop=stop,
+                                        balancer=balancer, retry=retry,
+                                        on_error=errors.append if on_error else None)
+
+        completed = stream_with_cache(self.get_response_cache(), request, append_callback, stream)
+        self.record_metrics(metrics, "".join(chunks))
+        if on_error is not None:
+            report_failure(completed, errors, self.cancel_token, on_error)
+
+    def metrics_factory(self):
+        """Return a function creating a RequestMetrics for each request."""
+        backend = self.BACKEND_PRESETS[self._detect_backend()][0]
+        model = str(self.get_config("model", ""))
+        return lambda: RequestMetrics(backend, model)
+
+    def record_metrics(self, metrics, text=""):
+        """
+        Calibrate the token estimator from the usage the server reported for
+        text, and append the metrics to ~/.localwriter/metrics.jsonl if enabled.
+        """
+        if metrics is None or metrics.outcome is None:
+            return  # served from the response cache
+        try:
+            if text and metrics.outcome == "ok" and metrics.completion_tokens:
+                self.get_token_calibration().observe(metrics.model, text,
+                                                     metrics.completion_tokens)
+            if self._as_bool(self.get_config("metrics_logging", False)):
+                get_recorder(self.metrics_path()).record(metrics)
+        except OSError as e:
+            log_to_file(f"Could not write metrics: {e}")
+
+    def metrics_path(self):
+        return os.path.join(os.path.expanduser('~'), '.localwriter', 'metrics.jsonl')
+
+    def job_progress(self):
+        """
+        A Progress for the next job, shown in the status bar of the current
+        window and, if metrics_logging is on, appended to the metrics file
+        every progress_log_seconds (default 10) and when the job ends.
+        """
+        progress = Progress()
+        indicator = self.status_indicator()
+        if indicator is not None:
+            progress.add_listener(self.status_bar_listener(indicator), 0.5)
+        if self._as_bool(self.get_config("metrics_logging", False)):
+            recorder = get_recorder(self.metrics_path())
+
+            def log(snapshot):
+                if snapshot["total"] < 2:
+                    return  # a single request is already in the metrics
+                try:
+                    recorder.record(snapshot)
+                except OSError as e:
+                    log_to_file(f"Could not write metrics: {e}")
+
+            progress.add_listener(log, as_int(self.get_config("progress_log_seconds", 10), 10))
+        for callback, interval in self.progress_listeners:
+            progress.add_listener(callback, interval)
+        return progress
+
+    def status_indicator(self):
+        """A status bar indicator for the current window, or None without one."""
+        try:
+            frame = self.desktop.getCurrentFrame()
+            return frame.createStatusIndicator() if frame is not None else None
+        except Exception:
+            return None
+
+    def status_bar_listener(self, indicator):
+        """Progress listener showing jobs of more than one item on indicator."""
+        shown = []
+
+        def show(snapshot):
+            try:
+                if snapshot["finished"]:
+                    if shown:
+                        indicator.end()
+                        shown.clear()
+                    return
+                if snapshot["total"] < 2:
+                    return
+                if not shown:
+                    indicator.start("LocalWriter", snapshot["total"])
+                    shown.append(True)
+                indicator.setText("LocalWriter: " + format_progress(snapshot))
+                indicator.setValue(snapshot["done"])
+            except Exception as e:
+                log_to_file(f"Could not update the status bar: {e}")
+
+        return show
+
+    def get_token_calibration(self):
+        path = os.path.join(os.path.expanduser('~'), '.localwriter', 'token_calibration.json')
+        return get_calibration(path)
+
+    def save_token_calibration(self):
+        """Save the calibration observed during a job (saves are rate-limited while it runs)."""
+        try:
+            self.get_token_calibration().save()
+        except OSError as e:
+            log_to_file(f"Could not save token calibration: {e}")
+
+    def token_estimator(self):
+        """The TokenEstimator for the configured model, used to size max_tokens."""
+        return self.get_token_calibration().estimator(str(self.get_config("model", "")))
+
+    def get_balancer(self):
+        """
+        Return the EndpointBalancer for the endpoints setting, or None when
+        only one endpoint is configured.
+        """
+        endpoints = self.get_config("endpoints", [])
+        if not isinstance(endpoints, list):
+            endpoints = [e.strip() for e in str(endpoints).split(",")]
+        endpoints = [str(e).rstrip("/") for e in endpoints if str(e).strip()]
+        if len(set(endpoints)) < 2:
+            return None
+        strategy = str(self.get_config("balance_strategy", "least_outstanding"))
+        cooldown = as_int(self.get_config("endpoint_cooldown_seconds", 30), 30)
+        return get_balancer(endpoints, strategy, cooldown)
+
+    def retry_policy(self):
+        """
+        Return the RetryPolicy for transient errors, or None if max_retries is 0.
+        All requests share one throttle, paused when the server reports a rate limit.
+        """
+        max_retries = as_int(self.get_config("max_retries", 3), 3)
+        if max_retries <= 0:
+            return None
+        max_wait = as_int(self.get_config("retry_max_wait_seconds", 120), 120)
+        return RetryPolicy(max_retries, max_wait=max_wait, throttle=get_throttle())
+
+    def get_response_cache(self):
+        """Return the on-disk response cache, or None if it is disabled."""
+        if not self._as_bool(self.get_config("response_cache", False)):
+            return None
+        cache_dir = os.path.join(os.path.expanduser('~'), '.localwriter', 'cache')
+        max_mb = as_int(self.get_config("response_cache_max_mb", 50), 50)
+        ttl_hours = as_int(self.get_config("response_cache_ttl_hours", 168), 168)
+        return get_cache(cache_dir, max_mb * 1024 * 1024, ttl_hours * 3600)
+
+    def make_text_sink(self, text_range):
+        """
+        Return a BufferedSink that appends streamed text at the end of text_range.
+        Works for Writer ranges and Calc cells; text is inserted at a cursor
+        instead of rewriting the whole range on every chunk, and discard()
+        selects back over the inserted text to remove it.
+        """
+        text = text_range.getText()
+        cursor = text.createTextCursorByRange(text_range.getEnd())
+        written = [0]  # characters inserted, counted in UTF-16 code units like the cursor
+
+        def write(chunk_text):
+            text.insertString(cursor, chunk_text, False)
+            written[0] += len(chunk_text.encode("utf-16-le")) // 2
+
+        def discard():
+            while written[0] > 0:
+                step = min(written[0], 32767)  # goLeft takes a short
+                cursor.goLeft(step, True)
+                written[0] -= step
+            cursor.setString("")
+
+        flush_ms = as_int(self.get_config("stream_flush_interval_ms", 100), 100)
+        flush_chars = as_int(self.get_config("stream_flush_chars", 200), 200)
+        return BufferedSink(write, flush_ms / 1000.0, flush_chars, discard_fn=discard)
+
+    def response_collector(self, api_type):
+        """
+        Return collect(request, stop) that runs a request to completion with the
+        configured cache, endpoints, retries and metrics, raising its error if
+        it failed; safe to call from worker threads.
+        """
+        ssl_ctx = self.get_ssl_context()
+        cache = self.get_response_cache()
+        new_metrics = self.metrics_factory()
+        balancer = self.get_balancer()
+        retry = self.retry_policy()
+
+        def collect(request, stop=None):
+            metrics = new_metrics()
+            errors = []
+            text = collect_response(request, api_type, ssl_ctx, log_fn=debug_log.log_fn(),
+                                    cancel=self.cancel_token, cache=cache, metrics=metrics,
+                                    stop=stop, balancer=balancer, retry=retry,
+                                    on_error=errors.append)
+            self.record_metrics(metrics, text)
+            if errors:
+                raise errors[0]
+            return text
+
+        return collect
+
+    def job_settings(self, instructions="", **kwargs):
+        """JobSettings from the configuration; kwargs override them."""
+        settings = dict(
+            extend_system_prompt=self.get_config("extend_selection_system_prompt", ""),
+            extend_max_tokens=self.get_config("extend_selection_max_tokens", 70),
+            edit_system_prompt=self.get_config("edit_selection_system_prompt", ""),
+            edit_max_new_tokens=self.get_config("edit_selection_max_new_tokens", 0),
+            stop=self.edit_stop_sequences(),
+            estimator=self.token_estimator())
+        settings.update(kwargs)
+        return JobSettings(instructions, **settings)
+
+    def job_engine(self, settings):
+        """JobEngine sending requests with the configured backend and API type."""
+        api_type = str(self.get_config("api_type", "completions")).lower()
+        toolkit = self.ctx.getServiceManager().createInstanceWithContext(
+            "com.sun.star.awt.Toolkit", self.ctx)
+        # Parallel workers return their keep-alive sockets to the pool at once
+        reserve_connections(settings.concurrency)
+
+        def make_request(prompt, system_prompt, max_tokens, stop):
+            return self.make_api_request(prompt, system_prompt, max_tokens,
+                                         api_type=api_type, stop=stop)
+
+        def stream(request, append, stop):
+            errors = []
+            self.stream_request(request, api_type, append, stop, on_error=errors.append)
+            if errors:
+                raise errors[0]
+
+        return JobEngine(settings, make_request, self.response_collector(api_type), stream,
+                         on_idle=toolkit.processEventsToIdle, cancel=self.cancel_token,
+                         progress=self.job_progress())
+
+    def edit_stop_sequences(self):
+        """Stop sequences that end an edited version, from edit_stop_sequences."""
+        return as_stop_list(self.get_config("edit_stop_sequences", DEFAULT_EDIT_STOP_SEQUENCES))
+
+    def selection_paragraphs(self, text_range):
+        """
+        The paragraphs of a Writer selection, walked once with its paragraph
+        enumeration, as runs of (text, cursor) pairs. Each cursor spans the
+        part of its paragraph inside the selection and text is that part's
+        getString, so a chunk's text always matches the range it is written
+        to. A table ends a run, so chunks never span one. Cursors follow edits
+        made elsewhere in the text, so chunks can be rewritten in any order.
+        """
+        text = text_range.getText()
+        runs = [[]]
+        enumeration = text_range.createEnumeration()
+        while enumeration.hasMoreElements():
+            paragraph = enumeration.nextElement()
+            if paragraph.supportsService("com.sun.star.text.TextTable"):
+                runs.append([])
+                continue
+            # The selection may start or end in the middle of a paragraph
+            start = text_range if text.compareRegionStarts(paragraph, text_range) > 0 else paragraph
+            end = text_range if text.compareRegionEnds(paragraph, text_range) < 0 else paragraph
+            cursor = text.createTextCursorByRange(start.getStart())
+            cursor.gotoRange(end.getEnd(), True)
+            runs[-1].append((cursor.getString(), cursor))
+        return [run for run in runs if run]
+
+    def chunk_items(self, text_range, chunk_tokens):
+        """
+        Edit work items for the paragraph-aligned chunks of at most chunk_tokens
+        of a Writer selection, each targeting a cursor over its paragraphs.
+        """
+        text = text_range.getText()
+        count = self.token_estimator().count
+        items = []
+        for run in self.selection_paragraphs(text_range):
+            texts = [paragraph_text for paragraph_text, _ in run]
+            for first, last in chunk_paragraphs(texts, chunk_tokens, count):
+                cursor = text.createTextCursorByRange(run[first][1].getStart())
+                cursor.gotoRange(run[last][1].getEnd(), True)
+                items.append(WorkItem(cursor, "\n".join(texts[first:last + 1]), EDIT))
+        return items
+
+    def check_backend(self, endpoint=None, api_key=None, is_openwebui=None, timeout=5.0):
+        """Probe the endpoint (the configured one by default); returns an EndpointStatus."""
+        if endpoint is None:
+            endpoint = self.get_config("endpoint", "http://localhost:11434")
+        if api_key is None:
+            api_key = self.get_config("api_key", "")
+        if is_openwebui is None:
+            is_openwebui = self.get_config("is_openwebui", False)
+        request = build_models_request(str(endpoint), str(api_key), is_openwebui)
+        return check_endpoint(request, self.get_ssl_context(), timeout)
+
+    def warm_up_backend(self):
+        """
+        Check each endpoint requests go to (all of the endpoints setting when
+        several are configured), then send each a one-token request so the
+        model is loaded before real work. Returns a report for the user.
+        """
+        balancer = self.get_balancer()
+        endpoints = (balancer.endpoints if balancer is not None
+                     else [str(self.get_config("endpoint", "http://localhost:11434"))])
+        api_type = str(self.get_config("api_type", "completions")).lower()
+        request = self.make_api_request("Hello", "", 1, api_type=api_type)
+        reports = {}
+        # The hosts load the model at the same time
+        run_parallel(endpoints, lambda endpoint: self.warm_up_endpoint(endpoint, request, api_type),
+                     reports.__setitem__, max_workers=len(endpoints),
+                     on_error=lambda endpoint, error: reports.__setitem__(
+                         endpoint, f"Warm-up failed: {error}"))
+        if len(endpoints) == 1:
+            return reports.get(endpoints[0], "")
+        return "\n\n".join(f"{endpoint}:\n{reports.get(endpoint, '')}" for endpoint in endpoints)
+
+    def warm_up_endpoint(self, endpoint, request, api_type):
+        """Warm up one endpoint with request (retargeted to it); returns its report."""
+        status = self.check_backend(endpoint)
+        report = describe_endpoint_status(status, str(self.get_config("model", "")))
+        if not status.reachable:
+            return report
+        completed, elapsed_ms = warm_up(retarget_request(request, endpoint), api_type,
+                                        self.get_ssl_context(), log_fn=debug_log.log_fn(),
+                                        cancel=self.cancel_token)
+        if completed:
+            return report + f"\nModel ready: test generation took {elapsed_ms:.0f} ms"
+        return report + "\nThe test generation failed; check the model name and API type"
+
+    def show_message(self, title, message):
+        toolkit = self.sm.createInstanceWithContext("com.sun.star.awt.Toolkit", self.ctx)
+        frame = self.desktop.getCurrentFrame()
+        window = frame.getContainerWindow() if frame else None
+        box = toolkit.createMessageBox(window, INFOBOX, MSG_BUTTONS.BUTTONS_OK, title, message)
+        box.execute()
+        box.dispose()
+
+    def configure_debug_log(self):
+        debug_log.configure(self._as_bool(self.get_config("debug_logging", False)),
+                            os.path.join(os.path.expanduser('~'), '.localwriter', 'log.txt'))
 
     #retrieved from https://wiki.documentfoundation.org/Macros/General/IO_to_Screen
     #License: Creative Commons Attribution-ShareAlike 3.0 Unported License,
@@ -259,7 +605,8 @@ class MainJob(unohelper.Base, XJobExecutor):
         for name in ["disable_ssl_verification", "debug_logging"]:
             result[name] = controls[name].getModel().State == 1
         # Numeric fields
-        for name in ["extend_selection_max_tokens", "edit_selection_max_new_tokens"]:
+        for name in ["extend_selection_max_tokens", "edit_selection_max_new_tokens",
+                     "calc_concurrency"]:
             text = controls[name].getModel().Text
             result[name] = int(text) if text.isdigit() else 0
         return result
@@ -343,10 +690,10 @@ class MainJob(unohelper.Base, XJobExecutor):
 
         # --- Checkboxes ---
         disable_ssl = self._as_bool(self.get_config("disable_ssl_verification", False))
-        debug_log = self._as_bool(self.get_config("debug_logging", False))
+        debug_logging = self._as_bool(self.get_config("debug_logging", False))
         checkbox_fields = [
             ("disable_ssl_verification", "Disable SSL verification (exposes API keys to interception)", disable_ssl),
-            ("debug_logging", "Enable debug logging to ~~/.localwriter/log.txt", debug_log),
+            ("debug_logging", "Enable debug logging to ~~/.localwriter/log.txt", debug_logging),
         ]
         for name, label, checked in checkbox_fields:
             controls[name] = add(f"cb_{name}", "CheckBox", HORI_MARGIN, y,
@@ -360,6 +707,8 @@ class MainJob(unohelper.Base, XJobExecutor):
              str(self.get_config("extend_selection_max_tokens", "70"))),
             ("edit_selection_max_new_tokens", "Edit Selection Max New Tokens:",
              str(self.get_config("edit_selection_max_new_tokens", "0"))),
+            ("calc_concurrency", "Calc Parallel Requests:",
+             str(self.get_config("calc_concurrency", "1"))),
         ]
         for name, label, value in int_fields:
             add(f"label_{name}", "FixedText", HORI_MARGIN, y, label_width, LABEL_HEIGHT,
@@ -384,6 +733,14 @@ class MainJob(unohelper.Base, XJobExecutor):
                 edit_width, EDIT_HEIGHT, {"Text": value})
             y += EDIT_HEIGHT + VERT_SEP
 
+        # --- Connection test ---
+        add("btn_test", "Button", HORI_MARGIN, y, BUTTON_WIDTH, BUTTON_HEIGHT,
+            {"Label": "Test Connection"})
+        status_ctrl = add("label_status", "FixedText", HORI_MARGIN + BUTTON_WIDTH + HORI_SEP, y,
+            edit_width - BUTTON_WIDTH - HORI_SEP, LABEL_HEIGHT,
+            {"Label": "", "NoLabel": True, "MultiLine": True})
+        y += LABEL_HEIGHT + VERT_SEP
+
         # --- JSON preview ---
         add("btn_refresh", "Button", HORI_MARGIN, y, BUTTON_WIDTH, BUTTON_HEIGHT,
             {"Label": "Refresh"})
@@ -450,6 +807,38 @@ class MainJob(unohelper.Base, XJobExecutor):
 
         dialog.getControl("btn_refresh").addActionListener(RefreshListener())
 
+        # --- Test button listener: probe the endpoint as currently entered ---
+        class TestListener(unohelper.Base, XActionListener):
+            def __init__(self):
+                self.testing = False
+
+            def actionPerformed(self, event):
+                if self.testing:
+                    return
+                self.testing = True
+                try:
+                    config = settings_box_self._read_dialog_config(controls)
+                    status_ctrl.getModel().Label = "Testing..."
+                    # Probe on a worker thread so the dialog keeps repainting
+                    toolkit = settings_box_self.sm.createInstanceWithContext(
+                        "com.sun.star.awt.Toolkit", settings_box_self.ctx)
+                    reports = []
+                    run_parallel([config],
+                                 lambda c: settings_box_self.check_backend(
+                                     c["endpoint"], c["api_key"], c["is_openwebui"], timeout=3.0),
+                                 lambda c, status: reports.append(
+                                     describe_endpoint_status(status, c["model"])),
+                                 on_error=lambda c, error: reports.append(f"Test failed: {error}"),
+                                 on_idle=toolkit.processEventsToIdle)
+                    status_ctrl.getModel().Label = reports[0] if reports else ""
+                finally:
+                    self.testing = False
+
+            def disposing(self, source):
+                pass
+
+        dialog.getControl("btn_test").addActionListener(TestListener())
+
         controls["endpoint"].setFocus()
 
         # --- Execute and collect results ---
@@ -463,6 +852,7 @@ class MainJob(unohelper.Base, XJobExecutor):
     #end sharealike section
 
     def _save_settings(self, result):
+        values = {}
         for key, value in result.items():
             if key == "endpoint" and not str(value).startswith("http"):
                 continue
@@ -470,70 +860,261 @@ class MainJob(unohelper.Base, XJobExecutor):
                 value = str(value).strip().lower()
                 if value not in ("chat", "completions"):
                     value = "completions"
-            self.set_config(key, value)
+            values[key] = value
+        if values:
+            self.set_configs(values)
 
     def trigger(self, args):
-        global _debug_logging_enabled
-        _debug_logging_enabled = self._as_bool(self.get_config("debug_logging", False))
+        if args == "StopGeneration":
+            for token in list(_active_generations):
+                token.cancel()
+            return
+
+        # Generation runs in the background while the UI keeps processing
+        # events, so "StopGeneration" can arrive while this call is running
+        self.cancel_token = CancelToken()
+        _active_generations.add(self.cancel_token)
+        try:
+            self.run_command(args)
+        finally:
+            _active_generations.discard(self.cancel_token)
+            self.save_token_calibration()
+
+    def extend_text_range(self, text_range):
+        """Extend Selection on a Writer range: stream the continuation after it."""
+        try:
+            # A long selection is continued from its last paragraphs only
+            settings = self.job_settings(
+                context_tokens=self.get_config("writer_chunk_tokens", 2000))
+            item = WorkItem(text_range, text_range.getString(), EXTEND)
+            self.failed_items += self.job_engine(settings).run([item],
+                                                               RangeSink(self.make_text_sink))
+        except Exception as e:
+            self.failed_items += 1
+            # Append the user input to the selected text
+            text_range.setString(text_range.getString() + ": " + str(e))
+
+    def edit_text_range(self, text_range, user_input):
+        """
+        Edit Selection on a Writer range: replace it with the edited text.
+        Long selections are edited in paragraph-aligned chunks, each written
+        over the paragraphs it came from.
+        """
+        try:
+            original = text_range.getString()
+            chunk_tokens = as_int(self.get_config("writer_chunk_tokens", 2000), 2000)
+            items = []
+            if chunk_tokens > 0 and self.token_estimator().count(original) > chunk_tokens:
+                items = self.chunk_items(text_range, chunk_tokens)
+            if len(items) > 1:
+                concurrency = self.get_config("writer_chunk_concurrency", 1)
+            else:
+                items = [WorkItem(text_range, original, EDIT)]
+                concurrency = 1
+            settings = self.job_settings(user_input, concurrency=concurrency)
+            self.failed_items += self.job_engine(settings).run(
+                items, RangeSink(self.make_text_sink, strip_newlines=True))
+        except Exception as e:
+            self.failed_items += 1
+            # Append the user input to the selected text
+            text_range.setString(text_range.getString() + ": " + str(e))
+
+    def process_ranges(self, cell_ranges, args, user_input=""):
+        """
+        Extend or edit (args is "ExtendSelection" or "EditSelection") the text
+        of the non-empty cells in Calc cell ranges; returns the number of cells sent.
+        Each range is read with one getDataArray call and the results are
+        written back in blocks with setDataArray. Selections of at most
+        calc_live_preview_cells cells are streamed into each cell instead.
+        """
+        settings = self.job_settings(
+            user_input, edit_template=cell_edit_prompt,
+            concurrency=self.get_config("calc_concurrency", 1),
+            pack_size=self.get_config("calc_pack_size", 1))
+        block_rows = as_int(self.get_config("calc_write_block_rows", 200), 200)
+        cells = []
+        seen = set()  # (sheet, row, column) of the cells taken; selected ranges may overlap
+        for cell_range in cell_ranges:
+            data = RangeData(cell_range, block_rows)
+            origin = cell_range.getRangeAddress()
+            for row, col, text in data.cells():
+                position = (origin.Sheet, origin.StartRow + row, origin.StartColumn + col)
+                if text and position not in seen:
+                    seen.add(position)
+                    cells.append((data, row, col, text))
+        preview = len(cells) <= as_int(self.get_config("calc_live_preview_cells", 100), 100)
+
+        items = [WorkItem(data.cell_range.getCellByPosition(col, row) if preview
+                          else (data, row, col), text, args)
+                 for data, row, col, text in cells]
+        sink = RangeSink(self.make_text_sink) if preview else DataArraySink()
+        self.failed_items += self.job_engine(settings).run(items, sink)
+        return len(items)
+
+    def selected_areas(self, selection):
+        """(sheet index, Area) of each range of a Calc selection."""
+        if hasattr(selection, "getRangeAddresses"):  # SheetCellRanges
+            addresses = selection.getRangeAddresses()
+        elif hasattr(selection, "getRangeAddress"):
+            addresses = [selection.getRangeAddress()]
+        else:  # a shape or chart
+            return []
+        return [(address.Sheet, area_of(address)) for address in addresses]
+
+    def content_ranges(self, sheet, areas):
+        """
+        Cell ranges covering the non-empty cells of the given Areas of sheet:
+        each one is clipped to the used area and narrowed with
+        queryContentCells, so whole columns cost as much as their content.
+        """
+        from com.sun.star.sheet.CellFlags import VALUE, DATETIME, STRING, FORMULA
+        cursor = sheet.createCursor()
+        cursor.gotoEndOfUsedArea(False)
+        end = cursor.getRangeAddress()
+        used = Area(0, 0, end.EndColumn, end.EndRow)
+        blocks = []
+        for area in areas:
+            area = clip_area(area, used)
+            if area is None:
+                continue
+            cell_range = sheet.getCellRangeByPosition(*area)
+            content = cell_range.queryContentCells(VALUE | DATETIME | STRING | FORMULA)
+            blocks.extend(area_of(a) for a in content.getRangeAddresses())
+        return [sheet.getCellRangeByPosition(*area) for area in merge_areas(blocks)]
+
+    def writer_ranges(self, document, spans):
+        """
+        Text ranges of a Writer document for (first, last) paragraph spans,
+        or the whole text if spans is empty. Tables are not counted as paragraphs.
+        """
+        text = document.Text
+        if not spans:
+            cursor = text.createTextCursor()
+            cursor.gotoStart(False)
+            cursor.gotoEnd(True)
+            return [cursor]
+        paragraphs = []
+        enumeration = text.createEnumeration()
+        while enumeration.hasMoreElements():
+            element = enumeration.nextElement()
+            if element.supportsService("com.sun.star.text.Paragraph"):
+                paragraphs.append(element)
+        ranges = []
+        for first, last in spans:
+            if first >= len(paragraphs):
+                continue
+            last = min(last, len(paragraphs) - 1)
+            cursor = text.createTextCursorByRange(paragraphs[first].getStart())
+            cursor.gotoRange(paragraphs[last].getEnd(), True)
+            ranges.append(cursor)
+        return ranges
+
+    def calc_ranges(self, document, ranges, column_spans):
+        """
+        Cell ranges holding the non-empty cells of a Calc document for range
+        names ("A1:C20", "Sheet2.A1:C20") and (first, last) column spans; the
+        used area of the first sheet if neither is given.
+        """
+        sheets = document.Sheets
+        first_sheet = sheets.getByIndex(0)
+        if not ranges and not column_spans:
+            column_spans = [(0, MAX_COLUMN)]
+        cell_ranges = []
+        for name in ranges:
+            sheet_name, cell_range = split_sheet(name)
+            sheet = sheets.getByName(sheet_name) if sheet_name else first_sheet
+            area = area_of(sheet.getCellRangeByName(cell_range).getRangeAddress())
+            cell_ranges.extend(self.content_ranges(sheet, [area]))
+        cell_ranges.extend(self.content_ranges(
+            first_sheet, [Area(first, 0, last, MAX_ROW) for first, last in column_spans]))
+        return cell_ranges
+
+    def process_document(self, path, options):
+        """
+        Open path hidden, apply options.command to the targets in options
+        (see headless.parse_args) and save it. Returns the number of targets.
+        A document in which any target failed is not saved; IOError is raised.
+        """
+        url = uno.systemPathToFileUrl(os.path.abspath(path))
+        hidden = PropertyValue()
+        hidden.Name = "Hidden"
+        hidden.Value = True
+        document = self.desktop.loadComponentFromURL(url, "_blank", 0, (hidden,))
+        if document is None:
+            raise IOError(f"could not open {path}")
+        self.failed_items = 0
+        try:
+            if hasattr(document, "Sheets"):
+                cell_ranges = self.calc_ranges(document, options.ranges, options.column_spans)
+                count = self.process_ranges(cell_ranges, options.command, options.instructions)
+            elif hasattr(document, "Text"):
+                ranges = self.writer_ranges(document, options.paragraph_spans)
+                for text_range in ranges:
+                    if self.cancel_token.cancelled:
+                        break
+                    if options.command == "ExtendSelection":
+                        self.extend_text_range(text_range)
+                    else:
+                        self.edit_text_range(text_range, options.instructions)
+                count = len(ranges)
+            else:
+                raise ValueError(f"{path} is neither a text document nor a spreadsheet")
+            if self.cancel_token.cancelled:
+                return count
+            if self.failed_items:
+                raise IOError(f"{self.failed_items} item(s) failed; the document was not saved")
+            target = output_path(path, options.output_dir)
+            if target == path:
+                document.store()
+            else:
+                document.storeToURL(uno.systemPathToFileUrl(os.path.abspath(target)), ())
+            return count
+        finally:
+            document.close(True)
+            self.save_token_calibration()
+
+    def execute(self, args):
+        """XJob entry point, run by the startup job in warmup.py."""
+        if not self._as_bool(self.get_config("warm_up_on_start", False)):
+            return
+        self.configure_debug_log()
+        threading.Thread(target=self.warm_up_backend, name="localwriter-warm-up",
+                         daemon=True).start()
+
+    def run_command(self, args):
+        self.configure_debug_log()
+
+        if args == "WarmUp":
+            # Run on a worker thread so the UI stays responsive while the model loads
+            toolkit = self.sm.createInstanceWithContext("com.sun.star.awt.Toolkit", self.ctx)
+            reports = []
+            run_parallel([args], lambda _: self.warm_up_backend(),
+                         lambda _, report: reports.append(report),
+                         on_error=lambda _, error: reports.append(f"Warm-up failed: {error}"),
+                         on_idle=toolkit.processEventsToIdle, cancel=self.cancel_token)
+            if reports:
+                self.show_message("Warm Up Model", reports[0])
+            return
 
         desktop = self.ctx.ServiceManager.createInstanceWithContext(
             "com.sun.star.frame.Desktop", self.ctx)
         model = desktop.getCurrentComponent()
 
         if hasattr(model, "Text"):
-            text = model.Text
             selection = model.CurrentController.getSelection()
             text_range = selection.getByIndex(0)
 
-            
             if args == "ExtendSelection":
-                # Access the current selection
-                if len(text_range.getString()) > 0:
-                    try:
-                        # Prepare request using the new unified method
-                        system_prompt = self.get_config("extend_selection_system_prompt", "")
-                        prompt = text_range.getString()
-                        max_tokens = self.get_config("extend_selection_max_tokens", 70)
-                        
-                        api_type = str(self.get_config("api_type", "completions")).lower()
-                        request = self.make_api_request(prompt, system_prompt, max_tokens, api_type=api_type)
-
-                        def append_text(chunk_text):
-                            text_range.setString(text_range.getString() + chunk_text)
-
-                        self.stream_request(request, api_type, append_text)
-                                      
-                    except Exception as e:
-                        text_range = selection.getByIndex(0)
-                        # Append the user input to the selected text
-                        text_range.setString(text_range.getString() + ": " + str(e))
+                self.extend_text_range(text_range)
 
             elif args == "EditSelection":
-                # Access the current selection
                 try:
                     user_input = self.input_box("Please enter edit instructions!", "Input", "")
-                    
-                    # Prepare the prompt for editing
-                    prompt = "ORIGINAL VERSION:\n" + text_range.getString() + "\n Below is an edited version according to the following instructions. There are no comments in the edited version. The edited version is followed by the end of the document. The original version will be edited as follows to create the edited version:\n" + user_input + "\nEDITED VERSION:\n"
-                    
-                    system_prompt = self.get_config("edit_selection_system_prompt", "")
-                    max_tokens = len(text_range.getString()) + self.get_config("edit_selection_max_new_tokens", 0)
-                    
-                    api_type = str(self.get_config("api_type", "completions")).lower()
-                    request = self.make_api_request(prompt, system_prompt, max_tokens, api_type=api_type)
-                    
-                    text_range.setString("")
-
-                    def append_text(chunk_text):
-                        text_range.setString(text_range.getString() + chunk_text)
-
-                    self.stream_request(request, api_type, append_text)
-
                 except Exception as e:
-                    text_range = selection.getByIndex(0)
-                    # Append the user input to the selected text
                     text_range.setString(text_range.getString() + ": " + str(e))
-            
+                    return
+                self.edit_text_range(text_range, user_input)
+
             elif args == "settings":
                 try:
                     result = self.settings_box("Settings")
@@ -543,7 +1124,6 @@ class MainJob(unohelper.Base, XJobExecutor):
                     text_range.setString(text_range.getString() + ":error: " + str(e))
         elif hasattr(model, "Sheets"):
             try:
-                sheet = model.CurrentController.ActiveSheet
                 selection = model.CurrentController.Selection
 
                 if args == "settings":
@@ -558,64 +1138,92 @@ class MainJob(unohelper.Base, XJobExecutor):
                 if args == "EditSelection":
                     user_input = self.input_box("Please enter edit instructions!", "Input", "")
 
-                area = selection.getRangeAddress()
-                start_row = area.StartRow
-                end_row = area.EndRow
-                start_col = area.StartColumn
-                end_col = area.EndColumn
-
-                col_range = range(start_col, end_col + 1)
-                row_range = range(start_row, end_row + 1)
+                cell_ranges = []
+                for index, area in self.selected_areas(selection):
+                    cell_ranges.extend(self.content_ranges(model.Sheets.getByIndex(index),
+                                                           [area]))
+                self.process_ranges(cell_ranges, args, user_input)
+            except Exception:
+                pass
+def connect_office(soffice="soffice", connection=""):
+    """
+    Component context of a running office (connection as for soffice --accept,
+    e.g. "socket,host=localhost,port=2002"), or of a headless soffice started
+    for this process. Returns (ctx, process); process is None if we connected.
+    """
+    process = None
+    if not connection:
+        connection = f"pipe,name=localwriter_{os.getpid()}"
+        process = subprocess.Popen([soffice, "--headless", "--invisible", "--nologo",
+                                    "--nodefault", "--norestore", "--nolockcheck",
+                                    f"--accept={connection};urp;"])
+    local_ctx = uno.getComponentContext()
+    resolver = local_ctx.ServiceManager.createInstanceWithContext(
+        "com.sun.star.bridge.UnoUrlResolver", local_ctx)
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            return resolver.resolve(f"uno:{connection};urp;StarOffice.ComponentContext"), process
+        except Exception:
+            if time.monotonic() > deadline or (process is not None and process.poll() is not None):
+                raise
+            time.sleep(0.5)
+
+
+def run_headless(argv):
+    """Process documents from the command line; returns the exit status."""
+    options = parse_args(argv)
+    documents = find_documents(options.paths, options.recursive)
+    if not documents:
+        print("No .odt or .ods documents found.")
+        return 1
+    if options.output_dir:
+        os.makedirs(options.output_dir, exist_ok=True)
+    try:
+        ctx, process = connect_office(options.soffice, options.connect)
+    except Exception as e:
+        print(f"ERROR: Could not connect to an office: {e}")
+        return 1
+    job = MainJob(ctx)
+    job.config_overrides.update(options.config)
+    job.configure_debug_log()
+    failed = 0
+    try:
+        for path in documents:
+            def report(snapshot, path=path):
+                if snapshot["total"] > 1 and not snapshot["finished"]:
+                    print(f"{path}: {format_progress(snapshot)}", flush=True)
 
-                api_type = str(self.get_config("api_type", "completions")).lower()
-                extend_system_prompt = self.get_config("extend_selection_system_prompt", "")
-                extend_max_tokens = self.get_config("extend_selection_max_tokens", 70)
-                edit_system_prompt = self.get_config("edit_selection_system_prompt", "")
-                edit_max_new_tokens = self.get_config("edit_selection_max_new_tokens", 0)
-                try:
-                    edit_max_new_tokens = int(edit_max_new_tokens)
-                except (TypeError, ValueError):
-                    edit_max_new_tokens = 0
-
-                for row in row_range:
-                    for col in col_range:
-                        cell = sheet.getCellByPosition(col, row)
-
-                        if args == "ExtendSelection":
-                            cell_text = cell.getString()
-                            if not cell_text:
-                                continue
-                            try:
-                                request = self.make_api_request(cell_text, extend_system_prompt, extend_max_tokens, api_type=api_type)
-
-                                def append_cell_text(chunk_text, target_cell=cell):
-                                    target_cell.setString(target_cell.getString() + chunk_text)
-
-                                self.stream_request(request, api_type, append_cell_text)
-                            except Exception as e:
-                                cell.setString(cell.getString() + ": " + str(e))
-                        elif args == "EditSelection":
-                            try:
-                                prompt =  "ORIGINAL VERSION:\n" + cell.getString() + "\n Below is an edited version according to the following instructions. Don't waste time thinking, be as fast as you can. The edited text will be a shorter or longer version of the original text based on the instructions. There are no comments in the edited version. The edited version is followed by the end of the document. The original version will be edited as follows to create the edited version:\n" + user_input + "\nEDITED VERSION:\n"
-
-                                max_tokens = len(cell.getString()) + edit_max_new_tokens
-                                request = self.make_api_request(prompt, edit_system_prompt, max_tokens, api_type=api_type)
-
-                                cell.setString("")
-
-                                def append_edit_text(chunk_text, target_cell=cell):
-                                    target_cell.setString(target_cell.getString() + chunk_text)
-
-                                self.stream_request(request, api_type, append_edit_text)
-                            except Exception as e:
-                                cell.setString(cell.getString() + ": " + str(e))
+            job.progress_listeners = [(report, 5.0)]
+            try:
+                count = job.process_document(path, options)
+                print(f"{path}: {count} target(s) processed")
+            except Exception as e:
+                failed += 1
+                print(f"{path}: ERROR: {e}")
+    except KeyboardInterrupt:
+        job.cancel_token.cancel()
+        print("Interrupted.")
+        failed += 1
+    finally:
+        if process is not None:
+            try:
+                job.desktop.terminate()
             except Exception:
                 pass
+            process.wait()
+    return 1 if failed else 0
+
+
 # Starting from Python IDE
-def main():
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
     try:
         ctx = XSCRIPTCONTEXT
     except NameError:
+        if argv:
+            sys.exit(run_headless(argv))
         ctx = officehelper.bootstrap()
         if ctx is None:
             print("ERROR: Could not bootstrap default Office.")
@@ -0,0 +1,303 @@
+"""
+Asyncio streaming client for LocalWriter — no UNO dependencies.
+The same requests and SSE parsing as llm.stream_response, but on asyncio
+streams, so many generations can share one event loop thread instead of
+using one OS thread each.
+"""
+
+import asyncio
+import http.client
+import io
+import json
+import queue
+import ssl
+import threading
+import time
+import urllib.error
+
+from llm import SSEDecoder, StopMatcher, extract_content
+
+
+async def _read_head(reader):
+    """Read the status line and headers. Returns (status, reason, headers)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise http.client.RemoteDisconnected("Remote end closed connection without response")
+    parts = status_line.decode("iso-8859-1").rstrip("\r\n").split(" ", 2)
+    try:
+        status = int(parts[1])
+    except (IndexError, ValueError):
+        raise http.client.BadStatusLine(status_line.decode("iso-8859-1"))
+    reason = parts[2] if len(parts) > 2 else ""
+    lines = []
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        lines.append(line)
+    headers = http.client.parse_headers(io.BytesIO(b"".join(lines) + b"\r\n"))
+    return status, reason, headers
+
+
+async def _read_body(reader, headers):
+    """Yield the response body in blocks, undoing chunked transfer encoding."""
+    if headers.get("Transfer-Encoding", "").lower() == "chunked":
+        while True:
+            size_line = await reader.readline()
+            if not size_line:
+                raise http.client.IncompleteRead(b"")
+            size = int(size_line.split(b";", 1)[0].strip(), 16)
+            if size == 0:
+                # Skip trailers up to the final blank line
+                while (await reader.readline()).strip():
+                    pass
+                return
+            yield await reader.readexactly(size)
+            await reader.readline()
+    elif headers.get("Content-Length") is not None:
+        remaining = int(headers["Content-Length"])
+        while remaining > 0:
+            block = await reader.read(min(remaining, 65536))
+            if not block:
+                raise http.client.IncompleteRead(b"", remaining)
+            remaining -= len(block)
+            yield block
+    else:
+        while True:
+            block = await reader.read(65536)
+            if not block:
+                return
+            yield block
+
+
+async def _open(request, ssl_context, metrics):
+    """
+    Connect, send request and read the response head. Returns (reader, writer,
+    headers). https uses ssl_context, or the default verifying context if
+    it is None; the connection is closed if anything fails.
+    """
+    scheme = request.type
+    host = request.host
+    port = 443 if scheme == "https" else 80
+    hostname = host
+    if host.rfind(":") > host.rfind("]"):
+        hostname, port = host.rsplit(":", 1)
+        port = int(port)
+    hostname = hostname.strip("[]")
+
+    started = time.perf_counter()
+    if scheme == "https":
+        reader, writer = await asyncio.open_connection(
+            hostname, port, ssl=ssl_context or ssl.create_default_context(),
+            server_hostname=hostname)
+    else:
+        reader, writer = await asyncio.open_connection(hostname, port)
+    if metrics is not None:
+        metrics.connect_ms = (time.perf_counter() - started) * 1000.0
+    try:
+        return await _send(request, host, reader, writer, metrics)
+    except BaseException:
+        writer.close()
+        raise
+
+
+async def _send(request, host, reader, writer, metrics):
+    """Send request on an open connection and read the response head."""
+    headers = dict(request.header_items())
+    headers.setdefault("User-agent", "localwriter")
+    headers["Host"] = host
+    headers["Connection"] = "close"
+    body = request.data or b""
+    headers["Content-Length"] = str(len(body))
+    head = f"{request.get_method()} {request.selector} HTTP/1.1\r\n"
+    head += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+    writer.write(head.encode("iso-8859-1") + body)
+    await writer.drain()
+
+    status, reason, response_headers = await _read_head(reader)
+    if metrics is not None:
+        metrics.first_byte()
+        metrics.status = status
+    if status >= 400:
+        error_body = b"".join([block async for block in _read_body(reader, response_headers)])
+        raise urllib.error.HTTPError(request.full_url, status, reason, response_headers,
+                                     io.BytesIO(error_body))
+    return reader, writer, response_headers
+
+
+async def stream_async(request, api_type, ssl_context=None, cancel=None, metrics=None,
+                       stop=None):
+    """
+    Async generator yielding (content, finish_reason) for each event of a
+    streaming completion/chat response built by llm.build_api_request.
+    Each request uses its own connection; proxies are not supported.
+    HTTP errors raise urllib.error.HTTPError. If cancel (a CancelToken) fires,
+    the connection is closed and the generator stops without an error.
+    metrics is an optional metrics.RequestMetrics, filled in as by stream_response.
+    stop is an optional list of stop sequences; the text ends before the first
+    one and the last item has finish_reason "stop".
+    """
+    if cancel is not None and cancel.cancelled:
+        return
+    if metrics is not None:
+        metrics.url = request.full_url
+
+    loop = asyncio.get_running_loop()
+    opening = asyncio.ensure_future(_open(request, ssl_context, metrics))
+    writer = None
+    outcome, error = "error", None
+
+    def abort():
+        def close():
+            if writer is not None:
+                writer.transport.abort()
+            else:
+                opening.cancel()
+        try:
+            loop.call_soon_threadsafe(close)
+        except RuntimeError:
+            pass  # the event loop has already closed
+
+    if cancel is not None:
+        cancel.add_callback(abort)
+    try:
+        reader, writer, headers = await opening
+        if cancel is not None and cancel.cancelled:
+            return
+        decoder = SSEDecoder()
+        matcher = StopMatcher(stop) if stop else None
+        done = stopped = finished = False
+        async for block in _read_body(reader, headers):
+            if metrics is not None:
+                metrics.bytes_received += len(block)
+            for event in decoder.feed(block):
+                if event.data == "[DONE]":
+                    done = True
+                    break
+                chunk = json.loads(event.data)
+                if metrics is not None and isinstance(chunk, dict):
+                    usage = chunk.get("usage")
+                    if usage and usage.get("completion_tokens") is not None:
+                        metrics.completion_tokens = usage["completion_tokens"]
+                if finished:
+                    # Servers send the include_usage chunk after the finish_reason one
+                    continue
+                content, finish_reason = extract_content(chunk, api_type)
+                if matcher is not None:
+                    if content:
+                        content, stopped = matcher.feed(content)
+                    if stopped:
+                        finish_reason = "stop"
+                    elif finish_reason:
+                        content += matcher.flush()
+                if content and metrics is not None:
+                    metrics.content()
+                if content or finish_reason:
+                    yield content, finish_reason
+                if finish_reason:
+                    finished = True
+                    # Only the usage is left to read; without metrics nobody needs it
+                    if stopped or metrics is None:
+                        done = True
+                        break
+            if done:
+                break
+        if matcher is not None and not stopped:
+            held = matcher.flush()
+            if held:
+                yield held, None
+        outcome = "ok"
+    except asyncio.CancelledError:
+        if cancel is None or not cancel.cancelled:
+            raise
+    except GeneratorExit:
+        # The consumer stopped iterating early
+        outcome = "cancelled"
+        raise
+    except Exception as e:
+        if cancel is None or not cancel.cancelled:
+            error = e
+            raise
+    finally:
+        if cancel is not None:
+            cancel.remove_callback(abort)
+            if cancel.cancelled:
+                outcome = "cancelled"
+        if writer is not None:
+            writer.close()
+        if metrics is not None:
+            metrics.finish(outcome, error)
+
+
+async def collect_async(request, api_type, ssl_context=None, cancel=None, metrics=None,
+                        stop=None):
+    """
+    Run a streaming request to completion and return the accumulated text,
+    with "ERROR: ..." appended on failure like batch.collect_response.
+    """
+    chunks = []
+    try:
+        async for content, _ in stream_async(request, api_type, ssl_context, cancel=cancel,
+                                             metrics=metrics, stop=stop):
+            chunks.append(content)
+    except Exception as e:
+        chunks.append(f"ERROR: {str(e)}")
+    return "".join(chunks)
+
+
+def run_async_parallel(tasks, worker, on_result, max_in_flight=64, on_error=None,
+                       on_idle=None, poll_interval=0.05, cancel=None):
+    """
+    Like batch.run_parallel, but worker is a coroutine function and all tasks
+    run on a single event loop thread, at most max_in_flight at a time.
+    on_result(task, result) and on_error(task, exception) are called on the
+    calling thread; on_idle is called while waiting. Once cancel fires, tasks
+    that have not started are skipped and no more results are applied.
+    """
+    if on_idle is None:
+        on_idle = lambda: None
+
+    tasks = list(tasks)
+    if not tasks:
+        return
+    try:
+        max_in_flight = max(1, int(max_in_flight))
+    except (TypeError, ValueError):
+        max_in_flight = 1
+    finished = queue.Queue()
+
+    async def run_all():
+        limit = asyncio.Semaphore(max_in_flight)
+
+        async def run(task):
+            async with limit:
+                if cancel is not None and cancel.cancelled:
+                    finished.put(None)
+                    return
+                try:
+                    finished.put((task, await worker(task), None))
+                except Exception as e:
+                    finished.put((task, None, e))
+
+        await asyncio.gather(*(run(task) for task in tasks))
+
+    loop_thread = threading.Thread(target=lambda: asyncio.run(run_all()),
+                                   name="localwriter-async", daemon=True)
+    loop_thread.start()
+    remaining = len(tasks)
+    while remaining:
+        try:
+            outcome = finished.get(timeout=poll_interval)
+        except queue.Empty:
+            on_idle()
+            continue
+        remaining -= 1
+        if outcome is None or (cancel is not None and cancel.cancelled):
+            continue
+        task, result, error = outcome
+        if error is None:
+            on_result(task, result)
+        elif on_error is not None:
+            on_error(task, error)
+        on_idle()
+    loop_thread.join()
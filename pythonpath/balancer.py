@@ -0,0 +1,170 @@
+"""
+Client-side load balancing for LocalWriter — no UNO dependencies.
+Spreads requests over several identical inference hosts and fails over
+to another host when one refuses connections or answers with errors.
+"""
+
+import errno
+import http.client
+import socket
+import ssl
+import threading
+import time
+import urllib.error
+
+from llm import retarget_request, stream_response
+
+STRATEGIES = ("least_outstanding", "latency")
+
+
+# Network errors that are not ConnectionErrors (unreachable hosts, DNS hiccups)
+_TRANSIENT_ERRNOS = {errno.ENETUNREACH, errno.EHOSTUNREACH, errno.ENETDOWN, errno.EHOSTDOWN}
+
+
+def is_failover_error(error):
+    """
+    True for errors another host, or a later try, may not have: connection
+    failures and timeouts, 429 and 5xx. Certificate errors, a missing CA
+    file and other permanent failures are reported at once.
+    """
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code == 429 or error.code >= 500
+    if isinstance(error, urllib.error.URLError):
+        error = error.reason
+    if isinstance(error, ssl.SSLError):
+        # A dropped TLS connection, but never a handshake or verification failure
+        return isinstance(error, (ssl.SSLEOFError, ssl.SSLZeroReturnError))
+    if isinstance(error, socket.gaierror):
+        return error.errno == socket.EAI_AGAIN
+    if isinstance(error, (ConnectionError, socket.timeout, http.client.HTTPException)):
+        return True
+    return isinstance(error, OSError) and error.errno in _TRANSIENT_ERRNOS
+
+
+class EndpointBalancer:
+    """
+    Picks an endpoint per request and tracks outstanding requests, latency
+    (time to first token) and failures per endpoint; safe to share between
+    threads. A failed endpoint is avoided for cooldown seconds unless every
+    endpoint has failed.
+
+    Strategies: "least_outstanding" picks the endpoint with the fewest
+    requests in flight (least recently used on ties); "latency" weights the
+    requests in flight by each endpoint's average latency.
+    """
+
+    def __init__(self, endpoints, strategy="least_outstanding", cooldown=30.0,
+                 clock=time.monotonic):
+        self.endpoints = list(dict.fromkeys(str(e).rstrip("/") for e in endpoints if e))
+        self.strategy = strategy if strategy in STRATEGIES else STRATEGIES[0]
+        self.cooldown = cooldown
+        self.clock = clock
+        self._outstanding = dict.fromkeys(self.endpoints, 0)
+        self._latency = dict.fromkeys(self.endpoints)
+        self._down_until = dict.fromkeys(self.endpoints, 0.0)
+        self._last_used = dict.fromkeys(self.endpoints, 0)
+        self._uses = 0
+        self._lock = threading.Lock()
+
+    def _score(self, endpoint):
+        if self.strategy == "latency":
+            # Endpoints without a measurement yet are tried first
+            latency = self._latency[endpoint] or 0.0
+            return ((self._outstanding[endpoint] + 1) * latency, self._last_used[endpoint])
+        return (self._outstanding[endpoint], self._last_used[endpoint])
+
+    def acquire(self, exclude=()):
+        """Pick an endpoint (not in exclude) and count it as in use; None if none is left."""
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in exclude]
+            if not candidates:
+                return None
+            now = self.clock()
+            healthy = [e for e in candidates if self._down_until[e] <= now]
+            endpoint = min(healthy or candidates, key=self._score)
+            self._outstanding[endpoint] += 1
+            self._uses += 1
+            self._last_used[endpoint] = self._uses
+            return endpoint
+
+    def release(self, endpoint, ok, latency=None):
+        """Finish a request on endpoint; ok=False puts it in cooldown."""
+        with self._lock:
+            self._outstanding[endpoint] = max(0, self._outstanding[endpoint] - 1)
+            if not ok:
+                self._down_until[endpoint] = self.clock() + self.cooldown
+                return
+            self._down_until[endpoint] = 0.0
+            if latency is not None:
+                previous = self._latency[endpoint]
+                self._latency[endpoint] = (latency if previous is None
+                                           else previous * 0.8 + latency * 0.2)
+
+    def outstanding(self, endpoint):
+        with self._lock:
+            return self._outstanding[endpoint]
+
+    def is_down(self, endpoint):
+        with self._lock:
+            return self._down_until[endpoint] > self.clock()
+
+
+def stream_with_failover(balancer, request, api_type, ssl_context, append_callback, **kwargs):
+    """
+    stream_response against the endpoint the balancer picks, moving on to the
+    next endpoint if one fails with a connection error, 429 or 5xx before any
+    text arrived. request is a build_api_request request; it is re-sent to
+    each endpoint with retarget_request. kwargs are passed to stream_response.
+    If on_error is given, the last error is passed to it instead of being
+    written as "ERROR: ..." text when no endpoint succeeded.
+    Returns the result of stream_response.
+    """
+    cancel = kwargs.get("cancel")
+    on_error = kwargs.pop("on_error", None)
+    tried = []
+    while True:
+        endpoint = balancer.acquire(exclude=tried)
+        tried.append(endpoint)
+        errors = []
+        started = time.monotonic()
+        first_text = []
+
+        def append(text):
+            if not first_text:
+                first_text.append(time.monotonic() - started)
+            append_callback(text)
+
+        try:
+            result = stream_response(retarget_request(request, endpoint), api_type, ssl_context,
+                                     append, on_error=errors.append, **kwargs)
+        except BaseException:
+            balancer.release(endpoint, ok=True)
+            raise
+        error = errors[0] if errors else None
+        failed = error is not None and is_failover_error(error)
+        balancer.release(endpoint, not failed,
+                         first_text[0] if first_text else time.monotonic() - started)
+        if error is None:
+            return result
+        if failed and len(tried) < len(balancer.endpoints) and not (cancel and cancel.cancelled):
+            continue
+        if on_error is not None:
+            on_error(error)
+        else:
+            append_callback(f"ERROR: {str(error)}")
+        return False
+
+
+_balancers = {}
+_balancers_lock = threading.Lock()
+
+
+def get_balancer(endpoints, strategy="least_outstanding", cooldown=30.0):
+    """Return the process-wide EndpointBalancer for this list of endpoints."""
+    key = (tuple(endpoints), strategy)
+    with _balancers_lock:
+        balancer = _balancers.get(key)
+        if balancer is None:
+            balancer = _balancers[key] = EndpointBalancer(endpoints, strategy, cooldown)
+        balancer.cooldown = cooldown
+        return balancer
@@ -0,0 +1,236 @@
+"""
+Batch scheduling for LocalWriter — no UNO dependencies.
+Runs many LLM requests on a bounded worker pool while the results are
+handed back to the calling (UI) thread, which is the only thread that
+should touch the document.
+"""
+
+import functools
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from llm import stream_response
+from balancer import stream_with_failover
+from retry import stream_with_retry
+from response_cache import stream_with_cache
+
+
+def as_int(value, default=0):
+    """Convert a config value to int, falling back to default."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def group_identical(items, key):
+    """
+    Group items whose key(item) is equal, so identical requests are sent once.
+    Returns a list of (key, [items]) in order of first appearance.
+    """
+    groups = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    return list(groups.items())
+
+
+def pack_prompt(texts, instructions):
+    """
+    Build one prompt that asks for a result for each of texts, returned as a
+    JSON array in the same order. instructions describe what to do per item.
+    Everything before the input array is the same for every pack with the
+    same instructions, so the server can reuse its cached prefix.
+    """
+    count = len(texts)
+    return (instructions + "\n"
+            + "You will be given a JSON array of input texts. "
+            + "Answer with only a JSON array of strings, one result per input, "
+            + "in the same order, and nothing else.\n"
+            + "INPUT:\n" + json.dumps(list(texts), ensure_ascii=False) + "\n"
+            + "OUTPUT (a JSON array of exactly " + str(count) + " strings):\n")
+
+
+def parse_packed_response(text, count):
+    """
+    Parse the JSON array answer to a pack_prompt request.
+    Returns a list of count results; items that could not be parsed are None.
+    If the array does not have exactly count items, none of them can be
+    matched to their inputs safely and all are None.
+    """
+    results = [None] * count
+    start = text.find("[")
+    end = text.rfind("]")
+    if start == -1 or end <= start:
+        return results
+    try:
+        values = json.loads(text[start:end + 1])
+    except ValueError:
+        return results
+    if not isinstance(values, list) or len(values) != count:
+        return results
+    for i, value in enumerate(values):
+        if isinstance(value, str):
+            results[i] = value
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            results[i] = str(value)
+    return results
+
+
+def stream_balanced(request, api_type, ssl_context, append_callback, balancer=None,
+                    retry=None, **kwargs):
+    """
+    stream_response, spread over the balancer's endpoints if balancer is given
+    and retried according to retry (a RetryPolicy) if given.
+    """
+    stream = stream_response
+    if balancer is not None:
+        stream = functools.partial(stream_with_failover, balancer)
+    if retry is not None:
+        return stream_with_retry(retry, request, api_type, ssl_context, append_callback,
+                                 stream=stream, **kwargs)
+    return stream(request, api_type, ssl_context, append_callback, **kwargs)
+
+
+def collect_response(request, api_type, ssl_context, log_fn=None, cancel=None,
+                     cache=None, metrics=None, stop=None, balancer=None, retry=None,
+                     on_error=None):
+    """
+    Run a streaming request to completion and return the accumulated text.
+    If cache (a ResponseCache) is given, a cached response is returned instead.
+    If on_error is given, a request that fails (and was not cancelled) is
+    reported as on_error(exception) instead of only as "ERROR: ..." text.
+    """
+    chunks = []
+    errors = []
+    completed = stream_with_cache(
+        cache, request, chunks.append,
+        lambda callback: stream_balanced(request, api_type, ssl_context, callback,
+                                         balancer, retry, log_fn=log_fn, cancel=cancel,
+                                         metrics=metrics, stop=stop,
+                                         on_error=errors.append if on_error else None))
+    if on_error is not None:
+        report_failure(completed, errors, cancel, on_error)
+    return "".join(chunks)
+
+
+def report_failure(completed, errors, cancel, on_error):
+    """
+    Pass the error of a stream that did not complete to on_error: the first
+    of errors, or an IOError if it broke off after text had arrived.
+    Nothing is reported for a cancelled stream.
+    """
+    if cancel is not None and cancel.cancelled:
+        return
+    if errors:
+        on_error(errors[0])
+    elif not completed:
+        on_error(IOError("the response was incomplete"))
+
+
+def stream_in_background(request, api_type, ssl_context, append_callback,
+                         on_idle=None, log_fn=None, cancel=None, metrics=None,
+                         poll_interval=0.05, stop=None, balancer=None, retry=None,
+                         on_error=None):
+    """
+    Run stream_response on a worker thread while the calling thread keeps
+    calling on_idle, so the UI stays responsive during connect and
+    time-to-first-token. append_callback is called on the calling thread.
+    on_error is passed to stream_response. An exception on the calling
+    thread (such as KeyboardInterrupt) cancels cancel before it propagates.
+    Returns the result of stream_response.
+    """
+    if on_idle is None:
+        on_idle = lambda: None
+
+    chunks = queue.Queue()
+    outcome = []
+    finished = object()
+
+    def run():
+        try:
+            outcome.append(stream_balanced(request, api_type, ssl_context, chunks.put, balancer,
+                                           retry, log_fn=log_fn, cancel=cancel, metrics=metrics,
+                                           stop=stop, on_error=on_error))
+        finally:
+            chunks.put(finished)
+
+    worker = threading.Thread(target=run, name="localwriter-stream", daemon=True)
+    worker.start()
+    try:
+        while True:
+            try:
+                chunk = chunks.get(timeout=poll_interval)
+            except queue.Empty:
+                on_idle()
+                continue
+            if chunk is finished:
+                break
+            if cancel is None or not cancel.cancelled:
+                append_callback(chunk)
+            on_idle()
+    except BaseException:
+        if cancel is not None:
+            cancel.cancel()
+        raise
+    worker.join()
+    return outcome[0] if outcome else False
+
+
+def run_parallel(tasks, worker, on_result, max_workers=4, on_error=None,
+                 on_idle=None, poll_interval=0.05, cancel=None):
+    """
+    Call worker(task) for every task on at most max_workers threads.
+    on_result(task, result) and on_error(task, exception) are called on the
+    calling thread as each task finishes; on_idle is called while waiting
+    so the UI can keep processing events. Once cancel (a CancelToken) fires,
+    tasks that have not started are skipped and no more results are applied.
+    An exception on the calling thread (such as KeyboardInterrupt) cancels
+    cancel and the tasks that have not started before it propagates.
+    """
+    if on_idle is None:
+        on_idle = lambda: None
+
+    tasks = list(tasks)
+    if not tasks:
+        return
+    max_workers = max(1, min(as_int(max_workers, 1), len(tasks)))
+    finished = queue.Queue()
+
+    def run(task):
+        if cancel is not None and cancel.cancelled:
+            finished.put(None)
+            return
+        try:
+            finished.put((task, worker(task), None))
+        except Exception as e:
+            finished.put((task, None, e))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(run, task) for task in tasks]
+
+        remaining = len(tasks)
+        try:
+            while remaining:
+                try:
+                    outcome = finished.get(timeout=poll_interval)
+                except queue.Empty:
+                    on_idle()
+                    continue
+                remaining -= 1
+                if outcome is None or (cancel is not None and cancel.cancelled):
+                    continue
+                task, result, error = outcome
+                if error is None:
+                    on_result(task, result)
+                elif on_error is not None:
+                    on_error(task, error)
+                on_idle()
+        except BaseException:
+            # Leaving the with block waits for the pool; don't let it run the queue first
+            if cancel is not None:
+                cancel.cancel()
+            for future in futures:
+                future.cancel()
+            raise
@@ -0,0 +1,211 @@
+"""
+Bulk access to Calc cell ranges for LocalWriter — no UNO dependencies.
+A selection is read with one getDataArray call and results are written
+back with setDataArray in blocks of rows, instead of a getString/setString
+round-trip per cell. Works on any object with the XCellRangeData,
+XCellRangeFormula and XCellRange methods (a Calc cell range).
+Selections are planned as Areas: clipped to the used area of the sheet
+and narrowed to the blocks that have content, so selecting whole columns
+does not read a million empty rows.
+"""
+
+import time
+from collections import namedtuple
+
+from jobs import EXTEND, ResultSink
+
+# Inclusive, 0-based cell coordinates of a rectangle on one sheet
+Area = namedtuple("Area", ["left", "top", "right", "bottom"])
+
+# The last column and row a sheet can have; areas are clipped to the used area
+MAX_COLUMN = 16383
+MAX_ROW = 1048575
+
+
+def area_of(address):
+    """The Area of a CellRangeAddress."""
+    return Area(address.StartColumn, address.StartRow, address.EndColumn, address.EndRow)
+
+
+def area_cells(area):
+    return (area.right - area.left + 1) * (area.bottom - area.top + 1)
+
+
+def clip_area(area, used):
+    """The part of area inside used (the sheet's used area); None if they do not overlap."""
+    clipped = Area(max(area.left, used.left), max(area.top, used.top),
+                   min(area.right, used.right), min(area.bottom, used.bottom))
+    if clipped.left > clipped.right or clipped.top > clipped.bottom:
+        return None
+    return clipped
+
+
+def overlaps(a, b):
+    """True if Areas a and b share a cell."""
+    return a.left <= b.right and b.left <= a.right and a.top <= b.bottom and b.top <= a.bottom
+
+
+def merge_areas(areas, min_density=0.5):
+    """
+    Merge the disjoint content blocks of a selection (e.g. from
+    queryContentCells, which may return one block per cell of a sparse
+    column) into fewer bounding Areas, so they can be read with a few
+    getDataArray calls. Blocks are merged in row order as long as at least
+    min_density of the merged rectangle is covered by content and it does
+    not reach into another block, so the result never covers a cell twice.
+    """
+    blocks = sorted(areas, key=lambda a: (a.top, a.left))
+    merged = []
+    earlier = []  # areas before the last one that may reach the rows still to come
+    for index, area in enumerate(blocks):
+        if merged:
+            current, covered = merged[-1]
+            box = Area(min(current.left, area.left), current.top,
+                       max(current.right, area.right), max(current.bottom, area.bottom))
+            if (covered + area_cells(area) >= min_density * area_cells(box)
+                    and not any(overlaps(box, other) for other in earlier)
+                    and not any(overlaps(box, later)
+                                for later in _blocks_above(blocks, index + 1, box.bottom))):
+                merged[-1] = (box, covered + area_cells(area))
+                continue
+            earlier = [a for a in earlier if a.bottom >= area.top] + [current]
+        merged.append((area, area_cells(area)))
+    return [area for area, _ in merged]
+
+
+def _blocks_above(blocks, start, bottom):
+    """blocks[start:] (sorted by top) that begin at or above row bottom."""
+    index = start
+    while index < len(blocks) and blocks[index].top <= bottom:
+        yield blocks[index]
+        index += 1
+
+
+class RangeData:
+    """
+    The contents of one cell range, read in bulk, and the results waiting
+    to be written back. Rows and columns are relative to the range.
+    Only processed cells change: each block is read again just before it is
+    written, and formula cells that were not processed are written around.
+    """
+
+    def __init__(self, cell_range, block_rows=200):
+        self.cell_range = cell_range
+        self.block_rows = max(1, block_rows)
+        self.values = [list(row) for row in cell_range.getDataArray()]
+        self._written = {}  # row -> set of columns with new values
+
+    def text(self, row, col):
+        """The cell's text; "" for numbers, dates and empty cells."""
+        value = self.values[row][col]
+        # Numbers and dates come back as floats: they are not text to work on, and
+        # their displayed text would cost a getString call per cell
+        return value if isinstance(value, str) else ""
+
+    def cells(self):
+        """(row, col, text) for every cell, row by row."""
+        for row, values in enumerate(self.values):
+            for col in range(len(values)):
+                yield row, col, self.text(row, col)
+
+    def set(self, row, col, text):
+        self.values[row][col] = text
+        self._written.setdefault(row, set()).add(col)
+
+    @property
+    def pending(self):
+        """Number of cells with results not yet written back."""
+        return sum(len(cols) for cols in self._written.values())
+
+    def flush(self):
+        """Write the pending results; each setDataArray covers at most block_rows rows."""
+        rows = sorted(self._written)
+        while rows:
+            first = rows[0]
+            block = [row for row in rows if row < first + self.block_rows]
+            rows = rows[len(block):]
+            self._write_block(block[0], block[-1])
+
+    def _write_block(self, first, last):
+        written = {row: self._written.pop(row, set()) for row in range(first, last + 1)}
+        cols = set().union(*written.values())
+        left, right = min(cols), max(cols)
+        block = self.cell_range.getCellRangeByPosition(left, first, right, last)
+        # Read the block again: the user may have typed into it while the job ran
+        formulas = block.getFormulaArray()
+        data = [list(values) for values in block.getDataArray()]
+        for row, row_cols in written.items():
+            for col in row_cols:
+                data[row - first][col - left] = self.values[row][col]
+        # Rows without untouched formulas are written together; a row with
+        # some is written in the pieces between them
+        rows = []
+        for row in range(first, last + 1):
+            kept = [col for col in range(left, right + 1) if col not in written[row]
+                    and str(formulas[row - first][col - left]).startswith("=")]
+            if not kept:
+                rows.append(row)
+                continue
+            self._write_area(data, first, left, rows, left, right)
+            rows = []
+            start = left
+            for col in kept + [right + 1]:
+                if any(start <= c < col for c in written[row]):
+                    self._write_area(data, first, left, [row], start, col - 1)
+                start = col + 1
+        self._write_area(data, first, left, rows, left, right)
+
+    def _write_area(self, data, first, left, rows, start, end):
+        """Write columns start..end of the consecutive rows from data (read at first, left)."""
+        if not rows:
+            return
+        self.cell_range.getCellRangeByPosition(start, rows[0], end, rows[-1]).setDataArray(
+            tuple(tuple(data[row - first][start - left:end - left + 1]) for row in rows))
+
+
+class DataArraySink(ResultSink):
+    """
+    ResultSink for items whose target is (RangeData, row, col). Results are
+    kept in memory and written back in blocks at most every flush_interval
+    seconds and when the job is over, so streamed chunks cost no UNO calls.
+    """
+
+    def __init__(self, flush_interval=1.0, clock=time.monotonic):
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self._ranges = []
+        self._chunks = {}
+        self._last_flush = clock()
+
+    def begin(self, item):
+        self._chunks[id(item)] = []
+
+    def append(self, item, text):
+        self._chunks[id(item)].append(text)
+
+    def end(self, item):
+        chunks = self._chunks.pop(id(item), None)
+        if chunks is not None:
+            self.set_result(item, "".join(chunks))
+
+    def set_result(self, item, result):
+        self._set(item, item.text + result if item.operation == EXTEND else result)
+
+    def set_error(self, item, error):
+        self._set(item, item.text + ": " + str(error))
+
+    def _set(self, item, text):
+        data, row, col = item.target
+        data.set(row, col, text)
+        if data not in self._ranges:
+            self._ranges.append(data)
+        if self.clock() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        for data in self._ranges:
+            data.flush()
+        self._last_flush = self.clock()
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,52 @@
+"""
+Splitting of large Writer selections for LocalWriter — no UNO dependencies.
+Long selections are cut at paragraph boundaries into chunks that each fit
+a token budget, so they can be sent as several bounded requests.
+"""
+
+from tokens import estimate_tokens
+
+
+def split_paragraphs(text):
+    """Split a selection's text (as returned by getString) into paragraphs."""
+    return text.replace("\r\n", "\n").split("\n")
+
+
+def chunk_paragraphs(paragraphs, max_tokens, count_tokens=estimate_tokens):
+    """
+    Group consecutive paragraphs into chunks of at most max_tokens each.
+    Returns a list of (first, last) paragraph indexes, inclusive. A paragraph
+    that alone exceeds the budget becomes a chunk of its own.
+    """
+    chunks = []
+    first = 0
+    used = 0
+    for i, paragraph in enumerate(paragraphs):
+        tokens = count_tokens(paragraph) + 1  # the paragraph break
+        if i > first and used + tokens > max_tokens:
+            chunks.append((first, i - 1))
+            first, used = i, 0
+        used += tokens
+    if paragraphs:
+        chunks.append((first, len(paragraphs) - 1))
+    return chunks
+
+
+def tail_context(paragraphs, max_tokens, count_tokens=estimate_tokens):
+    """
+    The last paragraphs that fit in max_tokens, joined back into text, as the
+    context for continuing a long selection. If even the last paragraph is too
+    long, only its end is kept.
+    """
+    kept = []
+    used = 0
+    for paragraph in reversed(paragraphs):
+        tokens = count_tokens(paragraph) + 1
+        if used + tokens > max_tokens:
+            if not kept:
+                keep = max(1, len(paragraph) * max_tokens // tokens)
+                kept.append(paragraph[-keep:])
+            break
+        kept.append(paragraph)
+        used += tokens
+    return "\n".join(reversed(kept))
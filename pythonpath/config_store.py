@@ -0,0 +1,102 @@
+"""
+Settings storage for LocalWriter — no UNO dependencies.
+Keeps localwriter.json in memory and only re-reads it when the file
+changes on disk; writes go through in one atomic replace.
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+
+def as_bool(value):
+    """Convert various types to boolean."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(value, (int, float)):
+        return value != 0
+    return False
+
+
+class ConfigStore:
+    """In-memory view of a JSON settings file, invalidated by mtime/size."""
+
+    def __init__(self, path):
+        self.path = path
+        self._data = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _refresh(self):
+        """Reload the file if it changed since the last read. Caller holds the lock."""
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        data = {}
+        if stamp is not None:
+            try:
+                with open(self.path, 'r') as file:
+                    data = json.load(file)
+            except (IOError, json.JSONDecodeError):
+                data = {}
+        self._data = data if isinstance(data, dict) else {}
+        self._stamp = stamp
+
+    def get(self, key, default=None):
+        with self._lock:
+            self._refresh()
+            return self._data.get(key, default)
+
+    def as_dict(self):
+        with self._lock:
+            self._refresh()
+            return dict(self._data)
+
+    def update(self, values):
+        """Merge values into the settings and write the file once, atomically."""
+        with self._lock:
+            self._refresh()
+            data = dict(self._data)
+            data.update(values)
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".localwriter-", suffix=".json",
+                                            dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as file:
+                    json.dump(data, file, indent=4)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+            self._data = data
+            self._stamp = self._file_stamp()
+
+    def set(self, key, value):
+        self.update({key: value})
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path):
+    """Return the process-wide ConfigStore for path."""
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = ConfigStore(path)
+        return store
@@ -0,0 +1,90 @@
+"""
+Debug logging for LocalWriter — no UNO dependencies.
+The log file is set up once per process; records are handed to a queue and
+written by a background thread to a size-capped, rotating file, so logging
+never blocks the streaming loop on disk I/O.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+_logger = logging.getLogger("localwriter")
+_logger.propagate = False
+_logger.setLevel(logging.INFO)
+
+_lock = threading.Lock()
+_enabled = False
+_listener = None
+_queue_handler = None
+_path = None
+
+
+def configure(enabled, path, max_bytes=5 * 1024 * 1024, backup_count=3):
+    """
+    Turn debug logging on or off. The queue and the rotating file handler for
+    path are only created the first time logging is enabled for that path.
+    """
+    global _enabled, _listener, _queue_handler, _path
+    with _lock:
+        _enabled = bool(enabled)
+        if not _enabled or path == _path:
+            return
+        _stop_listener()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+        records = queue.Queue()
+        _queue_handler = logging.handlers.QueueHandler(records)
+        _logger.addHandler(_queue_handler)
+        _listener = logging.handlers.QueueListener(records, file_handler)
+        _listener.start()
+        _path = path
+
+
+def _stop_listener():
+    """Flush and close the current log file. Caller holds the lock."""
+    global _listener, _queue_handler, _path
+    if _listener is None:
+        return
+    _logger.removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = _queue_handler = _path = None
+
+
+def shutdown():
+    """Write out queued records and close the log file."""
+    global _enabled
+    with _lock:
+        _enabled = False
+        _stop_listener()
+
+
+atexit.register(shutdown)
+
+
+def is_enabled():
+    return _enabled
+
+
+def log(message):
+    """
+    Log message if debug logging is on. message may also be a function
+    returning the text, so expensive formatting only happens when enabled.
+    """
+    if not _enabled:
+        return
+    if callable(message):
+        message = message()
+    _logger.info(message)
+
+
+def log_fn():
+    """The log_fn to hand to llm.py: log when enabled, None (skip all formatting) otherwise."""
+    return log if _enabled else None
@@ -0,0 +1,168 @@
+"""
+Command-line options for running LocalWriter over documents without the
+GUI — no UNO dependencies. main() in main.py parses them, opens each
+document in a headless soffice, applies ExtendSelection or EditSelection
+to the chosen ranges, paragraphs or columns and saves the result.
+
+Example:
+    python main.py --operation edit --instructions "Fix the spelling" \
+        --column B --concurrency 8 --output-dir done/ sheets/
+"""
+
+import argparse
+import json
+import os
+import re
+
+DOCUMENT_EXTENSIONS = (".odt", ".ods")
+OPERATIONS = {"extend": "ExtendSelection", "edit": "EditSelection"}
+
+_COLUMNS = re.compile(r"^([A-Za-z]{1,3})(?::([A-Za-z]{1,3}))?$")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="localwriter",
+        description="Run Extend Selection or Edit Selection over Writer and Calc "
+                    "documents in a headless LibreOffice.")
+    parser.add_argument("paths", nargs="+",
+                        help=".odt/.ods files, or directories containing them")
+    parser.add_argument("-o", "--operation", choices=sorted(OPERATIONS), required=True)
+    parser.add_argument("-i", "--instructions", default="",
+                        help="edit instructions (required for --operation edit)")
+    parser.add_argument("--range", dest="ranges", action="append", default=[],
+                        help="Calc cell range such as A1:C20 or Sheet2.A1:C20; repeatable")
+    parser.add_argument("--column", dest="columns", action="append", default=[],
+                        help="Calc column or columns such as B or B:D, down to the "
+                             "last used row; repeatable")
+    parser.add_argument("--paragraphs", default="",
+                        help="Writer paragraphs such as 1-5,8 (1-based); each part is "
+                             "processed as one selection. Default: the whole text")
+    parser.add_argument("--output-dir", default="",
+                        help="save results here instead of overwriting the documents")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="also look for documents in subdirectories")
+    parser.add_argument("-c", "--concurrency", type=int, default=0,
+                        help="requests in flight at once (default: the configured "
+                             "calc_concurrency / writer_chunk_concurrency)")
+    parser.add_argument("--set", dest="overrides", action="append", default=[],
+                        metavar="KEY=VALUE",
+                        help="override a localwriter.json setting for this run; "
+                             "VALUE is read as JSON if possible; repeatable")
+    parser.add_argument("--soffice", default="soffice",
+                        help="soffice executable to start (default: soffice)")
+    parser.add_argument("--connect", default="",
+                        help="connect to a running office instead of starting one, "
+                             "e.g. socket,host=localhost,port=2002")
+    return parser
+
+
+def parse_args(argv):
+    """
+    Parse the command line. Besides the argparse attributes, the result has
+    command (ExtendSelection or EditSelection), paragraph_spans, column_spans
+    and config (the --set overrides, plus --concurrency).
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    args.command = OPERATIONS[args.operation]
+    if args.command == "EditSelection" and not args.instructions:
+        parser.error("--instructions is required for --operation edit")
+    try:
+        args.paragraph_spans = parse_paragraph_spec(args.paragraphs)
+        args.column_spans = [parse_columns(spec) for spec in args.columns]
+        args.config = dict(parse_override(item) for item in args.overrides)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.concurrency > 0:
+        args.config["calc_concurrency"] = args.concurrency
+        args.config["writer_chunk_concurrency"] = args.concurrency
+    return args
+
+
+def find_documents(paths, recursive=False):
+    """The .odt/.ods files among paths, with directories expanded in sorted order."""
+    documents = []
+    for path in paths:
+        if not os.path.isdir(path):
+            documents.append(path)
+            continue
+        if recursive:
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                documents.extend(os.path.join(root, name) for name in sorted(files)
+                                 if name.lower().endswith(DOCUMENT_EXTENSIONS))
+        else:
+            documents.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                             if name.lower().endswith(DOCUMENT_EXTENSIONS)
+                             and os.path.isfile(os.path.join(path, name)))
+    return documents
+
+
+def parse_paragraph_spec(spec):
+    """
+    "1-5,8" -> [(0, 4), (7, 7)]: inclusive, 0-based paragraph spans from a
+    1-based specification. An empty spec gives [].
+    """
+    spans = []
+    for part in str(spec).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        try:
+            first = int(first)
+            last = int(last) if last.strip() else first
+        except ValueError:
+            raise ValueError(f"invalid paragraph range: {part}")
+        if first < 1 or last < first:
+            raise ValueError(f"invalid paragraph range: {part}")
+        spans.append((first - 1, last - 1))
+    return spans
+
+
+def column_index(letters):
+    """Spreadsheet column letters to a 0-based index: "A" -> 0, "AA" -> 26."""
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+def parse_columns(spec):
+    """"B" -> (1, 1), "B:D" -> (1, 3): inclusive, 0-based column spans."""
+    match = _COLUMNS.match(str(spec).strip())
+    if not match:
+        raise ValueError(f"invalid column: {spec}")
+    first = column_index(match.group(1))
+    last = column_index(match.group(2) or match.group(1))
+    if last < first:
+        raise ValueError(f"invalid column: {spec}")
+    return first, last
+
+
+def split_sheet(range_name):
+    """"Sheet2.A1:C20" -> ("Sheet2", "A1:C20"); ("", "A1:C20") without a sheet name."""
+    sheet, dot, cells = str(range_name).rpartition(".")
+    if not dot:
+        return "", cells
+    return sheet.strip("$'"), cells
+
+
+def parse_override(item):
+    """"key=value" -> (key, value), with value parsed as JSON if possible."""
+    key, sep, value = str(item).partition("=")
+    if not sep or not key.strip():
+        raise ValueError(f"invalid setting (expected KEY=VALUE): {item}")
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+    return key.strip(), value
+
+
+def output_path(path, output_dir=""):
+    """Where to save the processed document: path itself, or output_dir/name."""
+    if not output_dir:
+        return path
+    return os.path.join(output_dir, os.path.basename(path))
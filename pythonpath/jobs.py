@@ -0,0 +1,341 @@
+"""
+Document-agnostic job engine for LocalWriter — no UNO dependencies.
+A job is a list of WorkItems (target, text, operation). The engine builds
+the prompts and max_tokens for each item, sends identical requests once,
+optionally packs several items into one request, dispatches the requests
+(streamed one at a time, or collected in parallel) and hands the results
+to a ResultSink, reporting finished items to an optional Progress.
+The Writer and Calc commands in main.py are thin adapters
+that turn a selection into work items and write results through RangeSink.
+"""
+
+from collections import namedtuple
+
+from batch import as_int, group_identical, pack_prompt, parse_packed_response, run_parallel
+from chunking import split_paragraphs, tail_context
+from tokens import TokenEstimator
+
+EXTEND = "ExtendSelection"
+EDIT = "EditSelection"
+
+# target is whatever the sink writes to (a Calc cell, a Writer text range, an id)
+WorkItem = namedtuple("WorkItem", ["target", "text", "operation"])
+
+
+def edit_prompt(original, instructions):
+    """
+    The Edit Selection prompt. The instructions come before the original
+    text, so every request with the same instructions (every cell or chunk
+    of one run) starts with the same text and the server can reuse its cache.
+    """
+    return "Below is an original version and an edited version according to the following instructions. There are no comments in the edited version. The edited version is followed by the end of the document. The original version will be edited as follows to create the edited version:\n" + instructions + "\nORIGINAL VERSION:\n" + original + "\nEDITED VERSION:\n"
+
+
+def cell_edit_prompt(original, instructions):
+    """The Edit Selection prompt for Calc cells, asking for a quick answer."""
+    return "Below is an original version and an edited version according to the following instructions. Don't waste time thinking, be as fast as you can. The edited text will be a shorter or longer version of the original text based on the instructions. There are no comments in the edited version. The edited version is followed by the end of the document. The original version will be edited as follows to create the edited version:\n" + instructions + "\nORIGINAL VERSION:\n" + original + "\nEDITED VERSION:\n"
+
+
+class JobSettings:
+    """
+    How a job builds and schedules its requests.
+    Extend items are sent with extend_max_tokens; when context_tokens is
+    above 0, only the last paragraphs that fit in it are sent. Edit items
+    get edit_template(text, instructions), a token budget of the text plus
+    edit_max_new_tokens, and the stop sequences. concurrency above 1 collects
+    responses in parallel instead of streaming them; pack_size above 1 sends
+    that many items per request (see batch.pack_prompt).
+    """
+
+    def __init__(self, instructions="", extend_system_prompt="", extend_max_tokens=70,
+                 edit_system_prompt="", edit_max_new_tokens=0, edit_template=edit_prompt,
+                 stop=None, context_tokens=0, concurrency=1, pack_size=1, estimator=None):
+        self.instructions = instructions
+        self.extend_system_prompt = extend_system_prompt
+        self.extend_max_tokens = as_int(extend_max_tokens, 70)
+        self.edit_system_prompt = edit_system_prompt
+        self.edit_max_new_tokens = as_int(edit_max_new_tokens, 0)
+        self.edit_template = edit_template
+        self.stop = stop
+        self.context_tokens = as_int(context_tokens, 0)
+        self.concurrency = max(as_int(concurrency, 1), 1)
+        self.pack_size = as_int(pack_size, 1)
+        self.estimator = estimator if estimator is not None else TokenEstimator()
+
+
+class ResultSink:
+    """
+    Receives the results of a job. A streamed result arrives as begin(item),
+    append(item, text) for each chunk, then end(item); a complete result as
+    set_result(item, result); a failure as set_error(item, error). close()
+    is called once the job is over. All calls are made on the thread running
+    JobEngine.run.
+    """
+
+    def begin(self, item):
+        pass
+
+    def append(self, item, text):
+        raise NotImplementedError
+
+    def end(self, item):
+        pass
+
+    def set_result(self, item, result):
+        raise NotImplementedError
+
+    def set_error(self, item, error):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class RangeSink(ResultSink):
+    """
+    ResultSink for targets with getString/setString, such as Calc cells and
+    Writer text ranges. Extend results are appended to the text, Edit
+    results replace it, and an error replaces the target with its original
+    text followed by ": " and the error.
+    make_writer(target) returns the function streamed text is passed to,
+    e.g. a BufferedSink inserting at the end of target (flushed by end, and
+    whose discard() removes what it wrote when the stream fails); by default
+    streamed text is appended with setString. strip_newlines trims line
+    breaks around Edit results, streamed or complete.
+    """
+
+    def __init__(self, make_writer=None, strip_newlines=False):
+        self.make_writer = make_writer or self._append_writer
+        self.strip_newlines = strip_newlines
+        self._writers = {}  # id(item) -> [writer, line breaks held back or None]
+
+    @staticmethod
+    def _append_writer(target):
+        return lambda text: target.setString(target.getString() + text)
+
+    def begin(self, item):
+        if item.operation == EDIT:
+            item.target.setString("")
+        self._writers[id(item)] = [self.make_writer(item.target), None]
+
+    def append(self, item, text):
+        stream = self._writers[id(item)]
+        if self.strip_newlines and item.operation == EDIT:
+            # Leading line breaks are dropped and trailing ones held back
+            # until more text follows, so nothing is left to strip at the end
+            text = text.lstrip("\n") if stream[1] is None else stream[1] + text
+            if not text:
+                return
+            trimmed = text.rstrip("\n")
+            stream[1] = text[len(trimmed):]
+            text = trimmed
+            if not text:
+                return
+        stream[0](text)
+
+    def end(self, item):
+        # The writer is kept until set_error, which may have to discard its text
+        stream = self._writers.get(id(item))
+        flush = getattr(stream[0] if stream else None, "flush", None)
+        if flush is not None:
+            flush()
+
+    def set_result(self, item, result):
+        if item.operation == EXTEND:
+            item.target.setString(item.text + result)
+        else:
+            item.target.setString(result.strip("\n") if self.strip_newlines else result)
+
+    def set_error(self, item, error):
+        stream = self._writers.pop(id(item), None)
+        discard = getattr(stream[0] if stream else None, "discard", None)
+        if discard is not None:
+            discard()
+        item.target.setString(item.text + ": " + str(error))
+
+
+class JobEngine:
+    """
+    Plans and runs jobs.
+    make_request(prompt, system_prompt, max_tokens, stop) builds a request;
+    collect(request, stop) returns its complete text and is called on worker
+    threads; stream(request, append, stop) streams it on the calling thread
+    (without it, responses are always collected). on_idle and cancel (a
+    CancelToken) are used while waiting, as in batch.run_parallel. progress
+    (a progress.Progress) is told how many items are done as results arrive.
+    failed counts the items of the last run that were passed to set_error.
+    """
+
+    def __init__(self, settings, make_request, collect, stream=None, on_idle=None,
+                 cancel=None, progress=None):
+        self.settings = settings
+        self.make_request = make_request
+        self.collect = collect
+        self.stream = stream
+        self.on_idle = on_idle
+        self.cancel = cancel
+        self.progress = progress
+        self.failed = 0
+
+    @property
+    def cancelled(self):
+        return self.cancel is not None and self.cancel.cancelled
+
+    def request_key(self, item):
+        """(operation, prompt, system prompt, max_tokens) for item; None to skip it."""
+        settings = self.settings
+        if item.operation == EXTEND:
+            if not item.text:
+                return None
+            prompt = item.text
+            count = settings.estimator.count
+            if settings.context_tokens > 0 and count(prompt) > settings.context_tokens:
+                prompt = tail_context(split_paragraphs(prompt), settings.context_tokens, count)
+            return (EXTEND, prompt, settings.extend_system_prompt, settings.extend_max_tokens)
+        if item.operation == EDIT:
+            return (EDIT, settings.edit_template(item.text, settings.instructions),
+                    settings.edit_system_prompt,
+                    settings.estimator.budget(item.text, settings.edit_max_new_tokens))
+        raise ValueError(f"unknown operation: {item.operation}")
+
+    def plan(self, items):
+        """Items grouped by identical request: a list of (request key, [items])."""
+        keyed = [(item, self.request_key(item)) for item in items]
+        groups = group_identical([k for k in keyed if k[1] is not None], key=lambda k: k[1])
+        return [(key, [item for item, _ in members]) for key, members in groups]
+
+    def run(self, items, sink):
+        """
+        Send the requests for items and pass the results to sink.
+        Returns the number of items that failed.
+        """
+        self.failed = 0
+        try:
+            self._run(items, sink)
+        finally:
+            try:
+                sink.close()
+            finally:
+                if self.progress is not None:
+                    self.progress.finish()
+        return self.failed
+
+    def _done(self, items, text=""):
+        if self.progress is not None:
+            self.progress.advance(len(items), self.settings.estimator.count(text))
+
+    def _run(self, items, sink):
+        groups = self.plan(items)
+        if self.progress is not None:
+            self.progress.start(sum(len(members) for _, members in groups))
+        if self.settings.pack_size > 1 and len(groups) > 1:
+            groups = self.run_packed(groups, sink)
+
+        work = []
+        for (operation, prompt, system_prompt, max_tokens), members in groups:
+            stop = self.settings.stop if operation == EDIT else None
+            try:
+                request = self.make_request(prompt, system_prompt, max_tokens, stop)
+            except Exception as e:
+                for item in members:
+                    sink.set_error(item, e)
+                self.failed += len(members)
+                self._done(members)
+                continue
+            work.append((members, request, stop))
+
+        if self.stream is None or self.settings.concurrency > 1:
+            self.collect_all(work, sink)
+        else:
+            self.stream_all(work, sink)
+
+    def collect_all(self, work, sink):
+        def apply_result(entry, result):
+            for item in entry[0]:
+                sink.set_result(item, result)
+            self._done(entry[0], result)
+
+        def apply_error(entry, error):
+            for item in entry[0]:
+                sink.set_error(item, error)
+            self.failed += len(entry[0])
+            self._done(entry[0])
+
+        run_parallel(work, lambda entry: self.collect(entry[1], entry[2]), apply_result,
+                     max_workers=self.settings.concurrency, on_error=apply_error,
+                     on_idle=self.on_idle, cancel=self.cancel)
+
+    def stream_all(self, work, sink):
+        for members, request, stop in work:
+            if self.cancelled:
+                break
+            # Stream into the first item, then copy the result to its duplicates
+            first = members[0]
+            chunks = []
+
+            def append(text, first=first, chunks=chunks):
+                chunks.append(text)
+                sink.append(first, text)
+
+            try:
+                sink.begin(first)
+                try:
+                    self.stream(request, append, stop)
+                finally:
+                    sink.end(first)
+                for item in members[1:]:
+                    sink.set_result(item, "".join(chunks))
+            except Exception as e:
+                for item in members:
+                    sink.set_error(item, e)
+                self.failed += len(members)
+            self._done(members, "".join(chunks))
+
+    def run_packed(self, groups, sink):
+        """
+        Send groups pack_size at a time, each pack as one request answered
+        with a JSON array, and pass the results to sink. Returns the groups
+        that still need a request of their own.
+        """
+        pack_size = self.settings.pack_size
+        packs = []
+        leftovers = []
+        for operation in (EXTEND, EDIT):
+            same = [group for group in groups if group[0][0] == operation]
+            if operation == EXTEND:
+                instructions = "For each input, write the text that continues it; each result contains only the continuation."
+            else:
+                instructions = "Edit each input as follows: " + self.settings.instructions + "\nEach result contains only the edited text."
+            for start in range(0, len(same), pack_size):
+                pack = same[start:start + pack_size]
+                if len(pack) < 2:
+                    leftovers.extend(pack)
+                    continue
+                texts = [members[0].text for _, members in pack]
+                system_prompt = pack[0][0][2]
+                max_tokens = sum(key[3] + 8 for key, _ in pack)
+                try:
+                    request = self.make_request(pack_prompt(texts, instructions), system_prompt,
+                                                max_tokens, None)
+                except Exception:
+                    leftovers.extend(pack)
+                    continue
+                packs.append((pack, request, None))
+
+        def apply_result(entry, text):
+            pack = entry[0]
+            for (key, members), result in zip(pack, parse_packed_response(text, len(pack))):
+                if result is None:
+                    leftovers.append((key, members))
+                    continue
+                for item in members:
+                    sink.set_result(item, result)
+                self._done(members, result)
+
+        def apply_error(entry, error):
+            leftovers.extend(entry[0])
+
+        run_parallel(packs, lambda entry: self.collect(entry[1], entry[2]), apply_result,
+                     max_workers=self.settings.concurrency, on_error=apply_error,
+                     on_idle=self.on_idle, cancel=self.cancel)
+        return leftovers
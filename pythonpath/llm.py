@@ -4,20 +4,17 @@ Handles API request building, SSE streaming, and response parsing
 for Ollama, LM Studio, text-generation-webui, OpenAI, and OpenWebUI.
 """
 
+import http.client
 import json
+import socket
 import ssl
+import threading
+import time
+import urllib.error
 import urllib.request
+from collections import namedtuple
 
-
-def as_bool(value):
-    """Convert various types to boolean."""
-    if isinstance(value, bool):
-        return value
-    if isinstance(value, str):
-        return value.strip().lower() in ("1", "true", "yes", "on")
-    if isinstance(value, (int, float)):
-        return value != 0
-    return False
+from config_store import as_bool
 
 
 def is_openai_compatible(endpoint, compatibility_flag):
@@ -25,16 +22,58 @@ def is_openai_compatible(endpoint, compatibility_flag):
     return as_bool(compatibility_flag) or ("api.openai.com" in str(endpoint).lower())
 
 
+def is_openwebui_endpoint(endpoint, openwebui_flag):
+    """OpenWebUI endpoints use /api/ instead of /v1/."""
+    endpoint = str(endpoint).lower()
+    return as_bool(openwebui_flag) or "open-webui" in endpoint or "openwebui" in endpoint
+
+
+def prefix_cache_options(endpoint, openai_compatible=False, is_openwebui=False, keep_alive=""):
+    """
+    Extra request fields that let local servers reuse the cached prompt
+    prefix: cache_prompt for llama.cpp's server and, if given, keep_alive
+    (e.g. "30m") so Ollama keeps the model and its cache loaded. Servers that
+    do not know a field ignore it; OpenAI-compatible and OpenWebUI endpoints
+    get none, as they may reject unknown fields.
+    """
+    if is_openai_compatible(endpoint, openai_compatible) or is_openwebui_endpoint(endpoint, is_openwebui):
+        return {}
+    options = {"cache_prompt": True}
+    keep_alive = str(keep_alive or "").strip()
+    if keep_alive:
+        options["keep_alive"] = keep_alive
+    return options
+
+
+def stream_usage_options(endpoint, openai_compatible=False, is_openwebui=False):
+    """
+    Extra request fields that make the server report token usage at the end
+    of a stream: stream_options.include_usage, which OpenAI, vLLM and
+    Ollama's /v1 need before they send a usage chunk. OpenWebUI endpoints get
+    none, as its /api routes may reject the field.
+    """
+    if is_openwebui_endpoint(endpoint, is_openwebui) and not is_openai_compatible(endpoint, openai_compatible):
+        return {}
+    return {"stream_options": {"include_usage": True}}
+
+
 def build_api_request(prompt, endpoint, api_key="", api_type="completions",
                       model="", is_openwebui=False, openai_compatible=False,
-                      system_prompt="", max_tokens=70, log_fn=None):
+                      system_prompt="", max_tokens=70, log_fn=None, stop=None,
+                      options=None):
     """
     Build a streaming completion/chat request for local or OpenAI-compatible endpoints.
     Returns a urllib.request.Request object.
+    The system prompt always comes first (as the first message, or at the
+    start of the prompt for the completions API) so that requests sharing it
+    share a byte-identical prefix the server can cache.
+    stop is an optional list of stop sequences, sent as "stop" so the server
+    can end generation there.
+    options is an optional dict of extra body fields, such as the result of
+    prefix_cache_options; it never overrides the fields set here.
+    log_fn, if given, receives a debug dump of the request; with None the
+    dump is not even formatted.
     """
-    if log_fn is None:
-        log_fn = lambda msg: None
-
     try:
         max_tokens = int(max_tokens)
     except (TypeError, ValueError):
@@ -45,12 +84,6 @@ def build_api_request(prompt, endpoint, api_key="", api_type="completions",
     api_type = "chat" if str(api_type).lower() == "chat" else "completions"
     model = str(model)
 
-    log_fn(f"=== API Request Debug ===")
-    log_fn(f"Endpoint: {endpoint}")
-    log_fn(f"API Type: {api_type}")
-    log_fn(f"Model: {model}")
-    log_fn(f"Max Tokens: {max_tokens}")
-
     headers = {
         'Content-Type': 'application/json'
     }
@@ -58,16 +91,11 @@ def build_api_request(prompt, endpoint, api_key="", api_type="completions",
     if api_key:
         headers['Authorization'] = f'Bearer {api_key}'
 
-    # Detect OpenWebUI endpoints (they use /api/ instead of /v1/)
-    is_owui = as_bool(is_openwebui) or "open-webui" in endpoint.lower() or "openwebui" in endpoint.lower()
+    is_owui = is_openwebui_endpoint(endpoint, is_openwebui)
     api_path = "/api" if is_owui else "/v1"
 
-    log_fn(f"Is OpenWebUI: {is_owui}")
-    log_fn(f"API Path: {api_path}")
-
     if api_type == "chat":
         url = endpoint + api_path + "/chat/completions"
-        log_fn(f"Full URL: {url}")
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
@@ -96,31 +124,230 @@ def build_api_request(prompt, endpoint, api_key="", api_type="completions",
 
     if model:
         data["model"] = model
+    stop = as_stop_list(stop)
+    if stop:
+        # OpenAI accepts at most four stop sequences
+        data["stop"] = stop[:4] if is_openai_compatible(endpoint, openai_compatible) else stop
+    for key, value in (options or {}).items():
+        data.setdefault(key, value)
 
     json_data = json.dumps(data).encode('utf-8')
-    log_fn(f"Request data: {json.dumps(data, indent=2)}")
-    safe_headers = {k: ("***" if k == "Authorization" else v) for k, v in headers.items()}
-    log_fn(f"Headers: {safe_headers}")
+    if log_fn is not None:
+        log_fn(f"=== API Request Debug ===")
+        log_fn(f"Endpoint: {endpoint}")
+        log_fn(f"API Type: {api_type}")
+        log_fn(f"Model: {model}")
+        log_fn(f"Max Tokens: {max_tokens}")
+        log_fn(f"Is OpenWebUI: {is_owui}")
+        log_fn(f"API Path: {api_path}")
+        log_fn(f"Full URL: {url}")
+        log_fn(f"Request data: {json.dumps(data, indent=2)}")
+        safe_headers = {k: ("***" if k == "Authorization" else v) for k, v in headers.items()}
+        log_fn(f"Headers: {safe_headers}")
 
     request = urllib.request.Request(url, data=json_data, headers=headers)
     request.get_method = lambda: 'POST'
+    request.endpoint = endpoint
     return request
 
 
+def retarget_request(request, endpoint):
+    """
+    Copy of a build_api_request request sent to another endpoint, for
+    identical hosts behind a client-side balancer.
+    """
+    endpoint = str(endpoint).rstrip("/")
+    if endpoint == request.endpoint:
+        return request
+    url = endpoint + request.full_url[len(request.endpoint):]
+    retargeted = urllib.request.Request(url, data=request.data, headers=dict(request.header_items()))
+    retargeted.get_method = lambda: 'POST'
+    retargeted.endpoint = endpoint
+    return retargeted
+
+
 def extract_content(chunk, api_type="completions"):
     """
     Extract text content from API response chunk based on API type.
     Returns (content_text, finish_reason).
     """
+    try:
+        choice = chunk["choices"][0]
+    except (KeyError, IndexError, TypeError):
+        return "", None
     if api_type == "chat":
-        if "choices" in chunk and len(chunk["choices"]) > 0:
-            delta = chunk["choices"][0].get("delta", {})
-            return delta.get("content", ""), chunk["choices"][0].get("finish_reason")
+        delta = choice.get("delta")
+        content = delta.get("content") if delta else None
     else:
-        if "choices" in chunk and len(chunk["choices"]) > 0:
-            return chunk["choices"][0].get("text", ""), chunk["choices"][0].get("finish_reason")
+        content = choice.get("text")
+    return content or "", choice.get("finish_reason")
+
+
+def as_stop_list(value):
+    """Convert a stop sequences setting (a list, or a single string) to a list of non-empty strings."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(s) for s in value if s]
+
+
+class StopMatcher:
+    """
+    Finds stop sequences in streamed text, including ones split across
+    chunks: text that could be the start of a stop sequence is held back
+    until the next chunk shows whether it is one.
+    """
 
-    return "", None
+    def __init__(self, stops):
+        self.stops = as_stop_list(stops)
+        self._held = ""
+
+    def feed(self, text):
+        """Returns (text that can be emitted, True if a stop sequence was found)."""
+        buffer = self._held + text if self._held else text
+        found = [i for i in (buffer.find(s) for s in self.stops) if i >= 0]
+        if found:
+            self._held = ""
+            return buffer[:min(found)], True
+        hold = 0
+        for s in self.stops:
+            for n in range(min(len(s) - 1, len(buffer)), hold, -1):
+                if buffer.endswith(s[:n]):
+                    hold = n
+                    break
+        self._held = buffer[len(buffer) - hold:] if hold else ""
+        return buffer[:len(buffer) - hold], False
+
+    def flush(self):
+        """The held-back text, once the stream has ended without a stop sequence."""
+        held, self._held = self._held, ""
+        return held
+
+
+ServerSentEvent = namedtuple("ServerSentEvent", ["event", "data", "id"])
+
+
+class SSEDecoder:
+    """
+    Incremental Server-Sent Events parser following the WHATWG event-stream
+    format: CR, LF and CRLF line endings, multi-line data fields, event/id/retry
+    fields and comments. Feed it raw bytes in blocks of any size; feed()
+    returns the events completed by that block.
+    """
+
+    def __init__(self):
+        self._buffer = b""
+        self._started = False
+        self._event = ""
+        self._data = []
+        self.last_event_id = ""
+        self.retry = None
+
+    def feed(self, block):
+        buffer = self._buffer + block if self._buffer else block
+        # A trailing CR may be the first half of a CRLF split across blocks
+        end = len(buffer) - 1 if buffer.endswith(b"\r") else len(buffer)
+        cut = max(buffer.rfind(b"\n", 0, end), buffer.rfind(b"\r", 0, end))
+        if cut < 0:
+            self._buffer = buffer
+            return []
+        self._buffer = buffer[cut + 1:]
+        text = buffer[:cut + 1].decode("utf-8")
+        if not self._started:
+            self._started = True
+            if text.startswith("\ufeff"):
+                text = text[1:]
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        events = []
+        for line in text[:-1].split("\n"):
+            self._line(line, events)
+        return events
+
+    def close(self):
+        """
+        Process what is left at the end of the stream, such as a held-back final CR.
+        An event without its terminating blank line is discarded, as the spec says.
+        """
+        buffer, self._buffer = self._buffer, b""
+        if buffer.endswith(b"\r"):
+            # Completing the CR as a CRLF terminates the held-back line
+            return self.feed(buffer + b"\n")
+        return []
+
+    def _line(self, line, events):
+        if not line:
+            if self._data:
+                events.append(ServerSentEvent(self._event or "message",
+                                              "\n".join(self._data), self.last_event_id))
+            self._event = ""
+            self._data = []
+            return
+        if line.startswith("data:"):
+            value = line[5:]
+            self._data.append(value[1:] if value.startswith(" ") else value)
+            return
+        if line[0] == ":":
+            return
+        field, colon, value = line.partition(":")
+        if colon and value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id":
+            if "\0" not in value:
+                self.last_event_id = value
+        elif field == "retry":
+            if value.isdigit():
+                self.retry = int(value)
+
+
+class BufferedSink:
+    """
+    append_callback that batches streamed chunks before writing them out.
+    write_fn receives the text gathered since the previous write; it is called
+    once flush_chars characters are pending or flush_interval seconds have passed
+    since the last write. Call flush() when the stream ends, or discard() to
+    drop the pending text and call discard_fn, which removes what was written.
+    """
+
+    def __init__(self, write_fn, flush_interval=0.1, flush_chars=200, clock=time.monotonic,
+                 discard_fn=None):
+        self.write_fn = write_fn
+        self.discard_fn = discard_fn
+        self.flush_interval = flush_interval
+        self.flush_chars = flush_chars
+        self.clock = clock
+        self._pending = []
+        self._pending_chars = 0
+        self._last_flush = clock()
+
+    def __call__(self, chunk):
+        if not chunk:
+            return
+        self._pending.append(chunk)
+        self._pending_chars += len(chunk)
+        if (self._pending_chars >= self.flush_chars
+                or self.clock() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        self._last_flush = self.clock()
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending = []
+        self._pending_chars = 0
+        self.write_fn(text)
+
+    def discard(self):
+        self._pending = []
+        self._pending_chars = 0
+        if self.discard_fn is not None:
+            self.discard_fn()
 
 
 def make_ssl_context(disable_verification=False):
@@ -133,44 +360,462 @@ def make_ssl_context(disable_verification=False):
     return ssl.create_default_context()
 
 
+class CancelToken:
+    """
+    Cancellation flag shared between the UI thread and running requests.
+    cancel() sets the flag and runs the registered callbacks, which close
+    in-flight sockets so a blocked read returns immediately.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def wait(self, timeout):
+        """Sleep for up to timeout seconds; returns True early once cancelled."""
+        return self._event.wait(timeout)
+
+    def add_callback(self, callback):
+        """Register callback to run on cancel; runs it at once if already cancelled."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+class RequestCancelled(Exception):
+    """Raised when a request is stopped through its CancelToken."""
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP(S) connections shared by every request in the process.
+    Idle connections are keyed by scheme, host:port and the SSL verification
+    settings, so a request never reuses a socket set up with other settings.
+    At most max_idle_per_host are kept per key; reserve() raises the limit
+    to the number of parallel workers, so none of their sockets is closed.
+    """
+
+    def __init__(self, max_idle_per_host=8):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(scheme, host, ssl_context):
+        ssl_key = None
+        if scheme == "https" and ssl_context is not None:
+            ssl_key = (ssl_context.check_hostname, ssl_context.verify_mode)
+        return (scheme, host.lower(), ssl_key)
+
+    def acquire(self, scheme, host, ssl_context):
+        """Return (connection, reused) for the given target."""
+        key = self.key_for(scheme, host, ssl_context)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, context=ssl_context), False
+        return http.client.HTTPConnection(host), False
+
+    def release(self, conn, scheme, host, ssl_context):
+        """Return a connection whose response has been fully read to the pool."""
+        key = self.key_for(scheme, host, ssl_context)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def reserve(self, workers):
+        """Keep up to workers idle connections per key (never lowers the limit)."""
+        with self._lock:
+            self.max_idle_per_host = max(self.max_idle_per_host, int(workers))
+
+    def idle_count(self):
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+    def clear(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+_connection_pool = ConnectionPool()
+
+
+def reserve_connections(workers):
+    """Let the shared pool keep a connection for each of workers parallel requests."""
+    _connection_pool.reserve(workers)
+
+# Errors that mean a reused keep-alive socket was closed by the server
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                            BrokenPipeError, ConnectionResetError, ConnectionAbortedError)
+
+
+def _timed_create_connection(metrics):
+    """
+    Replacement for socket.create_connection that records the name lookup
+    time in metrics.dns_ms separately from the TCP connect.
+    """
+    def create_connection(address, *args):
+        host, port = address
+        started = time.perf_counter()
+        addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        metrics.dns_ms = (time.perf_counter() - started) * 1000.0
+        error = None
+        for _, _, _, _, sockaddr in addresses:
+            try:
+                return socket.create_connection(sockaddr[:2], *args)
+            except OSError as e:
+                error = e
+        raise error
+    return create_connection
+
+
+def _uses_proxy(request):
+    proxies = urllib.request.getproxies()
+    return request.type in proxies and not urllib.request.proxy_bypass(request.host)
+
+
+def open_response(request, ssl_context, pool=None, cancel=None, metrics=None):
+    """
+    Send a urllib Request over a pooled keep-alive connection.
+    Returns (response, release); call release(True) once the response body has
+    been fully read to give the connection back to the pool, or release(False)
+    to close it. HTTP error statuses raise urllib.error.HTTPError like urlopen.
+    Requests that have to go through a proxy fall back to urlopen.
+    If cancel (a CancelToken) fires, the socket is shut down at once.
+    metrics (a metrics.RequestMetrics) receives connection timings and status.
+    """
+    if pool is None:
+        pool = _connection_pool
+    if cancel is not None and cancel.cancelled:
+        raise RequestCancelled()
+
+    if _uses_proxy(request):
+        response = urllib.request.urlopen(request, context=ssl_context)
+        if metrics is not None:
+            metrics.first_byte()
+            metrics.status = response.status
+        if cancel is not None:
+            cancel.add_callback(response.close)
+
+        def release_proxied(reusable):
+            if cancel is not None:
+                cancel.remove_callback(response.close)
+            response.close()
+
+        return response, release_proxied
+
+    scheme, host = request.type, request.host
+    headers = dict(request.header_items())
+    headers.setdefault("User-agent", "localwriter")
+
+    while True:
+        conn, reused = pool.acquire(scheme, host, ssl_context)
+        # getresponse() drops conn.sock for close-delimited responses, so keep
+        # our own reference to the socket for abort()
+        sent_on = []
+
+        def abort(conn=conn, sent_on=sent_on):
+            sock = conn.sock or (sent_on[0] if sent_on else None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+        if cancel is not None:
+            cancel.add_callback(abort)
+        try:
+            if metrics is not None:
+                metrics.reused_connection = reused
+                if not reused:
+                    conn._create_connection = _timed_create_connection(metrics)
+                    started = time.perf_counter()
+                    conn.connect()
+                    metrics.connect_ms = ((time.perf_counter() - started) * 1000.0
+                                          - (metrics.dns_ms or 0.0))
+            conn.request(request.get_method(), request.selector,
+                         body=request.data, headers=headers)
+            sent_on.append(conn.sock)
+            response = conn.getresponse()
+            if metrics is not None:
+                metrics.first_byte()
+                metrics.status = response.status
+        except _STALE_CONNECTION_ERRORS:
+            conn.close()
+            if cancel is not None:
+                cancel.remove_callback(abort)
+                if cancel.cancelled:
+                    raise RequestCancelled()
+            if reused:
+                continue
+            raise
+        except Exception:
+            conn.close()
+            if cancel is not None:
+                cancel.remove_callback(abort)
+                if cancel.cancelled:
+                    raise RequestCancelled()
+            raise
+        break
+
+    def release(reusable):
+        if cancel is not None:
+            cancel.remove_callback(abort)
+            reusable = reusable and not cancel.cancelled
+        if reusable and not response.will_close and response.isclosed():
+            pool.release(conn, scheme, host, ssl_context)
+        else:
+            conn.close()
+
+    if response.status >= 400:
+        response.read()
+        release(True)
+        raise urllib.error.HTTPError(request.full_url, response.status, response.reason,
+                                     response.headers, None)
+    return response, release
+
+
 def stream_response(request, api_type, ssl_context, append_callback,
-                    on_idle=None, log_fn=None):
+                    on_idle=None, log_fn=None, pool=None, cancel=None, metrics=None,
+                    stop=None, on_error=None):
     """
     Stream a completion/chat response and call append_callback with each text chunk.
     on_idle is called after each chunk to allow UI updates (e.g. toolkit.processEventsToIdle).
+    The connection is taken from, and returned to, a process-wide keep-alive pool.
+    cancel is an optional CancelToken; when it fires the stream stops and the
+    connection is closed without reporting an error.
+    metrics is an optional metrics.RequestMetrics filled in with timings,
+    chunk/token counts and bytes received.
+    stop is an optional list of stop sequences: the text is cut where one
+    appears and the connection is closed so the server stops generating.
+    If on_error is given, an error that happens before any text was delivered
+    is passed to on_error(exception) instead of being written as "ERROR: ..."
+    text, so the caller can retry or fail over.
+    Returns True if the whole response was received without errors.
     """
+    debug = log_fn is not None
+    received = []
+    if on_error is not None:
+        deliver = append_callback
+
+        def append_callback(text):
+            if not received:
+                received.append(True)
+            deliver(text)
+
     if log_fn is None:
         log_fn = lambda msg: None
     if on_idle is None:
         on_idle = lambda: None
 
-    log_fn(f"=== Starting stream request ===")
-    log_fn(f"Request URL: {request.full_url}")
-    log_fn(f"Request method: {request.get_method()}")
+    if debug:
+        log_fn(f"=== Starting stream request ===")
+        log_fn(f"Request URL: {request.full_url}")
+        log_fn(f"Request method: {request.get_method()}")
+
+    if metrics is not None:
+        metrics.url = request.full_url
 
     try:
-        with urllib.request.urlopen(request, context=ssl_context) as response:
-            log_fn(f"Response status: {response.status}")
-            log_fn(f"Response headers: {response.headers}")
+        response, release = open_response(request, ssl_context, pool, cancel, metrics)
+        completed = False
+        clean = True
+        try:
+            if debug:
+                log_fn(f"Response status: {response.status}")
+                log_fn(f"Response headers: {response.headers}")
 
-            for line in response:
-                try:
-                    if line.strip() and line.startswith(b"data: "):
-                        payload = line[len(b"data: "):].decode("utf-8").strip()
-                        if payload == "[DONE]":
+            decoder = SSEDecoder()
+            matcher = StopMatcher(stop) if stop else None
+            done = stopped = finished = False
+            while not done:
+                if cancel is not None and cancel.cancelled:
+                    break
+                block = response.read1(65536)
+                events = decoder.feed(block) if block else decoder.close()
+                if metrics is not None:
+                    metrics.bytes_received += len(block)
+                for event in events:
+                    try:
+                        if event.data == "[DONE]":
+                            done = True
                             break
-                        chunk = json.loads(payload)
+                        chunk = json.loads(event.data)
+                        if metrics is not None and isinstance(chunk, dict):
+                            usage = chunk.get("usage")
+                            if usage and usage.get("completion_tokens") is not None:
+                                metrics.completion_tokens = usage["completion_tokens"]
+                        if finished:
+                            # Servers send the include_usage chunk after the finish_reason one
+                            continue
                         content, finish_reason = extract_content(chunk, api_type)
+                        if content and matcher is not None:
+                            content, stopped = matcher.feed(content)
                         if content:
+                            if metrics is not None:
+                                metrics.content()
                             append_callback(content)
                             on_idle()
-                        if finish_reason:
+                        if stopped:
+                            done = True
                             break
-                except Exception as e:
-                    log_fn(f"Error processing line: {str(e)}")
-                    append_callback(str(e))
-                    on_idle()
+                        if finish_reason:
+                            # Read on to [DONE] for usage; the body is drained anyway
+                            finished = True
+                    except Exception as e:
+                        log_fn(f"Error processing line: {str(e)}")
+                        append_callback(str(e))
+                        on_idle()
+                        clean = False
+                if not block:
+                    break
+            if cancel is not None and cancel.cancelled:
+                log_fn("Stream cancelled")
+                if metrics is not None:
+                    metrics.finish("cancelled")
+                return False
+            if stopped:
+                log_fn("Stop sequence reached")
+            else:
+                if matcher is not None:
+                    held = matcher.flush()
+                    if held:
+                        append_callback(held)
+                        on_idle()
+                # Drain the rest of the body so the connection can be reused
+                response.read()
+                completed = True
+        finally:
+            release(completed)
     except Exception as e:
+        if cancel is not None and cancel.cancelled:
+            log_fn("Stream cancelled")
+            if metrics is not None:
+                metrics.finish("cancelled")
+            return False
         log_fn(f"ERROR in stream_response: {str(e)}")
+        if metrics is not None:
+            metrics.finish("error", e)
+        if on_error is not None and not received:
+            on_error(e)
+            return False
         append_callback(f"ERROR: {str(e)}")
         on_idle()
+        return False
+    if metrics is not None:
+        metrics.finish("ok" if clean else "error")
+    return clean
+
+
+EndpointStatus = namedtuple("EndpointStatus", ["reachable", "status", "rtt_ms", "models", "error"])
+
+
+def build_models_request(endpoint, api_key="", is_openwebui=False):
+    """GET request for the model list of an OpenAI-compatible or OpenWebUI endpoint."""
+    endpoint = str(endpoint).rstrip("/")
+    api_path = "/api" if is_openwebui_endpoint(endpoint, is_openwebui) else "/v1"
+    headers = {}
+    if api_key:
+        headers['Authorization'] = f'Bearer {api_key}'
+    return urllib.request.Request(endpoint + api_path + "/models", headers=headers)
+
+
+def parse_model_list(body):
+    """Model names from an OpenAI-style {"data": [{"id": ...}]} or Ollama-style {"models": [{"name": ...}]} listing."""
+    try:
+        listing = json.loads(body)
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(listing, dict):
+        return []
+    entries = listing.get("data")
+    if not isinstance(entries, list):
+        entries = listing.get("models")
+    if not isinstance(entries, list):
+        return []
+    names = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            name = entry.get("id") or entry.get("name")
+            if name:
+                names.append(str(name))
+        elif isinstance(entry, str):
+            names.append(entry)
+    return names
+
+
+def check_endpoint(request, ssl_context, timeout=5.0):
+    """
+    Probe an endpoint with a build_models_request request.
+    Returns an EndpointStatus; an endpoint that answers with an HTTP error
+    (e.g. no /models route) is still reachable.
+    """
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, context=ssl_context, timeout=timeout) as response:
+            body = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        return EndpointStatus(True, e.code, (time.perf_counter() - started) * 1000.0, [], str(e))
+    except (urllib.error.URLError, OSError, ValueError, http.client.HTTPException) as e:
+        return EndpointStatus(False, None, None, [], str(getattr(e, "reason", e)))
+    return EndpointStatus(True, status, (time.perf_counter() - started) * 1000.0,
+                          parse_model_list(body), None)
+
+
+def describe_endpoint_status(status, model=""):
+    """One-line summary of an EndpointStatus for the user."""
+    if not status.reachable:
+        return f"Not reachable: {status.error}"
+    text = f"Reachable in {status.rtt_ms:.0f} ms"
+    if status.error:
+        return text + f" (model list unavailable: {status.error})"
+    text += f", {len(status.models)} model(s)"
+    if status.models:
+        text += ": " + ", ".join(status.models[:5]) + (", ..." if len(status.models) > 5 else "")
+    if model and status.models and model not in status.models:
+        text += f". Model '{model}' not found"
+    return text
+
+
+def warm_up(request, api_type, ssl_context, log_fn=None, cancel=None):
+    """
+    Send a minimal generation request (build it with max_tokens=1) so the
+    server loads the model before real work arrives.
+    Returns (completed, elapsed_ms).
+    """
+    started = time.perf_counter()
+    completed = stream_response(request, api_type, ssl_context, lambda text: None,
+                                log_fn=log_fn, cancel=cancel)
+    return completed, (time.perf_counter() - started) * 1000.0
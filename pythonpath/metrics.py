@@ -0,0 +1,178 @@
+"""
+Request metrics for LocalWriter — no UNO dependencies.
+stream_response fills a RequestMetrics per request; MetricsRecorder
+appends them to a JSON lines file, and summarize() reports p50/p95.
+
+Summarize a metrics file: python metrics.py ~/.localwriter/metrics.jsonl
+"""
+
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+
+class RequestMetrics:
+    """Timings (milliseconds) and counters for a single streaming request."""
+
+    def __init__(self, backend="", model="", clock=time.perf_counter):
+        self.clock = clock
+        self.backend = backend
+        self.model = model
+        self.url = ""
+        self.timestamp = time.time()
+        self.started = clock()
+        self.dns_ms = None
+        self.connect_ms = None
+        self.ttfb_ms = None
+        self.ttft_ms = None
+        self.total_ms = None
+        self.reused_connection = False
+        self.status = None
+        self.chunks = 0
+        self.completion_tokens = None
+        self.bytes_received = 0
+        self.retries = 0
+        self.outcome = None
+        self.error = None
+
+    def elapsed_ms(self):
+        return (self.clock() - self.started) * 1000.0
+
+    def first_byte(self):
+        if self.ttfb_ms is None:
+            self.ttfb_ms = self.elapsed_ms()
+
+    def content(self):
+        """Record a non-empty content delta."""
+        if self.ttft_ms is None:
+            self.ttft_ms = self.elapsed_ms()
+        self.chunks += 1
+
+    def finish(self, outcome, error=None):
+        self.total_ms = self.elapsed_ms()
+        self.outcome = outcome
+        if error is not None:
+            self.error = str(error)
+
+    @property
+    def tokens(self):
+        """Completion tokens reported by the server, else the number of content chunks."""
+        return self.completion_tokens if self.completion_tokens is not None else self.chunks
+
+    def as_dict(self):
+        def ms(value):
+            return None if value is None else round(value, 3)
+
+        tokens_per_second = None
+        if self.total_ms and self.ttft_ms is not None and self.total_ms > self.ttft_ms:
+            tokens_per_second = round(self.tokens / ((self.total_ms - self.ttft_ms) / 1000.0), 3)
+        return {
+            "type": "request",
+            "timestamp": round(self.timestamp, 3),
+            "backend": self.backend,
+            "model": self.model,
+            "url": self.url,
+            "status": self.status,
+            "outcome": self.outcome,
+            "error": self.error,
+            "reused_connection": self.reused_connection,
+            "dns_ms": ms(self.dns_ms),
+            "connect_ms": ms(self.connect_ms),
+            "ttfb_ms": ms(self.ttfb_ms),
+            "ttft_ms": ms(self.ttft_ms),
+            "total_ms": ms(self.total_ms),
+            "chunks": self.chunks,
+            "tokens": self.tokens,
+            "bytes_received": self.bytes_received,
+            "retries": self.retries,
+            "tokens_per_second": tokens_per_second,
+        }
+
+
+class MetricsRecorder:
+    """Appends metrics records to a JSON lines file; safe to share between threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, record):
+        if isinstance(record, RequestMetrics):
+            record = record.as_dict()
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+_recorders = {}
+_recorders_lock = threading.Lock()
+
+
+def get_recorder(path):
+    """Return the process-wide MetricsRecorder for path."""
+    with _recorders_lock:
+        recorder = _recorders.get(path)
+        if recorder is None:
+            recorder = _recorders[path] = MetricsRecorder(path)
+        return recorder
+
+
+def load_records(path):
+    """Read a JSON lines metrics file, skipping lines that do not parse."""
+    records = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return records
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values (pct in 0-100); None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+SUMMARY_FIELDS = ("dns_ms", "connect_ms", "ttfb_ms", "ttft_ms", "total_ms",
+                  "tokens", "bytes_received", "tokens_per_second")
+
+
+def summarize(records):
+    """p50/p95 of each timing field plus counts per outcome and backend."""
+    requests = [r for r in records if r.get("type", "request") == "request"]
+    summary = {"requests": len(requests), "outcomes": {}, "backends": {}}
+    for r in requests:
+        outcome = r.get("outcome") or "unknown"
+        backend = r.get("backend") or "unknown"
+        summary["outcomes"][outcome] = summary["outcomes"].get(outcome, 0) + 1
+        summary["backends"][backend] = summary["backends"].get(backend, 0) + 1
+    for field in SUMMARY_FIELDS:
+        values = [r[field] for r in requests if isinstance(r.get(field), (int, float))]
+        summary[field] = {"p50": percentile(values, 50), "p95": percentile(values, 95),
+                          "count": len(values)}
+    return summary
+
+
+def main(argv):
+    path = argv[1] if len(argv) > 1 else os.path.join(
+        os.path.expanduser('~'), '.localwriter', 'metrics.jsonl')
+    print(json.dumps(summarize(load_records(path)), indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,100 @@
+"""
+Progress of long LocalWriter jobs — no UNO dependencies.
+The job engine reports finished items (and the tokens they produced) to a
+Progress, which works out throughput and the time left and passes a
+snapshot to its listeners, each at most once per its own interval: the
+status bar every half second, the metrics log every few seconds.
+"""
+
+import time
+
+
+class Progress:
+    """
+    Completed/total items of one job with items/s, tokens/s and an ETA.
+    advance() is cheap: listeners are only called when their interval has
+    passed, and always by start() and finish().
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.total = 0
+        self.done = 0
+        self.tokens = 0
+        self.started = clock()
+        self.finished = False
+        self._listeners = []  # [callback, interval, last call]
+
+    def add_listener(self, callback, interval=0.5):
+        """Call callback(snapshot) at most every interval seconds."""
+        self._listeners.append([callback, interval, None])
+
+    def start(self, total):
+        self.total = total
+        self.done = 0
+        self.tokens = 0
+        self.started = self.clock()
+        self.finished = False
+        self._notify(force=True)
+
+    def advance(self, items=1, tokens=0):
+        """Count items as finished, having produced tokens (estimated) tokens."""
+        self.done += items
+        self.tokens += tokens
+        self._notify()
+
+    def finish(self):
+        self.finished = True
+        self._notify(force=True)
+
+    def snapshot(self):
+        """The current state as a metrics record (type "progress")."""
+        elapsed = max(self.clock() - self.started, 0.0)
+        items_per_second = self.done / elapsed if elapsed > 0 else None
+        tokens_per_second = self.tokens / elapsed if elapsed > 0 else None
+        eta = None
+        if items_per_second:
+            eta = max(self.total - self.done, 0) / items_per_second
+        return {
+            "type": "progress",
+            "timestamp": round(time.time(), 3),
+            "done": self.done,
+            "total": self.total,
+            "finished": self.finished,
+            "elapsed_s": round(elapsed, 3),
+            "items_per_second": None if items_per_second is None else round(items_per_second, 3),
+            "tokens_per_second": None if tokens_per_second is None else round(tokens_per_second, 3),
+            "eta_s": None if eta is None else round(eta, 3),
+        }
+
+    def _notify(self, force=False):
+        now = self.clock()
+        due = [listener for listener in self._listeners
+               if force or listener[2] is None or now - listener[2] >= listener[1]]
+        if not due:
+            return
+        snapshot = self.snapshot()
+        for listener in due:
+            listener[2] = now
+            listener[0](snapshot)
+
+
+def format_duration(seconds):
+    """12 -> "12s", 137 -> "2m 17s", 7260 -> "2h 01m"."""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+
+
+def format_progress(snapshot):
+    """One line for the status bar, e.g. "12/300 - 2.1/s - 35 tokens/s - ETA 2m 17s"."""
+    parts = [f"{snapshot['done']}/{snapshot['total']}"]
+    if snapshot["items_per_second"] is not None and snapshot["done"]:
+        parts.append(f"{snapshot['items_per_second']:.1f}/s")
+        parts.append(f"{snapshot['tokens_per_second']:.0f} tokens/s")
+        if not snapshot["finished"] and snapshot["eta_s"] is not None:
+            parts.append("ETA " + format_duration(snapshot["eta_s"]))
+    return " - ".join(parts)
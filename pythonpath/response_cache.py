@@ -0,0 +1,160 @@
+"""
+On-disk response cache for LocalWriter — no UNO dependencies.
+Stores the text of completed responses keyed by a hash of the request
+URL and JSON body, with a size-bounded LRU and a time-to-live.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    One file per response under directory. Entries older than ttl seconds are
+    ignored; once the cache grows past max_bytes the least recently used
+    entries are removed.
+    """
+
+    def __init__(self, directory, max_bytes=50 * 1024 * 1024, ttl=7 * 24 * 3600,
+                 clock=time.time):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self._index = None  # key -> size, least recently used first
+        self._total = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(request):
+        """Hash of everything that determines the response: URL, model and body."""
+        digest = hashlib.sha256(request.full_url.encode("utf-8"))
+        digest.update(b"\n")
+        digest.update(request.data or b"")
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".txt")
+
+    def _load_index(self):
+        """Build the LRU index from the files on disk. Caller holds the lock."""
+        if self._index is not None:
+            return
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            names = []
+        for name in names:
+            if not name.endswith(".txt"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name[:-len(".txt")], st.st_size))
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total = sum(self._index.values())
+
+    def _remove(self, key):
+        size = self._index.pop(key, 0)
+        self._total -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def get(self, key):
+        """Return the cached text for key, or None on a miss or expired entry."""
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                return None
+            path = self._path(key)
+            try:
+                if self.clock() - os.stat(path).st_mtime > self.ttl:
+                    self._remove(key)
+                    return None
+                with open(path, "r", encoding="utf-8") as f:
+                    text = f.read()
+            except OSError:
+                self._remove(key)
+                return None
+            self._index.move_to_end(key)
+            return text
+
+    def put(self, key, text):
+        """Store text under key, evicting least recently used entries as needed."""
+        data = text.encode("utf-8")
+        with self._lock:
+            self._load_index()
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self._path(key))
+            except OSError:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+            self._total += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            while self._total > self.max_bytes and len(self._index) > 1:
+                self._remove(next(iter(self._index)))
+
+    def clear(self):
+        with self._lock:
+            self._load_index()
+            for key in list(self._index):
+                self._remove(key)
+
+
+def stream_with_cache(cache, request, append_callback, stream):
+    """
+    Replay a cached response for request through append_callback, or call
+    stream(callback) and cache the text it produced if it returns True
+    (the response completed without errors). cache may be None.
+    """
+    if cache is None:
+        return stream(append_callback)
+
+    key = cache.key_for(request)
+    text = cache.get(key)
+    if text is not None:
+        if text:
+            append_callback(text)
+        return True
+
+    chunks = []
+
+    def record(chunk):
+        chunks.append(chunk)
+        append_callback(chunk)
+
+    completed = stream(record)
+    if completed:
+        cache.put(key, "".join(chunks))
+    return completed
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(directory, max_bytes=50 * 1024 * 1024, ttl=7 * 24 * 3600):
+    """Return the process-wide ResponseCache for directory with the given limits."""
+    with _caches_lock:
+        cache = _caches.get(directory)
+        if cache is None:
+            cache = _caches[directory] = ResponseCache(directory, max_bytes, ttl)
+        cache.max_bytes = max_bytes
+        cache.ttl = ttl
+        return cache
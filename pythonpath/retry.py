@@ -0,0 +1,203 @@
+"""
+Retries for LocalWriter requests — no UNO dependencies.
+Transient failures (connection errors, 429 and 5xx) that happen before the
+first token are retried with exponential backoff and jitter, honouring the
+Retry-After and rate-limit headers servers send. A shared Throttle pauses
+every request when the server says the rate limit was hit, so a large batch
+slows down to the allowed rate instead of failing cell after cell.
+"""
+
+import email.utils
+import random as _random
+import re
+import threading
+import time
+import urllib.error
+
+from llm import stream_response
+from balancer import is_failover_error
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value):
+    """
+    Seconds from a rate-limit duration such as "20", "1.5", "6m0s" or "59ms";
+    None if value cannot be read.
+    """
+    value = str(value).strip().lower()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(n + unit for n, unit in parts) != value:
+        return None
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(n) * scale[unit] for n, unit in parts)
+
+
+def retry_after(headers, now=None):
+    """
+    Seconds the server asks us to wait, from Retry-After (seconds or an HTTP
+    date), retry-after-ms, or the x-ratelimit-reset-* headers of a limit
+    that is used up. None if the headers carry no hint.
+    """
+    if not headers:
+        return None
+    if now is None:
+        now = time.time()
+    value = headers.get("retry-after-ms")
+    if value is not None and parse_duration(value) is not None:
+        return parse_duration(value) / 1000.0
+    value = headers.get("Retry-After")
+    if value is not None:
+        seconds = parse_duration(value)
+        if seconds is not None:
+            return seconds
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - now)
+        except (TypeError, ValueError, IndexError):
+            pass
+    waits = []
+    for limit in ("requests", "tokens"):
+        remaining = headers.get(f"x-ratelimit-remaining-{limit}")
+        reset = headers.get(f"x-ratelimit-reset-{limit}")
+        if reset is not None and remaining in (None, "0"):
+            waits.append(parse_duration(reset))
+    value = headers.get("RateLimit-Reset") or headers.get("x-ratelimit-reset")
+    if value is not None:
+        seconds = parse_duration(value)
+        # Some servers send the reset time as a Unix timestamp
+        waits.append(seconds - now if seconds is not None and seconds > 1e9 else seconds)
+    waits = [max(0.0, w) for w in waits if w is not None]
+    return max(waits) if waits else None
+
+
+def is_rate_limited(error):
+    """True if error is a 429, or any HTTP error telling us when to come back."""
+    if not isinstance(error, urllib.error.HTTPError):
+        return False
+    return error.code == 429 or retry_after(error.headers) is not None
+
+
+class Throttle:
+    """
+    A pause shared by all requests; safe to share between threads. pause()
+    holds every request back until the given time has passed, and wait()
+    blocks until then.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        with self._lock:
+            self._resume_at = max(self._resume_at, self.clock() + seconds)
+
+    def remaining(self):
+        """Seconds until requests may be sent again."""
+        with self._lock:
+            return max(0.0, self._resume_at - self.clock())
+
+    def wait(self, cancel=None):
+        """Block while paused; returns False if cancel (a CancelToken) fired."""
+        while True:
+            remaining = self.remaining()
+            if remaining <= 0:
+                return not (cancel is not None and cancel.cancelled)
+            if not sleep(remaining, cancel):
+                return False
+
+
+def sleep(seconds, cancel=None):
+    """time.sleep that returns False early once cancel (a CancelToken) fires."""
+    if cancel is None:
+        time.sleep(seconds)
+        return True
+    return not cancel.wait(seconds)
+
+
+class RetryPolicy:
+    """
+    How often and how long to wait before retrying a failed request.
+    Without a server hint, retry n waits between half and all of
+    min(max_delay, base_delay * 2 ** n) seconds. A Retry-After or rate-limit
+    reset hint is honoured as long as it is at most max_wait seconds.
+    throttle is an optional Throttle paused on rate limits so that other
+    requests wait as well.
+    """
+
+    def __init__(self, max_retries=3, base_delay=1.0, max_delay=30.0, max_wait=120.0,
+                 throttle=None, random=_random.random):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.throttle = throttle
+        self.random = random
+
+    def delay(self, attempt, error):
+        """Seconds to wait before retry number attempt (from 0) after error; None to give up."""
+        if attempt >= self.max_retries or not is_failover_error(error):
+            return None
+        hint = retry_after(getattr(error, "headers", None))
+        if hint is not None:
+            if hint > self.max_wait:
+                return None
+            # Spread out the requests that all resume when the limit resets
+            return hint + self.random() * self.base_delay
+        backoff = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return backoff / 2 + self.random() * backoff / 2
+
+
+def stream_with_retry(policy, request, api_type, ssl_context, append_callback,
+                      stream=stream_response, **kwargs):
+    """
+    stream_response (or stream, a function with the same signature such as a
+    partial of stream_with_failover) retried according to policy when it
+    fails with a connection error, 429 or 5xx before any text arrived. Once
+    text has been delivered the request is never repeated. kwargs are passed
+    to stream; metrics.retries counts the retries.
+    Returns the result of the last attempt.
+    """
+    cancel = kwargs.get("cancel")
+    log_fn = kwargs.get("log_fn")
+    metrics = kwargs.get("metrics")
+    on_error = kwargs.pop("on_error", None)
+    attempt = 0
+    while True:
+        if policy.throttle is not None and not policy.throttle.wait(cancel):
+            return False
+        errors = []
+        result = stream(request, api_type, ssl_context, append_callback,
+                        on_error=errors.append, **kwargs)
+        if not errors:
+            return result
+        error = errors[0]
+        delay = None if cancel is not None and cancel.cancelled else policy.delay(attempt, error)
+        if delay is None:
+            if on_error is not None:
+                on_error(error)
+            else:
+                append_callback(f"ERROR: {str(error)}")
+            return False
+        if log_fn is not None:
+            log_fn(f"Retrying in {delay:.2f}s after: {str(error)}")
+        if metrics is not None:
+            metrics.retries += 1
+        attempt += 1
+        if policy.throttle is not None and is_rate_limited(error):
+            policy.throttle.pause(delay)
+        elif not sleep(delay, cancel):
+            return False
+
+
+_throttle = Throttle()
+
+
+def get_throttle():
+    """Return the process-wide Throttle shared by all requests."""
+    return _throttle
@@ -0,0 +1,138 @@
+"""
+Token count estimates for LocalWriter — no UNO dependencies.
+Sizes max_tokens from the text to be produced instead of treating each
+character as a token. The default heuristic is UTF-8 bytes / 4; the ratio
+for each model is calibrated from the completion token counts that servers
+report, and saved so calibration survives restarts.
+"""
+
+import math
+import threading
+import time
+
+from config_store import get_store
+
+DEFAULT_BYTES_PER_TOKEN = 4.0
+# Shortest response worth calibrating from; token counts of a few words are too coarse
+MIN_CALIBRATION_BYTES = 200
+# Once warmed up, each observation moves the ratio this far towards what it measured
+SMOOTHING = 0.1
+
+
+def estimate_tokens(text, bytes_per_token=DEFAULT_BYTES_PER_TOKEN):
+    """Rough token count of text: about four UTF-8 bytes per token."""
+    if not text:
+        return 0
+    return int(math.ceil(len(text.encode("utf-8")) / bytes_per_token))
+
+
+class TokenEstimator:
+    """
+    Heuristic token counter with a bytes-per-token ratio learned from observed
+    usage. Subclass and override count() to plug in an exact tokenizer.
+    """
+
+    def __init__(self, bytes_per_token=DEFAULT_BYTES_PER_TOKEN, samples=0):
+        self.bytes_per_token = bytes_per_token
+        self.samples = samples
+
+    def count(self, text):
+        return estimate_tokens(text, self.bytes_per_token)
+
+    def budget(self, text, extra=0, margin=1.25):
+        """max_tokens for a response about as long as text, with margin to spare, plus extra."""
+        return int(math.ceil(self.count(text) * margin)) + max(extra, 0)
+
+    def observe(self, text, tokens):
+        """
+        Calibrate from a response of text that the server counted as tokens.
+        Returns True if the observation was used.
+        """
+        size = len(text.encode("utf-8"))
+        if not tokens or tokens <= 0 or size < MIN_CALIBRATION_BYTES:
+            return False
+        ratio = min(max(size / float(tokens), 1.0), 16.0)
+        self.samples += 1
+        # A running mean over the first samples (the default counts as one), then a moving average
+        weight = max(1.0 / (self.samples + 1), SMOOTHING)
+        self.bytes_per_token += (ratio - self.bytes_per_token) * weight
+        return True
+
+
+class TokenCalibration:
+    """
+    One TokenEstimator per model. Calibrated ratios are kept in a JSON file
+    (through config_store) when path is given: the first observation is
+    saved at once, later ones at most every save_interval seconds and by
+    save(), which callers run when a job ends.
+    """
+
+    def __init__(self, path=None, save_interval=30.0, clock=time.monotonic):
+        self.path = path
+        self.save_interval = save_interval
+        self.clock = clock
+        self._estimators = {}
+        self._dirty = set()
+        self._last_save = None
+        self._lock = threading.Lock()
+
+    def estimator(self, model):
+        with self._lock:
+            estimator = self._estimators.get(model)
+            if estimator is None:
+                estimator = TokenEstimator()
+                saved = get_store(self.path).get(model) if self.path else None
+                if isinstance(saved, dict):
+                    try:
+                        estimator = TokenEstimator(float(saved["bytes_per_token"]),
+                                                   int(saved.get("samples", 0)))
+                    except (KeyError, TypeError, ValueError):
+                        pass
+                self._estimators[model] = estimator
+            return estimator
+
+    def set_estimator(self, model, estimator):
+        """Use estimator (e.g. one backed by a real tokenizer) for model."""
+        with self._lock:
+            self._estimators[model] = estimator
+
+    def observe(self, model, text, tokens):
+        estimator = self.estimator(model)
+        with self._lock:
+            if not estimator.observe(text, tokens) or not self.path:
+                return
+            self._dirty.add(model)
+            if (self._last_save is not None
+                    and self.clock() - self._last_save < self.save_interval):
+                return
+        self.save()
+
+    def save(self):
+        """Write the models calibrated since the last save to the file."""
+        with self._lock:
+            if not self._dirty or not self.path:
+                return
+            dirty, self._dirty = self._dirty, set()
+            values = {model: {"bytes_per_token": round(self._estimators[model].bytes_per_token, 4),
+                              "samples": self._estimators[model].samples}
+                      for model in dirty}
+            self._last_save = self.clock()
+        try:
+            get_store(self.path).update(values)
+        except BaseException:
+            with self._lock:
+                self._dirty |= dirty
+            raise
+
+
+_calibrations = {}
+_calibrations_lock = threading.Lock()
+
+
+def get_calibration(path):
+    """Return the process-wide TokenCalibration saved at path."""
+    with _calibrations_lock:
+        calibration = _calibrations.get(path)
+        if calibration is None:
+            calibration = _calibrations[path] = TokenCalibration(path)
+        return calibration
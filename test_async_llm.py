@@ -0,0 +1,302 @@
+"""
+Test suite for the LocalWriter asyncio streaming client.
+Tests pythonpath/async_llm.py directly — no UNO dependencies required.
+
+Run: pytest test_async_llm.py -v
+"""
+
+import asyncio
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
+
+from llm import build_api_request, make_ssl_context, CancelToken
+from async_llm import stream_async, collect_async, run_async_parallel
+from metrics import RequestMetrics
+from test_metrics import TRAILING_USAGE_CHUNKS
+from test_llm import (SSEHandler, SlowSSEHandler, ErrorHandler, KeepAliveSSEHandler,
+                      StopThenStallHandler, COMPLETIONS_CHUNKS, CHAT_CHUNKS,
+                      start_mock_server)
+
+
+class ChunkedSSEHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 SSE handler using chunked transfer encoding, like llama.cpp or Ollama."""
+    protocol_version = "HTTP/1.1"
+    chunks = []
+
+    def do_POST(self):
+        content_length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(content_length)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for line in self.__class__.chunks + ["data: [DONE]"]:
+            data = line.encode("utf-8") + b"\n\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(handler_class, chunks=None, server_class=ThreadingHTTPServer):
+    class Handler(handler_class):
+        captured_requests = []
+    if chunks is not None:
+        Handler.chunks = list(chunks)
+    server, port = start_mock_server(Handler, server_class)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def collect(endpoint, api_type="completions", **kwargs):
+    request = build_api_request("Hello", endpoint=endpoint, api_type=api_type)
+    return asyncio.run(collect_async(request, api_type, make_ssl_context(), **kwargs))
+
+
+@pytest.fixture
+def tls_server(tmp_path):
+    """An SSE server on https://localhost with a self-signed certificate; yields (endpoint, cert)."""
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is not installed")
+    cert, key = str(tmp_path / "cert.pem"), str(tmp_path / "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+                    "-keyout", key, "-out", cert, "-days", "1", "-subj", "/CN=localhost",
+                    "-addext", "subjectAltName=DNS:localhost"],
+                   check=True, capture_output=True)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+
+    class Handler(SSEHandler):
+        chunks = list(COMPLETIONS_CHUNKS)
+        captured_requests = []
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    try:
+        yield f"https://localhost:{port}", cert
+    finally:
+        server.shutdown()
+
+
+# ---------------------------------------------------------------------------
+# Integration Tests — stream_async
+# ---------------------------------------------------------------------------
+
+class TestStreamAsync:
+
+    def test_close_delimited_completions(self):
+        server, endpoint = serve(SSEHandler, COMPLETIONS_CHUNKS)
+        try:
+            assert collect(endpoint) == "Once upon a time"
+        finally:
+            server.shutdown()
+
+    def test_chat(self):
+        server, endpoint = serve(SSEHandler, CHAT_CHUNKS)
+        try:
+            assert collect(endpoint, api_type="chat") == "Hello world!"
+        finally:
+            server.shutdown()
+
+    def test_content_length_body(self):
+        server, endpoint = serve(KeepAliveSSEHandler, COMPLETIONS_CHUNKS)
+        try:
+            assert collect(endpoint) == "Once upon a time"
+        finally:
+            server.shutdown()
+
+    def test_chunked_body(self):
+        server, endpoint = serve(ChunkedSSEHandler, COMPLETIONS_CHUNKS)
+        try:
+            assert collect(endpoint) == "Once upon a time"
+        finally:
+            server.shutdown()
+
+    def test_yields_finish_reason(self):
+        server, endpoint = serve(SSEHandler, COMPLETIONS_CHUNKS)
+
+        async def run():
+            request = build_api_request("Hello", endpoint=endpoint)
+            return [item async for item in stream_async(request, "completions")]
+
+        try:
+            assert asyncio.run(run()) == [("Once ", None), ("upon ", None),
+                                          ("a time", "stop")]
+        finally:
+            server.shutdown()
+
+    def test_http_error_raises(self):
+        server, endpoint = serve(ErrorHandler)
+
+        async def run():
+            request = build_api_request("Hello", endpoint=endpoint)
+            async for _ in stream_async(request, "completions"):
+                pass
+
+        try:
+            with pytest.raises(urllib.error.HTTPError) as info:
+                asyncio.run(run())
+            assert info.value.code == 500
+            assert info.value.read() == b"Internal Server Error"
+        finally:
+            server.shutdown()
+
+    def test_collect_reports_errors_as_text(self):
+        server, endpoint = serve(ErrorHandler)
+        try:
+            assert collect(endpoint).startswith("ERROR:")
+        finally:
+            server.shutdown()
+
+    def test_metrics(self):
+        server, endpoint = serve(SSEHandler, COMPLETIONS_CHUNKS)
+        try:
+            metrics = RequestMetrics()
+            collect(endpoint, metrics=metrics)
+            assert metrics.status == 200
+            assert metrics.chunks == 3
+            assert metrics.outcome == "ok"
+            assert metrics.bytes_received > 0
+            assert metrics.ttft_ms is not None
+        finally:
+            server.shutdown()
+
+    def test_https_verifies_with_default_context(self, tls_server):
+        endpoint, cert = tls_server
+        request = build_api_request("Hello", endpoint=endpoint)
+
+        async def consume(ssl_context):
+            return [content async for content, _ in stream_async(request, "completions",
+                                                                 ssl_context)]
+
+        with pytest.raises(ssl.SSLCertVerificationError):
+            asyncio.run(consume(None))
+        trusted = ssl.create_default_context(cafile=cert)
+        assert "".join(asyncio.run(consume(trusted))) == "Once upon a time"
+
+    def test_trailing_usage_chunk(self):
+        server, endpoint = serve(SSEHandler, TRAILING_USAGE_CHUNKS)
+        try:
+            metrics = RequestMetrics()
+            assert collect(endpoint, metrics=metrics) == "Hi!"
+            assert metrics.completion_tokens == 4
+        finally:
+            server.shutdown()
+
+    def test_stop_sequence_ends_stream(self):
+        server, endpoint = serve(StopThenStallHandler)
+
+        async def run():
+            request = build_api_request("Hello", endpoint=endpoint)
+            return [item async for item in stream_async(request, "completions",
+                                                        stop=["END OF DOCUMENT"])]
+
+        try:
+            started = time.monotonic()
+            items = asyncio.run(run())
+            assert time.monotonic() - started < SlowSSEHandler.stall_seconds
+            assert "".join(content for content, _ in items) == "Edited text.\n"
+            assert items[-1][1] == "stop"
+        finally:
+            server.shutdown()
+
+    def test_cancel_unblocks_stalled_stream(self):
+        server, endpoint = serve(SlowSSEHandler)
+        try:
+            token = CancelToken()
+            metrics = RequestMetrics()
+            threading.Timer(0.2, token.cancel).start()
+            started = time.monotonic()
+            text = collect(endpoint, cancel=token, metrics=metrics)
+            assert time.monotonic() - started < SlowSSEHandler.stall_seconds
+            assert text == "Once "
+            assert metrics.outcome == "cancelled"
+        finally:
+            server.shutdown()
+
+
+# ---------------------------------------------------------------------------
+# Integration Tests — run_async_parallel
+# ---------------------------------------------------------------------------
+
+class TestRunAsyncParallel:
+
+    def test_many_requests_on_one_loop_thread(self):
+        server, endpoint = serve(SSEHandler, COMPLETIONS_CHUNKS)
+        try:
+            ssl_ctx = make_ssl_context()
+            loop_threads, results = set(), {}
+            caller = threading.current_thread()
+            applied_on = set()
+
+            async def fetch(cell):
+                loop_threads.add(threading.current_thread())
+                return await collect_async(build_api_request(cell, endpoint=endpoint),
+                                           "completions", ssl_ctx)
+
+            def on_result(cell, text):
+                applied_on.add(threading.current_thread())
+                results[cell] = text
+
+            cells = [f"cell {i}" for i in range(20)]
+            run_async_parallel(cells, fetch, on_result, max_in_flight=10)
+            assert results == {cell: "Once upon a time" for cell in cells}
+            assert len(loop_threads) == 1
+            assert applied_on == {caller}
+        finally:
+            server.shutdown()
+
+    def test_limits_requests_in_flight(self):
+        active, peak = [], []
+
+        async def worker(task):
+            active.append(task)
+            peak.append(len(active))
+            await asyncio.sleep(0.02)
+            active.remove(task)
+            return task
+
+        results = {}
+        run_async_parallel(range(12), worker, results.__setitem__, max_in_flight=4)
+        assert max(peak) == 4
+        assert results == {n: n for n in range(12)}
+
+    def test_errors_reported(self):
+        async def worker(task):
+            if task == 1:
+                raise ValueError("boom")
+            return task
+
+        results, errors = {}, {}
+        run_async_parallel(range(3), worker, results.__setitem__,
+                           on_error=errors.__setitem__)
+        assert sorted(results) == [0, 2]
+        assert str(errors[1]) == "boom"
+
+    def test_cancel_skips_pending_tasks(self):
+        token = CancelToken()
+        started = []
+
+        async def worker(task):
+            started.append(task)
+            token.cancel()
+            return task
+
+        run_async_parallel(range(10), worker, lambda task, result: pytest.fail("applied"),
+                           max_in_flight=1, cancel=token)
+        assert started == [0]
@@ -0,0 +1,252 @@
+"""
+Test suite for LocalWriter endpoint load balancing and failover.
+Tests pythonpath/balancer.py directly — no UNO dependencies required.
+
+Run: pytest test_balancer.py -v
+"""
+
+import errno
+import http.client
+import os
+import socket
+import ssl
+import sys
+import urllib.error
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
+
+from llm import build_api_request, make_ssl_context, retarget_request, CancelToken
+from balancer import EndpointBalancer, is_failover_error, stream_with_failover
+from batch import collect_response
+from test_llm import SSEHandler, ErrorHandler, COMPLETIONS_CHUNKS, FakeClock, start_mock_server
+
+CLOSED = "http://127.0.0.1:1"
+
+
+def serve(handler_class):
+    class Handler(handler_class):
+        chunks = list(COMPLETIONS_CHUNKS)
+        captured_requests = []
+    server, port = start_mock_server(Handler, ThreadingHTTPServer)
+    return server, Handler, f"http://127.0.0.1:{port}"
+
+
+def stream(balancer, **kwargs):
+    request = build_api_request("Hello", endpoint=balancer.endpoints[0])
+    accumulated = []
+    result = stream_with_failover(balancer, request, "completions", make_ssl_context(),
+                                  accumulated.append, **kwargs)
+    return result, "".join(accumulated)
+
+
+class BadRequestHandler(ErrorHandler):
+    def do_POST(self):
+        self.send_response(400)
+        self.send_header("Content-Type", "text/plain")
+        self.end_headers()
+        self.wfile.write(b"Bad Request")
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — EndpointBalancer
+# ---------------------------------------------------------------------------
+
+class TestEndpointBalancer:
+
+    def test_spreads_over_least_outstanding(self):
+        balancer = EndpointBalancer(["http://a", "http://b", "http://c"])
+        picked = [balancer.acquire() for _ in range(3)]
+        assert sorted(picked) == ["http://a", "http://b", "http://c"]
+        balancer.release("http://b", ok=True)
+        assert balancer.acquire() == "http://b"
+
+    def test_round_robin_when_idle(self):
+        balancer = EndpointBalancer(["http://a", "http://b"])
+        picked = []
+        for _ in range(4):
+            endpoint = balancer.acquire()
+            picked.append(endpoint)
+            balancer.release(endpoint, ok=True)
+        assert picked == ["http://a", "http://b", "http://a", "http://b"]
+
+    def test_deduplicates_and_strips_slashes(self):
+        balancer = EndpointBalancer(["http://a/", "http://a", "", "http://b"])
+        assert balancer.endpoints == ["http://a", "http://b"]
+
+    def test_latency_strategy_prefers_fast_endpoint(self):
+        balancer = EndpointBalancer(["http://slow", "http://fast"], strategy="latency")
+        for endpoint, latency in (("http://slow", 2.0), ("http://fast", 0.5)):
+            assert balancer.acquire(exclude=[e for e in balancer.endpoints
+                                             if e != endpoint]) == endpoint
+            balancer.release(endpoint, ok=True, latency=latency)
+        # (outstanding + 1) * latency: fast stays ahead until 4 * 0.5 == 1 * 2.0
+        assert [balancer.acquire() for _ in range(3)] == ["http://fast"] * 3
+        assert balancer.acquire() == "http://slow"
+
+    def test_unknown_strategy_falls_back(self):
+        assert EndpointBalancer(["http://a"], strategy="random").strategy == "least_outstanding"
+
+    def test_failed_endpoint_cools_down(self):
+        clock = FakeClock()
+        balancer = EndpointBalancer(["http://a", "http://b"], cooldown=30, clock=clock)
+        balancer.release(balancer.acquire(), ok=False)
+        assert balancer.is_down("http://a")
+        for _ in range(3):
+            endpoint = balancer.acquire()
+            assert endpoint == "http://b"
+            balancer.release(endpoint, ok=True)
+        clock.now += 31
+        assert not balancer.is_down("http://a")
+        assert balancer.acquire() == "http://a"
+
+    def test_all_down_still_picks_one(self):
+        balancer = EndpointBalancer(["http://a", "http://b"], clock=FakeClock())
+        for endpoint in ("http://a", "http://b"):
+            balancer.acquire(exclude=[e for e in balancer.endpoints if e != endpoint])
+            balancer.release(endpoint, ok=False)
+        assert balancer.acquire() in ("http://a", "http://b")
+
+    def test_exclude_everything(self):
+        balancer = EndpointBalancer(["http://a"])
+        assert balancer.acquire(exclude=["http://a"]) is None
+
+    def test_release_counts_down(self):
+        balancer = EndpointBalancer(["http://a"])
+        balancer.acquire()
+        balancer.acquire()
+        assert balancer.outstanding("http://a") == 2
+        balancer.release("http://a", ok=True)
+        assert balancer.outstanding("http://a") == 1
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — is_failover_error / retarget_request
+# ---------------------------------------------------------------------------
+
+class TestIsFailoverError:
+
+    def _http_error(self, code):
+        return urllib.error.HTTPError("http://a", code, "error", {}, None)
+
+    def test_server_errors(self):
+        assert is_failover_error(self._http_error(500))
+        assert is_failover_error(self._http_error(503))
+        assert is_failover_error(self._http_error(429))
+
+    def test_client_errors(self):
+        assert not is_failover_error(self._http_error(400))
+        assert not is_failover_error(self._http_error(401))
+
+    def test_connection_errors(self):
+        assert is_failover_error(urllib.error.URLError(ConnectionRefusedError()))
+        assert is_failover_error(ConnectionResetError())
+        assert is_failover_error(http.client.RemoteDisconnected())
+        assert is_failover_error(socket.timeout("timed out"))
+        assert is_failover_error(OSError(errno.EHOSTUNREACH, "No route to host"))
+        assert is_failover_error(ssl.SSLEOFError())
+
+    def test_permanent_errors(self):
+        assert not is_failover_error(ssl.SSLCertVerificationError("certificate verify failed"))
+        assert not is_failover_error(urllib.error.URLError(
+            ssl.SSLCertVerificationError("certificate verify failed")))
+        assert not is_failover_error(FileNotFoundError(errno.ENOENT, "ca.pem"))
+        assert not is_failover_error(PermissionError(errno.EACCES, "ca.pem"))
+        assert not is_failover_error(urllib.error.URLError("unknown url type: htp"))
+        assert not is_failover_error(socket.gaierror(socket.EAI_NONAME, "Name not known"))
+
+    def test_other_errors(self):
+        assert not is_failover_error(ValueError("bad"))
+
+
+class TestRetargetRequest:
+
+    def test_moves_to_other_endpoint(self):
+        request = build_api_request("Hello", endpoint="http://a:1/", api_key="key")
+        moved = retarget_request(request, "http://b:2")
+        assert moved.full_url == "http://b:2/v1/completions"
+        assert moved.endpoint == "http://b:2"
+        assert moved.data == request.data
+        assert moved.get_header("Authorization") == "Bearer key"
+        assert moved.get_method() == "POST"
+
+    def test_same_endpoint_unchanged(self):
+        request = build_api_request("Hello", endpoint="http://a:1")
+        assert retarget_request(request, "http://a:1") is request
+
+
+# ---------------------------------------------------------------------------
+# Integration Tests — stream_with_failover
+# ---------------------------------------------------------------------------
+
+class TestStreamWithFailover:
+
+    def test_fails_over_from_closed_port(self):
+        server, handler, endpoint = serve(SSEHandler)
+        try:
+            balancer = EndpointBalancer([CLOSED, endpoint])
+            result, text = stream(balancer)
+            assert result is True
+            assert text == "Once upon a time"
+            assert balancer.is_down(CLOSED)
+            assert balancer.outstanding(endpoint) == 0
+        finally:
+            server.shutdown()
+
+    def test_fails_over_from_server_error(self):
+        bad_server, _, bad = serve(ErrorHandler)
+        server, handler, endpoint = serve(SSEHandler)
+        try:
+            balancer = EndpointBalancer([bad, endpoint])
+            assert stream(balancer)[1] == "Once upon a time"
+            assert len(handler.captured_requests) == 1
+        finally:
+            bad_server.shutdown()
+            server.shutdown()
+
+    def test_client_error_not_retried(self):
+        bad_server, _, bad = serve(BadRequestHandler)
+        server, handler, endpoint = serve(SSEHandler)
+        try:
+            balancer = EndpointBalancer([bad, endpoint])
+            result, text = stream(balancer)
+            assert result is False
+            assert text.startswith("ERROR:")
+            assert handler.captured_requests == []
+            assert not balancer.is_down(bad)
+        finally:
+            bad_server.shutdown()
+            server.shutdown()
+
+    def test_all_endpoints_failing(self):
+        bad_server, _, bad = serve(ErrorHandler)
+        try:
+            balancer = EndpointBalancer([CLOSED, bad])
+            result, text = stream(balancer)
+            assert result is False
+            assert text.startswith("ERROR:")
+            assert text.count("ERROR:") == 1
+        finally:
+            bad_server.shutdown()
+
+    def test_cancelled_request_not_failed_over(self):
+        server, handler, endpoint = serve(SSEHandler)
+        try:
+            token = CancelToken()
+            token.cancel()
+            balancer = EndpointBalancer([CLOSED, endpoint])
+            stream(balancer, cancel=token)
+            assert handler.captured_requests == []
+        finally:
+            server.shutdown()
+
+    def test_collect_response_with_balancer(self):
+        server, handler, endpoint = serve(SSEHandler)
+        try:
+            balancer = EndpointBalancer([CLOSED, endpoint])
+            request = build_api_request("Hello", endpoint=CLOSED)
+            text = collect_response(request, "completions", make_ssl_context(),
+                                    balancer=balancer)
+            assert text == "Once upon a time"
+        finally:
+            server.shutdown()
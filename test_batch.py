@@ -0,0 +1,307 @@
+"""
+Test suite for LocalWriter batch scheduling.
+Tests pythonpath/batch.py directly — no UNO dependencies required.
+
+Run: pytest test_batch.py -v
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
+
+from llm import build_api_request, make_ssl_context, CancelToken
+from batch import (as_int, collect_response, group_identical, pack_prompt,
+                   parse_packed_response, run_parallel, stream_in_background)
+from test_llm import (SSEHandler, SlowSSEHandler, ErrorHandler, COMPLETIONS_CHUNKS,
+                      start_mock_server)
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — as_int
+# ---------------------------------------------------------------------------
+
+class TestAsInt:
+
+    def test_int(self):
+        assert as_int(4) == 4
+
+    def test_numeric_string(self):
+        assert as_int("8") == 8
+
+    def test_invalid_uses_default(self):
+        assert as_int("many", 1) == 1
+
+    def test_none_uses_default(self):
+        assert as_int(None) == 0
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — group_identical
+# ---------------------------------------------------------------------------
+
+class TestGroupIdentical:
+
+    def test_groups_duplicates_in_first_seen_order(self):
+        cells = [("A1", "N/A"), ("A2", "widget"), ("A3", "N/A"), ("A4", "N/A")]
+        groups = group_identical(cells, key=lambda c: c[1])
+        assert groups == [
+            ("N/A", [("A1", "N/A"), ("A3", "N/A"), ("A4", "N/A")]),
+            ("widget", [("A2", "widget")]),
+        ]
+
+    def test_key_covers_all_request_fields(self):
+        cells = [("A1", ("x", "sys", 70)), ("A2", ("x", "sys", 80))]
+        assert len(group_identical(cells, key=lambda c: c[1])) == 2
+
+    def test_empty(self):
+        assert group_identical([], key=lambda c: c) == []
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — packed requests
+# ---------------------------------------------------------------------------
+
+class TestPackedRequests:
+
+    def test_prompt_contains_inputs_as_json(self):
+        prompt = pack_prompt(["red shoe", 'say "hi"'], "Translate each input to French.")
+        assert "exactly 2 strings" in prompt
+        assert "Translate each input to French." in prompt
+        assert json.dumps(["red shoe", 'say "hi"']) in prompt
+
+    def test_prompts_share_prefix_up_to_inputs(self):
+        first = pack_prompt(["a", "b", "c"], "Translate each input to French.")
+        second = pack_prompt(["x", "y"], "Translate each input to French.")
+        prefix = first[:first.index("INPUT:")]
+        assert prefix.startswith("Translate each input to French.")
+        assert second.startswith(prefix + "INPUT:")
+
+    def test_prompt_keeps_unicode(self):
+        assert "café" in pack_prompt(["café"], "Edit.")
+
+    def test_parse_plain_array(self):
+        assert parse_packed_response('["a", "b"]', 2) == ["a", "b"]
+
+    def test_parse_with_surrounding_text(self):
+        text = 'Sure!\n```json\n["chaussure rouge", "dit \\"salut\\""]\n```'
+        assert parse_packed_response(text, 2) == ["chaussure rouge", 'dit "salut"']
+
+    def test_parse_numbers(self):
+        assert parse_packed_response("[1, 2.5]", 2) == ["1", "2.5"]
+
+    def test_non_string_items_fail_individually(self):
+        assert parse_packed_response('["a", {"x": 1}, "c"]', 3) == ["a", None, "c"]
+
+    def test_wrong_length_fails_all(self):
+        assert parse_packed_response('["a", "b"]', 3) == [None, None, None]
+
+    def test_invalid_json_fails_all(self):
+        assert parse_packed_response('["a", "b', 2) == [None, None]
+
+    def test_no_array(self):
+        assert parse_packed_response("I cannot do that.", 2) == [None, None]
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — run_parallel
+# ---------------------------------------------------------------------------
+
+class TestRunParallel:
+
+    def test_all_results_delivered(self):
+        results = {}
+        run_parallel(range(10), lambda n: n * n, results.__setitem__, max_workers=3)
+        assert results == {n: n * n for n in range(10)}
+
+    def test_results_applied_on_calling_thread(self):
+        caller = threading.current_thread()
+        threads = set()
+        run_parallel(range(5), lambda n: n,
+                     lambda task, result: threads.add(threading.current_thread()),
+                     max_workers=5)
+        assert threads == {caller}
+
+    def test_runs_concurrently(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def worker(task):
+            with lock:
+                active.append(task)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(task)
+            return task
+
+        run_parallel(range(8), worker, lambda task, result: None, max_workers=4)
+        assert max(peak) == 4
+
+    def test_errors_reported(self):
+        def worker(task):
+            if task == 2:
+                raise ValueError("boom")
+            return task
+
+        results, errors = {}, {}
+        run_parallel(range(4), worker, results.__setitem__, max_workers=2,
+                     on_error=errors.__setitem__)
+        assert sorted(results) == [0, 1, 3]
+        assert str(errors[2]) == "boom"
+
+    def test_on_idle_called(self):
+        idle = []
+        run_parallel([1], lambda n: time.sleep(0.1) or n, lambda task, result: None,
+                     on_idle=lambda: idle.append(1), poll_interval=0.01)
+        assert len(idle) > 1
+
+    def test_cancel_skips_pending_tasks(self):
+        token = CancelToken()
+        started, results = [], []
+
+        def worker(task):
+            started.append(task)
+            token.cancel()
+            return task
+
+        run_parallel(range(10), worker, lambda task, result: results.append(task),
+                     max_workers=1, cancel=token)
+        assert started == [0]
+        assert results == []
+
+    def test_empty_tasks(self):
+        run_parallel([], lambda n: n, lambda task, result: pytest.fail("no tasks"))
+
+    def test_interrupt_skips_queued_tasks(self):
+        token = CancelToken()
+        started = []
+
+        def worker(task):
+            started.append(task)
+            time.sleep(0.05)
+            return task
+
+        def interrupt(task, result):
+            raise KeyboardInterrupt
+
+        with pytest.raises(KeyboardInterrupt):
+            run_parallel(range(40), worker, interrupt, max_workers=2, cancel=token)
+        assert token.cancelled
+        assert len(started) <= 4
+
+
+# ---------------------------------------------------------------------------
+# Integration Tests — parallel requests against the mock server
+# ---------------------------------------------------------------------------
+
+class TestParallelRequests:
+
+    def test_collect_response_reports_errors(self):
+        class Handler(ErrorHandler):
+            captured_requests = []
+
+        server, port = start_mock_server(Handler)
+        try:
+            request = build_api_request("Hello", endpoint=f"http://127.0.0.1:{port}")
+            errors = []
+            text = collect_response(request, "completions", make_ssl_context(),
+                                    on_error=errors.append)
+            assert len(errors) == 1
+            assert "ERROR" not in text
+        finally:
+            server.shutdown()
+
+    def test_collect_response(self):
+        class Handler(SSEHandler):
+            chunks = list(COMPLETIONS_CHUNKS)
+            captured_requests = []
+
+        server, port = start_mock_server(Handler)
+        try:
+            request = build_api_request("Hello", endpoint=f"http://127.0.0.1:{port}")
+            text = collect_response(request, "completions", make_ssl_context())
+            assert text == "Once upon a time"
+        finally:
+            server.shutdown()
+
+    def test_many_cells(self):
+        class Handler(SSEHandler):
+            chunks = list(COMPLETIONS_CHUNKS)
+            captured_requests = []
+
+        server, port = start_mock_server(Handler)
+        try:
+            endpoint = f"http://127.0.0.1:{port}"
+            ssl_ctx = make_ssl_context()
+            cells = [f"cell {i}" for i in range(6)]
+            results = {}
+            run_parallel(
+                cells,
+                lambda cell: collect_response(
+                    build_api_request(cell, endpoint=endpoint), "completions", ssl_ctx),
+                results.__setitem__, max_workers=3)
+            assert results == {cell: "Once upon a time" for cell in cells}
+            prompts = sorted(r["body"]["prompt"] for r in Handler.captured_requests)
+            assert prompts == sorted(cells)
+        finally:
+            server.shutdown()
+
+
+# ---------------------------------------------------------------------------
+# Integration Tests — background streaming
+# ---------------------------------------------------------------------------
+
+class TestStreamInBackground:
+
+    def test_chunks_applied_on_calling_thread(self):
+        class Handler(SSEHandler):
+            chunks = list(COMPLETIONS_CHUNKS)
+            captured_requests = []
+
+        server, port = start_mock_server(Handler)
+        try:
+            caller = threading.current_thread()
+            threads, chunks = set(), []
+
+            def append(text):
+                threads.add(threading.current_thread())
+                chunks.append(text)
+
+            request = build_api_request("Hello", endpoint=f"http://127.0.0.1:{port}")
+            assert stream_in_background(request, "completions", make_ssl_context(), append)
+            assert "".join(chunks) == "Once upon a time"
+            assert threads == {caller}
+        finally:
+            server.shutdown()
+
+    def test_ui_idles_while_waiting_and_cancel_stops(self):
+        server, port = start_mock_server(SlowSSEHandler, ThreadingHTTPServer)
+        try:
+            token = CancelToken()
+            idle = []
+
+            def on_idle():
+                idle.append(1)
+                # e.g. the user picks "Stop Generation" while the UI is idle
+                if len(idle) == 5:
+                    token.cancel()
+
+            request = build_api_request("Hello", endpoint=f"http://127.0.0.1:{port}")
+            chunks = []
+            started = time.monotonic()
+            stream_in_background(request, "completions", make_ssl_context(),
+                                 chunks.append, on_idle=on_idle, cancel=token,
+                                 poll_interval=0.01)
+            assert time.monotonic() - started < SlowSSEHandler.stall_seconds
+            assert token.cancelled
+            assert not any("ERROR" in c for c in chunks)
+        finally:
+            server.shutdown()
@@ -0,0 +1,324 @@
+"""
+Test suite for LocalWriter's bulk Calc range access.
+Tests pythonpath/calc_data.py directly with a fake cell range — no UNO
+dependencies required.
+
+Run: pytest test_calc_data.py -v
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
+
+from calc_data import (MAX_ROW, Area, DataArraySink, RangeData, area_cells, area_of,
+                       clip_area, merge_areas, overlaps)
+from jobs import EDIT, EXTEND, JobSettings, WorkItem
+from test_jobs import make_engine, prompts, serve, text_chunks
+
+
+class Sheet:
+    """A grid of cell contents (str, float or "=formula") with counted UNO calls."""
+
+    def __init__(self, rows):
+        self.rows = [list(row) for row in rows]
+        self.calls = []
+
+    def value(self, row, col):
+        content = self.rows[row][col]
+        return 0.0 if str(content).startswith("=") else content
+
+
+class FakeCell:
+
+    def __init__(self, sheet, row, col):
+        self.sheet, self.row, self.col = sheet, row, col
+
+    def getString(self):
+        self.sheet.calls.append("getString")
+        value = self.sheet.value(self.row, self.col)
+        return f"{value:g}" if isinstance(value, float) else value
+
+    def setString(self, text):
+        self.sheet.calls.append("setString")
+        self.sheet.rows[self.row][self.col] = text
+
+
+class FakeRange:
+    """Stands in for a Calc cell range starting at (top, left) of sheet."""
+
+    def __init__(self, sheet, left=0, top=0, right=None, bottom=None):
+        self.sheet = sheet
+        self.left, self.top = left, top
+        self.right = len(sheet.rows[0]) - 1 if right is None else right
+        self.bottom = len(sheet.rows) - 1 if bottom is None else bottom
+
+    def _grid(self, value):
+        return tuple(tuple(value(row, col) for col in range(self.left, self.right + 1))
+                     for row in range(self.top, self.bottom + 1))
+
+    def getDataArray(self):
+        self.sheet.calls.append("getDataArray")
+        return self._grid(self.sheet.value)
+
+    def getFormulaArray(self):
+        self.sheet.calls.append("getFormulaArray")
+        return self._grid(lambda row, col: str(self.sheet.rows[row][col]))
+
+    def setDataArray(self, data):
+        self.sheet.calls.append("setDataArray")
+        assert len(data) == self.bottom - self.top + 1
+        for r, values in enumerate(data):
+            assert len(values) == self.right - self.left + 1
+            self.sheet.rows[self.top + r][self.left:self.right + 1] = list(values)
+
+    def getCellByPosition(self, col, row):
+        return FakeCell(self.sheet, self.top + row, self.left + col)
+
+    def getCellRangeByPosition(self, left, top, right, bottom):
+        return FakeRange(self.sheet, self.left + left, self.top + top,
+                         self.left + right, self.top + bottom)
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — planning areas
+# ---------------------------------------------------------------------------
+
+class Address:
+    """Stands in for a CellRangeAddress."""
+
+    def __init__(self, left, top, right, bottom):
+        self.StartColumn, self.StartRow, self.EndColumn, self.EndRow = left, top, right, bottom
+
+
+class TestAreas:
+
+    def test_area_of_address(self):
+        assert area_of(Address(1, 2, 3, 4)) == Area(1, 2, 3, 4)
+
+    def test_whole_column_clipped_to_used_area(self):
+        used = Area(0, 0, 5, 99)
+        assert clip_area(Area(1, 0, 1, MAX_ROW), used) == Area(1, 0, 1, 99)
+
+    def test_area_outside_used_area(self):
+        used = Area(0, 0, 5, 99)
+        assert clip_area(Area(7, 0, 7, MAX_ROW), used) is None
+        assert clip_area(Area(0, 100, 5, 200), used) is None
+
+    def test_adjacent_blocks_merged(self):
+        blocks = [Area(1, 0, 1, 0), Area(1, 1, 1, 1), Area(1, 3, 1, 3)]
+        assert merge_areas(blocks) == [Area(1, 0, 1, 3)]
+
+    def test_distant_blocks_kept_apart(self):
+        blocks = [Area(1, 500000, 1, 500000), Area(1, 0, 1, 9)]
+        assert merge_areas(blocks) == [Area(1, 0, 1, 9), Area(1, 500000, 1, 500000)]
+
+    def test_side_by_side_columns_merged(self):
+        blocks = [Area(0, 0, 0, 9), Area(1, 0, 1, 9)]
+        assert merge_areas(blocks) == [Area(0, 0, 1, 9)]
+
+    def test_merged_areas_never_overlap(self):
+        blocks = [Area(0, 0, 1, 9), Area(0, 10, 0, 10), Area(1, 10, 3000, 10)]
+        merged = merge_areas(blocks)
+        assert not any(overlaps(a, b) for i, a in enumerate(merged) for b in merged[i + 1:])
+        assert sum(area_cells(a) for a in merged) >= sum(area_cells(b) for b in blocks)
+
+    def test_random_blocks_never_overlap(self):
+        rng = random.Random(7)
+        for _ in range(500):
+            taken, blocks = set(), []
+            for _ in range(rng.randint(1, 8)):
+                left, top = rng.randint(0, 6), rng.randint(0, 12)
+                area = Area(left, top, left + rng.randint(0, 3), top + rng.randint(0, 2))
+                cells = {(r, c) for r in range(area.top, area.bottom + 1)
+                         for c in range(area.left, area.right + 1)}
+                if not cells & taken:
+                    taken |= cells
+                    blocks.append(area)
+            merged = merge_areas(blocks)
+            assert not any(overlaps(a, b) for i, a in enumerate(merged) for b in merged[i + 1:])
+            covered = {(r, c) for a in merged for r in range(a.top, a.bottom + 1)
+                       for c in range(a.left, a.right + 1)}
+            assert taken <= covered
+
+    def test_no_blocks(self):
+        assert merge_areas([]) == []
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — RangeData
+# ---------------------------------------------------------------------------
+
+class TestRangeData:
+
+    def test_reads_in_one_call(self):
+        sheet = Sheet([["a", "b"], ["c", "d"]])
+        data = RangeData(FakeRange(sheet))
+        assert list(data.cells()) == [(0, 0, "a"), (0, 1, "b"), (1, 0, "c"), (1, 1, "d")]
+        assert sheet.calls == ["getDataArray"]
+
+    def test_numbers_are_skipped(self):
+        sheet = Sheet([["a", 2.5]])
+        data = RangeData(FakeRange(sheet))
+        assert list(data.cells()) == [(0, 0, "a"), (0, 1, "")]
+        assert sheet.calls == ["getDataArray"]
+
+    def test_writes_in_blocks_of_rows(self):
+        sheet = Sheet([[f"r{n}"] for n in range(5)])
+        data = RangeData(FakeRange(sheet), block_rows=2)
+        for row in range(5):
+            data.set(row, 0, f"new{row}")
+        assert data.pending == 5
+        data.flush()
+        assert [row[0] for row in sheet.rows] == [f"new{n}" for n in range(5)]
+        assert sheet.calls.count("setDataArray") == 3
+        assert "setString" not in sheet.calls
+        assert data.pending == 0
+
+    def test_block_covers_only_written_columns(self):
+        sheet = Sheet([["a", "b", "c"], ["d", "e", "f"]])
+        data = RangeData(FakeRange(sheet))
+        data.set(0, 1, "B")
+        data.set(1, 1, "E")
+        data.flush()
+        assert sheet.rows == [["a", "B", "c"], ["d", "E", "f"]]
+        assert sheet.calls.count("setDataArray") == 1
+
+    def test_formulas_are_not_overwritten(self):
+        sheet = Sheet([["a", "=1+1"], ["=A1", "d"]])
+        data = RangeData(FakeRange(sheet))
+        data.set(0, 0, "A")
+        data.set(1, 1, "D")
+        data.flush()
+        assert sheet.rows == [["A", "=1+1"], ["=A1", "D"]]
+        assert sheet.calls.count("setDataArray") == 2
+        assert "setString" not in sheet.calls
+
+    def test_written_around_formulas(self):
+        sheet = Sheet([[f"{row}{col}" for col in "abcd"] for row in range(6)])
+        sheet.rows[2][1] = "=1+1"
+        data = RangeData(FakeRange(sheet))
+        for row in range(6):
+            for col in range(4):
+                if (row, col) != (2, 1):
+                    data.set(row, col, "new")
+        data.flush()
+        expected = [["new"] * 4 for _ in range(6)]
+        expected[2][1] = "=1+1"
+        assert sheet.rows == expected
+        # Rows 0-1, the two pieces of row 2 and rows 3-5
+        assert sheet.calls.count("setDataArray") == 4
+        assert "setString" not in sheet.calls
+
+    def test_cells_typed_during_the_job_are_kept(self):
+        sheet = Sheet([["a", ""], ["b", "c"]])
+        data = RangeData(FakeRange(sheet))
+        sheet.rows[0][1] = "typed"
+        sheet.rows[1][1] = 2.0
+        data.set(0, 0, "A")
+        data.set(1, 0, "B")
+        data.set(1, 1, "C")
+        data.flush()
+        assert sheet.rows == [["A", "typed"], ["B", "C"]]
+        assert sheet.calls.count("setDataArray") == 1
+
+    def test_formula_typed_during_the_job_is_kept(self):
+        sheet = Sheet([["a", ""], ["b", "c"]])
+        data = RangeData(FakeRange(sheet))
+        sheet.rows[0][1] = "=1+1"
+        data.set(0, 0, "A")
+        data.set(1, 1, "C")
+        data.flush()
+        assert sheet.rows == [["A", "=1+1"], ["b", "C"]]
+
+    def test_nothing_to_flush(self):
+        sheet = Sheet([["a"]])
+        data = RangeData(FakeRange(sheet))
+        data.flush()
+        assert sheet.calls == ["getDataArray"]
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — DataArraySink
+# ---------------------------------------------------------------------------
+
+class TestDataArraySink:
+
+    def test_results_written_on_close(self):
+        sheet = Sheet([["Hi", "x", "y"]])
+        data = RangeData(FakeRange(sheet))
+        sink = DataArraySink()
+        sink.set_result(WorkItem((data, 0, 0), "Hi", EXTEND), " there")
+        sink.set_result(WorkItem((data, 0, 1), "x", EDIT), "X")
+        sink.set_error(WorkItem((data, 0, 2), "y", EDIT), ValueError("boom"))
+        assert sheet.rows == [["Hi", "x", "y"]]
+        sink.close()
+        assert sheet.rows == [["Hi there", "X", "y: boom"]]
+        assert sheet.calls.count("setDataArray") == 1
+
+    def test_streamed_chunks_kept_in_memory(self):
+        sheet = Sheet([["old"]])
+        data = RangeData(FakeRange(sheet))
+        sink = DataArraySink()
+        item = WorkItem((data, 0, 0), "old", EDIT)
+        sink.begin(item)
+        sink.append(item, "ne")
+        sink.append(item, "w")
+        sink.end(item)
+        sink.close()
+        assert sheet.rows == [["new"]]
+        assert sheet.calls == ["getDataArray", "getFormulaArray", "getDataArray",
+                               "setDataArray"]
+
+    def test_flushes_every_interval(self):
+        sheet = Sheet([["a"], ["b"]])
+        data = RangeData(FakeRange(sheet))
+        clock = Clock()
+        sink = DataArraySink(flush_interval=1.0, clock=clock)
+        sink.set_result(WorkItem((data, 0, 0), "a", EDIT), "A")
+        assert sheet.rows[0] == ["a"]
+        clock.now = 1.5
+        sink.set_result(WorkItem((data, 1, 0), "b", EDIT), "B")
+        assert sheet.rows == [["A"], ["B"]]
+
+
+# ---------------------------------------------------------------------------
+# Integration Tests — JobEngine.run into a DataArraySink
+# ---------------------------------------------------------------------------
+
+class TestBulkJob:
+
+    def test_edit_column(self):
+        server, handler, endpoint = serve(text_chunks("done"))
+        try:
+            sheet = Sheet([[f"cell {n}"] for n in range(30)])
+            data = RangeData(FakeRange(sheet), block_rows=10)
+            items = [WorkItem((data, row, col), text, EDIT) for row, col, text in data.cells()]
+            make_engine(endpoint, JobSettings("Shout")).run(items, DataArraySink())
+            assert sheet.rows == [["done"]] * 30
+            assert len(prompts(handler)) == 30
+            assert sheet.calls.count("setDataArray") == 3
+            assert "setString" not in sheet.calls
+        finally:
+            server.shutdown()
+
+    def test_extend_in_parallel(self):
+        server, handler, endpoint = serve(text_chunks(" more"))
+        try:
+            sheet = Sheet([["one", "two"], ["three", "four"]])
+            data = RangeData(FakeRange(sheet))
+            items = [WorkItem((data, row, col), text, EXTEND) for row, col, text in data.cells()]
+            make_engine(endpoint, JobSettings(concurrency=4)).run(items, DataArraySink())
+            assert sheet.rows == [["one more", "two more"], ["three more", "four more"]]
+        finally:
+            server.shutdown()
@@ -0,0 +1,82 @@
+"""
+Test suite for LocalWriter selection chunking.
+Tests pythonpath/chunking.py directly — no UNO dependencies required.
+
+Run: pytest test_chunking.py -v
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
+
+from chunking import chunk_paragraphs, split_paragraphs, tail_context
+
+
+def words(count):
+    """Paragraph of count tokens when counted with len(text.split())."""
+    return " ".join(["w"] * count)
+
+
+def count_words(text):
+    return len(text.split())
+
+
+class TestSplitParagraphs:
+
+    def test_lf(self):
+        assert split_paragraphs("a\nb\n\nc") == ["a", "b", "", "c"]
+
+    def test_crlf(self):
+        assert split_paragraphs("a\r\nb") == ["a", "b"]
+
+    def test_single(self):
+        assert split_paragraphs("one paragraph") == ["one paragraph"]
+
+
+class TestChunkParagraphs:
+
+    def test_everything_fits(self):
+        paragraphs = [words(10), words(10)]
+        assert chunk_paragraphs(paragraphs, 100, count_words) == [(0, 1)]
+
+    def test_splits_at_budget(self):
+        paragraphs = [words(40), words(40), words(40), words(40)]
+        assert chunk_paragraphs(paragraphs, 100, count_words) == [(0, 1), (2, 3)]
+
+    def test_oversized_paragraph_alone(self):
+        paragraphs = [words(10), words(500), words(10)]
+        assert chunk_paragraphs(paragraphs, 100, count_words) == [(0, 0), (1, 1), (2, 2)]
+
+    def test_chunks_cover_all_paragraphs_in_order(self):
+        paragraphs = [words(n) for n in (5, 30, 70, 2, 2, 90, 15)]
+        chunks = chunk_paragraphs(paragraphs, 100, count_words)
+        covered = [i for first, last in chunks for i in range(first, last + 1)]
+        assert covered == list(range(len(paragraphs)))
+
+    def test_empty_paragraphs_kept(self):
+        assert chunk_paragraphs(["", "", ""], 100, count_words) == [(0, 2)]
+
+    def test_no_paragraphs(self):
+        assert chunk_paragraphs([], 100) == []
+
+    def test_default_estimator(self):
+        paragraphs = ["x" * 400, "x" * 400]
+        assert chunk_paragraphs(paragraphs, 150) == [(0, 0), (1, 1)]
+
+
+class TestTailContext:
+
+    def test_keeps_last_paragraphs(self):
+        paragraphs = ["first " + words(40), "second " + words(40), "third " + words(40)]
+        tail = tail_context(paragraphs, 100, count_words)
+        assert tail == paragraphs[1] + "\n" + paragraphs[2]
+
+    def test_all_fit(self):
+        assert tail_context(["a", "b"], 100, count_words) == "a\nb"
+
+    def test_long_last_paragraph_is_cut_from_the_start(self):
+        paragraph = "x" * 4000
+        tail = tail_context(["intro", paragraph], 100)
+        assert 0 < len(tail) <= 400
+        assert paragraph.endswith(tail)
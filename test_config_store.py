@@ -0,0 +1,78 @@
+"""
+Test suite for LocalWriter settings storage.
+Tests pythonpath/config_store.py directly — no UNO dependencies required.
+
+Run: pytest test_config_store.py -v
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
+
+from config_store import ConfigStore, get_store
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    return str(tmp_path / "localwriter.json")
+
+
+def write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+class TestConfigStore:
+
+    def test_missing_file_returns_default(self, config_path):
+        store = ConfigStore(config_path)
+        assert store.get("endpoint", "http://localhost:11434") == "http://localhost:11434"
+
+    def test_reads_values(self, config_path):
+        write_json(config_path, {"model": "llama2"})
+        assert ConfigStore(config_path).get("model", "") == "llama2"
+
+    def test_invalid_json_returns_default(self, config_path):
+        with open(config_path, "w") as f:
+            f.write("{not json")
+        assert ConfigStore(config_path).get("model", "x") == "x"
+
+    def test_file_parsed_once(self, config_path, monkeypatch):
+        write_json(config_path, {"model": "llama2"})
+        store = ConfigStore(config_path)
+        loads = []
+        real_load = json.load
+        monkeypatch.setattr(json, "load", lambda f: loads.append(1) or real_load(f))
+        for _ in range(10):
+            store.get("model", "")
+        assert len(loads) == 1
+
+    def test_reloads_on_external_change(self, config_path):
+        write_json(config_path, {"model": "llama2"})
+        store = ConfigStore(config_path)
+        assert store.get("model", "") == "llama2"
+        write_json(config_path, {"model": "gemma3", "api_type": "chat"})
+        st = os.stat(config_path)
+        os.utime(config_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000))
+        assert store.get("model", "") == "gemma3"
+
+    def test_update_writes_once_and_merges(self, config_path):
+        write_json(config_path, {"model": "llama2", "api_key": "sk"})
+        store = ConfigStore(config_path)
+        store.update({"model": "gemma3", "api_type": "chat"})
+        with open(config_path) as f:
+            on_disk = json.load(f)
+        assert on_disk == {"model": "gemma3", "api_key": "sk", "api_type": "chat"}
+        assert store.get("api_type", "") == "chat"
+
+    def test_update_leaves_no_temp_files(self, config_path):
+        store = ConfigStore(config_path)
+        store.set("model", "llama2")
+        assert os.listdir(os.path.dirname(config_path)) == ["localwriter.json"]
+
+    def test_get_store_is_shared(self, config_path):
+        assert get_store(config_path) is get_store(config_path)
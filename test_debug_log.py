@@ -0,0 +1,79 @@
+"""
+Test suite for LocalWriter debug logging.
+Tests pythonpath/debug_log.py directly — no UNO dependencies required.
+
+Run: pytest test_debug_log.py -v
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
+
+import debug_log
+from llm import build_api_request
+
+
+@pytest.fixture(autouse=True)
+def reset_logging():
+    yield
+    debug_log.shutdown()
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+class TestDebugLog:
+
+    def test_writes_messages(self, tmp_path):
+        path = str(tmp_path / "logs" / "log.txt")
+        debug_log.configure(True, path)
+        debug_log.log("plain message")
+        debug_log.log(lambda: "lazy message")
+        debug_log.shutdown()
+        text = read(path)
+        assert "plain message" in text
+        assert "lazy message" in text
+
+    def test_disabled_skips_formatting(self, tmp_path):
+        path = str(tmp_path / "log.txt")
+        debug_log.configure(False, path)
+        debug_log.log(lambda: pytest.fail("formatted while disabled"))
+        assert debug_log.log_fn() is None
+        assert not os.path.exists(path)
+
+    def test_log_fn_when_enabled(self, tmp_path):
+        debug_log.configure(True, str(tmp_path / "log.txt"))
+        assert debug_log.log_fn() is debug_log.log
+
+    def test_reconfigure_same_path_keeps_file(self, tmp_path):
+        path = str(tmp_path / "log.txt")
+        debug_log.configure(True, path)
+        debug_log.log("first")
+        debug_log.configure(True, path)
+        debug_log.log("second")
+        debug_log.shutdown()
+        text = read(path)
+        assert "first" in text and "second" in text
+
+    def test_rotates(self, tmp_path):
+        path = str(tmp_path / "log.txt")
+        debug_log.configure(True, path, max_bytes=200, backup_count=2)
+        for i in range(50):
+            debug_log.log(f"line {i} " + "x" * 40)
+        debug_log.shutdown()
+        names = sorted(os.listdir(tmp_path))
+        assert names == ["log.txt", "log.txt.1", "log.txt.2"]
+        assert all(os.path.getsize(tmp_path / name) < 400 for name in names)
+
+    def test_build_api_request_dumps_only_with_log_fn(self):
+        lines = []
+        build_api_request("Hello", "http://localhost:11434", api_key="secret",
+                          log_fn=lines.append)
+        assert any(line.startswith("Request data:") for line in lines)
+        assert not any("secret" in line for line in lines)
+        build_api_request("Hello", "http://localhost:11434")  # log_fn=None must not fail
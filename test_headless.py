@@ -0,0 +1,113 @@
+"""
+Test suite for the LocalWriter command-line options.
+Tests pythonpath/headless.py directly — no UNO dependencies required.
+
+Run: pytest test_headless.py -v
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
+
+from headless import (column_index, find_documents, output_path, parse_args, parse_columns,
+                      parse_override, parse_paragraph_spec, split_sheet)
+
+
+class TestParseArgs:
+
+    def test_extend(self):
+        options = parse_args(["-o", "extend", "report.odt"])
+        assert options.command == "ExtendSelection"
+        assert options.paths == ["report.odt"]
+        assert options.paragraph_spans == []
+        assert options.config == {}
+
+    def test_edit_requires_instructions(self, capsys):
+        with pytest.raises(SystemExit):
+            parse_args(["-o", "edit", "sheet.ods"])
+        assert "--instructions" in capsys.readouterr().err
+
+    def test_edit_targets(self):
+        options = parse_args(["-o", "edit", "-i", "Fix spelling", "--column", "B",
+                              "--column", "D:E", "--range", "Sheet2.A1:A9", "sheet.ods"])
+        assert options.command == "EditSelection"
+        assert options.instructions == "Fix spelling"
+        assert options.column_spans == [(1, 1), (3, 4)]
+        assert options.ranges == ["Sheet2.A1:A9"]
+
+    def test_concurrency_and_settings(self):
+        options = parse_args(["-o", "extend", "-c", "8", "--set", "model=\"llama3\"",
+                              "--set", "max_retries=5", "docs"])
+        assert options.config == {"model": "llama3", "max_retries": 5,
+                                  "calc_concurrency": 8, "writer_chunk_concurrency": 8}
+
+    def test_invalid_column(self, capsys):
+        with pytest.raises(SystemExit):
+            parse_args(["-o", "extend", "--column", "B1", "sheet.ods"])
+        assert "invalid column" in capsys.readouterr().err
+
+
+class TestFindDocuments:
+
+    def test_directory(self, tmp_path):
+        for name in ("b.ods", "a.odt", "notes.txt"):
+            (tmp_path / name).write_text("")
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "c.ods").write_text("")
+        assert find_documents([str(tmp_path)]) == [str(tmp_path / "a.odt"),
+                                                   str(tmp_path / "b.ods")]
+
+    def test_recursive(self, tmp_path):
+        (tmp_path / "a.odt").write_text("")
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "c.ODS").write_text("")
+        assert find_documents([str(tmp_path)], recursive=True) == [
+            str(tmp_path / "a.odt"), str(tmp_path / "sub" / "c.ODS")]
+
+    def test_files_kept_as_given(self):
+        assert find_documents(["x.odt", "y.ods"]) == ["x.odt", "y.ods"]
+
+
+class TestTargets:
+
+    def test_paragraph_spec(self):
+        assert parse_paragraph_spec("1-5, 8") == [(0, 4), (7, 7)]
+        assert parse_paragraph_spec("") == []
+
+    def test_bad_paragraph_spec(self):
+        for spec in ("0", "5-2", "x"):
+            with pytest.raises(ValueError):
+                parse_paragraph_spec(spec)
+
+    def test_column_index(self):
+        assert column_index("A") == 0
+        assert column_index("z") == 25
+        assert column_index("AA") == 26
+        assert column_index("AMJ") == 1023
+
+    def test_parse_columns(self):
+        assert parse_columns("C") == (2, 2)
+        assert parse_columns("b:d") == (1, 3)
+        with pytest.raises(ValueError):
+            parse_columns("D:B")
+
+    def test_split_sheet(self):
+        assert split_sheet("A1:C20") == ("", "A1:C20")
+        assert split_sheet("Sheet2.A1:C20") == ("Sheet2", "A1:C20")
+        assert split_sheet("$'My Sheet'.B2") == ("My Sheet", "B2")
+
+
+class TestHelpers:
+
+    def test_parse_override(self):
+        assert parse_override("response_cache=true") == ("response_cache", True)
+        assert parse_override("endpoint=http://gpu:8080") == ("endpoint", "http://gpu:8080")
+        with pytest.raises(ValueError):
+            parse_override("novalue")
+
+    def test_output_path(self):
+        assert output_path("in/a.ods") == "in/a.ods"
+        assert output_path("in/a.ods", "out") == os.path.join("out", "a.ods")
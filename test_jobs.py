@@ -0,0 +1,413 @@
+"""
+Test suite for the LocalWriter job engine.
+Tests pythonpath/jobs.py directly — no UNO dependencies required.
+
+Run: pytest test_jobs.py -v
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
+
+from llm import build_api_request, make_ssl_context, stream_response, CancelToken
+from batch import collect_response
+from jobs import (EDIT, EXTEND, JobEngine, JobSettings, RangeSink, WorkItem,
+                  cell_edit_prompt, edit_prompt)
+from progress import Progress
+from test_llm import SSEHandler, ErrorHandler, COMPLETIONS_CHUNKS, start_mock_server
+
+
+class Target:
+    """Stands in for a Calc cell or Writer text range."""
+
+    def __init__(self, text=""):
+        self.text = text
+        self.writes = 0
+
+    def getString(self):
+        return self.text
+
+    def setString(self, text):
+        self.text = text
+        self.writes += 1
+
+
+def text_chunks(*texts):
+    return ['data: ' + json.dumps({"choices": [{"text": text, "finish_reason": None}]})
+            for text in texts]
+
+
+def serve(chunks=COMPLETIONS_CHUNKS, handler_class=SSEHandler):
+    class Handler(handler_class):
+        captured_requests = []
+    Handler.chunks = list(chunks)
+    server, port = start_mock_server(Handler, ThreadingHTTPServer)
+    return server, Handler, f"http://127.0.0.1:{port}"
+
+
+def make_engine(endpoint, settings=None, **kwargs):
+    ssl_ctx = make_ssl_context()
+
+    def make_request(prompt, system_prompt, max_tokens, stop):
+        return build_api_request(prompt, endpoint=endpoint, system_prompt=system_prompt,
+                                 max_tokens=max_tokens, stop=stop)
+
+    def collect(request, stop):
+        return collect_response(request, "completions", ssl_ctx, stop=stop)
+
+    def stream(request, append, stop):
+        stream_response(request, "completions", ssl_ctx, append, stop=stop)
+
+    return JobEngine(settings or JobSettings(), make_request, collect, stream, **kwargs)
+
+
+def prompts(handler):
+    return [request["body"]["prompt"] for request in handler.captured_requests]
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — planning
+# ---------------------------------------------------------------------------
+
+class TestPlan:
+
+    def engine(self, settings):
+        return JobEngine(settings, None, None)
+
+    def test_identical_items_share_a_request(self):
+        items = [WorkItem("A1", "red", EXTEND), WorkItem("A2", "blue", EXTEND),
+                 WorkItem("A3", "red", EXTEND)]
+        groups = self.engine(JobSettings()).plan(items)
+        assert [[item.target for item in members] for _, members in groups] == [
+            ["A1", "A3"], ["A2"]]
+
+    def test_empty_extend_items_skipped(self):
+        groups = self.engine(JobSettings()).plan([WorkItem("A1", "", EXTEND)])
+        assert groups == []
+
+    def test_extend_key(self):
+        settings = JobSettings(extend_system_prompt="Be brief.", extend_max_tokens="40")
+        key = self.engine(settings).request_key(WorkItem("A1", "Once", EXTEND))
+        assert key == (EXTEND, "Once", "Be brief.", 40)
+
+    def test_edit_key(self):
+        settings = JobSettings("Translate", edit_system_prompt="sys", edit_max_new_tokens=10)
+        operation, prompt, system_prompt, max_tokens = self.engine(settings).request_key(
+            WorkItem("A1", "x" * 400, EDIT))
+        assert prompt == edit_prompt("x" * 400, "Translate")
+        assert system_prompt == "sys"
+        assert max_tokens == 135
+
+    def test_edit_prompts_start_with_instructions(self):
+        for template in (edit_prompt, cell_edit_prompt):
+            first, second = template("one", "Translate"), template("two", "Translate")
+            prefix = first[:first.index("ORIGINAL VERSION:")]
+            assert "Translate" in prefix
+            assert second.startswith(prefix)
+
+    def test_long_extend_sent_from_tail(self):
+        text = "\n".join(f"paragraph {n} " + "x" * 400 for n in range(20))
+        settings = JobSettings(context_tokens=300)
+        prompt = self.engine(settings).request_key(WorkItem("T", text, EXTEND))[1]
+        assert text.endswith(prompt)
+        assert len(prompt) < len(text)
+
+    def test_unknown_operation(self):
+        with pytest.raises(ValueError):
+            self.engine(JobSettings()).request_key(WorkItem("A1", "x", "Summarize"))
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — RangeSink
+# ---------------------------------------------------------------------------
+
+class TestRangeSink:
+
+    def test_streamed_extend_appends(self):
+        sink, target = RangeSink(), Target("Once ")
+        item = WorkItem(target, "Once ", EXTEND)
+        sink.begin(item)
+        sink.append(item, "upon ")
+        sink.append(item, "a time")
+        sink.end(item)
+        assert target.text == "Once upon a time"
+
+    def test_streamed_edit_replaces(self):
+        sink, target = RangeSink(), Target("old")
+        item = WorkItem(target, "old", EDIT)
+        sink.begin(item)
+        sink.append(item, "new")
+        sink.end(item)
+        assert target.text == "new"
+
+    def test_writer_flushed_at_end(self):
+        flushed = []
+
+        class Writer:
+            def __init__(self, target):
+                self.target, self.pending = target, []
+
+            def __call__(self, text):
+                self.pending.append(text)
+
+            def flush(self):
+                self.target.setString(self.target.getString() + "".join(self.pending))
+                flushed.append(True)
+
+        sink, target = RangeSink(Writer), Target()
+        item = WorkItem(target, "", EDIT)
+        sink.begin(item)
+        sink.append(item, "a")
+        sink.append(item, "b")
+        assert target.text == ""
+        sink.end(item)
+        assert target.text == "ab"
+        assert flushed == [True]
+
+    def test_results_and_errors(self):
+        sink = RangeSink(strip_newlines=True)
+        extend, edit = Target("Hi"), Target("x")
+        sink.set_result(WorkItem(extend, "Hi", EXTEND), " there")
+        sink.set_result(WorkItem(edit, "x", EDIT), "\ny\n")
+        assert (extend.text, edit.text) == ("Hi there", "y")
+        sink.set_error(WorkItem(extend, "Hi", EXTEND), ValueError("boom"))
+        assert extend.text == "Hi: boom"
+
+    def test_edit_error_keeps_original(self):
+        sink, target = RangeSink(), Target("old")
+        item = WorkItem(target, "old", EDIT)
+        sink.begin(item)
+        sink.set_error(item, ValueError("boom"))
+        assert target.text == "old: boom"
+
+    def test_stream_failing_partway_is_replaced(self):
+        for operation in (EXTEND, EDIT):
+            sink, target = RangeSink(), Target("old")
+            item = WorkItem(target, "old", operation)
+            sink.begin(item)
+            sink.append(item, " partial")
+            sink.end(item)
+            sink.set_error(item, ValueError("boom"))
+            assert target.text == "old: boom"
+
+    def test_failed_stream_discarded_by_writer(self):
+        class Writer:
+            """Inserts after the target, like the cursor of a Writer text range."""
+            def __init__(self, target):
+                self.inserted = inserted
+
+            def __call__(self, text):
+                self.inserted.append(text)
+
+            def discard(self):
+                self.inserted.clear()
+
+        inserted = []
+        sink, target = RangeSink(Writer), Target("old")
+        item = WorkItem(target, "old", EDIT)
+        sink.begin(item)
+        sink.append(item, "partial")
+        sink.end(item)
+        sink.set_error(item, ValueError("boom"))
+        assert inserted == []
+        assert target.text == "old: boom"
+
+    def test_streamed_edit_strips_newlines(self):
+        sink, target = RangeSink(strip_newlines=True), Target("old")
+        item = WorkItem(target, "old", EDIT)
+        sink.begin(item)
+        for chunk in ["\n", "\nnew", "\n", "text\n", "\n"]:
+            sink.append(item, chunk)
+        sink.end(item)
+        assert target.text == "new\ntext"
+
+
+# ---------------------------------------------------------------------------
+# Integration Tests — JobEngine.run against the mock SSE server
+# ---------------------------------------------------------------------------
+
+class TestJobEngine:
+
+    def test_streams_extend_items(self):
+        server, handler, endpoint = serve()
+        try:
+            targets = [Target("Hello"), Target(""), Target("Hello")]
+            items = [WorkItem(t, t.text, EXTEND) for t in targets]
+            make_engine(endpoint).run(items, RangeSink())
+            assert [t.text for t in targets] == ["HelloOnce upon a time", "",
+                                                 "HelloOnce upon a time"]
+            assert prompts(handler) == ["Hello"]
+            assert targets[0].writes == 3  # streamed chunk by chunk
+        finally:
+            server.shutdown()
+
+    def test_edit_sends_stop_and_replaces(self):
+        server, handler, endpoint = serve(text_chunks("Bonjour"))
+        try:
+            target = Target("Hello")
+            settings = JobSettings("Translate to French", stop=["END OF DOCUMENT"])
+            make_engine(endpoint, settings).run([WorkItem(target, "Hello", EDIT)], RangeSink())
+            assert target.text == "Bonjour"
+            body = handler.captured_requests[0]["body"]
+            assert body["stop"] == ["END OF DOCUMENT"]
+            assert body["prompt"] == edit_prompt("Hello", "Translate to French")
+        finally:
+            server.shutdown()
+
+    def test_parallel_collects_on_calling_thread(self):
+        server, handler, endpoint = serve()
+        try:
+            caller = threading.current_thread()
+            written_on = set()
+
+            class Sink(RangeSink):
+                def set_result(self, item, result):
+                    written_on.add(threading.current_thread())
+                    super().set_result(item, result)
+
+            targets = [Target(f"cell {n}") for n in range(12)]
+            make_engine(endpoint, JobSettings(concurrency=4)).run(
+                [WorkItem(t, t.text, EXTEND) for t in targets], Sink())
+            assert all(t.text.endswith("Once upon a time") for t in targets)
+            assert len(handler.captured_requests) == 12
+            assert written_on == {caller}
+        finally:
+            server.shutdown()
+
+    def test_packed_requests(self):
+        server, handler, endpoint = serve(text_chunks('["rouge", ', '"bleu"]'))
+        try:
+            targets = [Target("red"), Target("blue")]
+            settings = JobSettings("Translate to French", pack_size=10)
+            make_engine(endpoint, settings).run([WorkItem(t, t.text, EDIT) for t in targets],
+                                                RangeSink())
+            assert [t.text for t in targets] == ["rouge", "bleu"]
+            assert len(handler.captured_requests) == 1
+            assert json.dumps(["red", "blue"]) in prompts(handler)[0]
+        finally:
+            server.shutdown()
+
+    def test_unparsable_pack_falls_back_to_single_requests(self):
+        server, handler, endpoint = serve(text_chunks("dunno"))
+        try:
+            targets = [Target("red"), Target("blue")]
+            make_engine(endpoint, JobSettings("Translate", pack_size=10)).run(
+                [WorkItem(t, t.text, EDIT) for t in targets], RangeSink())
+            assert [t.text for t in targets] == ["dunno", "dunno"]
+            assert len(handler.captured_requests) == 3
+        finally:
+            server.shutdown()
+
+    def test_request_errors_go_to_sink(self):
+        target = Target("Hello")
+
+        def make_request(prompt, system_prompt, max_tokens, stop):
+            raise ValueError("no endpoint")
+
+        JobEngine(JobSettings(), make_request, None).run([WorkItem(target, "Hello", EXTEND)],
+                                                          RangeSink())
+        assert target.text == "Hello: no endpoint"
+
+    def test_collect_errors_go_to_sink(self):
+        target = Target("Hello")
+
+        def collect(request, stop):
+            raise OSError("refused")
+
+        engine = JobEngine(JobSettings(concurrency=2), lambda *args: "request", collect)
+        engine.run([WorkItem(target, "Hello", EXTEND)], RangeSink())
+        assert target.text == "Hello: refused"
+
+    def test_http_error_written_as_text(self):
+        server, handler, endpoint = serve(handler_class=ErrorHandler)
+        try:
+            target = Target("Hello")
+            make_engine(endpoint).run([WorkItem(target, "Hello", EXTEND)], RangeSink())
+            assert target.text.startswith("HelloERROR:")
+        finally:
+            server.shutdown()
+
+    def test_cancelled_job_sends_nothing(self):
+        server, handler, endpoint = serve()
+        try:
+            token = CancelToken()
+            token.cancel()
+            target = Target("Hello")
+            make_engine(endpoint, cancel=token).run([WorkItem(target, "Hello", EXTEND)],
+                                                    RangeSink())
+            assert handler.captured_requests == []
+            assert target.text == "Hello"
+        finally:
+            server.shutdown()
+
+    def test_stream_failing_partway(self):
+        def stream(request, append, stop):
+            append("Once upon")
+            raise OSError("connection reset")
+
+        target = Target("Hello")
+        engine = JobEngine(JobSettings("Shout"), lambda *args: "request", None, stream)
+        assert engine.run([WorkItem(target, "Hello", EDIT)],
+                          RangeSink(strip_newlines=True)) == 1
+        assert target.text == "Hello: connection reset"
+
+    def test_sink_closed_after_failure(self):
+        closed = []
+
+        class Sink(RangeSink):
+            def close(self):
+                closed.append(True)
+
+        def make_request(prompt, system_prompt, max_tokens, stop):
+            raise KeyboardInterrupt
+
+        engine = JobEngine(JobSettings(), make_request, None)
+        with pytest.raises(KeyboardInterrupt):
+            engine.run([WorkItem(Target("x"), "x", EXTEND)], Sink())
+        assert closed == [True]
+
+    def test_reports_progress(self):
+        server, handler, endpoint = serve()
+        try:
+            snapshots = []
+            progress = Progress()
+            progress.add_listener(snapshots.append, 0)
+            targets = [Target("a"), Target("b"), Target("a"), Target("")]
+            items = [WorkItem(t, t.text, EXTEND) for t in targets]
+            make_engine(endpoint, JobSettings(concurrency=2), progress=progress).run(
+                items, RangeSink())
+            assert snapshots[0]["done"] == 0 and snapshots[0]["total"] == 3
+            assert [s["done"] for s in snapshots[1:-1]] in ([1, 3], [2, 3])
+            assert snapshots[-1]["finished"] and snapshots[-1]["done"] == 3
+            assert progress.tokens > 0
+        finally:
+            server.shutdown()
+
+    def test_counts_failed_items(self):
+        server, handler, endpoint = serve(handler_class=ErrorHandler)
+        try:
+            targets = [Target("a"), Target("b"), Target("a")]
+            items = [WorkItem(t, t.text, EDIT) for t in targets]
+            ssl_ctx = make_ssl_context()
+
+            def collect(request, stop):
+                errors = []
+                text = collect_response(request, "completions", ssl_ctx, on_error=errors.append)
+                if errors:
+                    raise errors[0]
+                return text
+
+            engine = JobEngine(JobSettings("Shout"),
+                               lambda prompt, *args: build_api_request(prompt, endpoint=endpoint),
+                               collect)
+            assert engine.run(items, RangeSink()) == 3
+            assert engine.failed == 3
+            assert [t.text.split(":")[0] for t in targets] == ["a", "b", "a"]
+        finally:
+            server.shutdown()
@@ -10,7 +10,8 @@ import os
 import ssl
 import sys
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import time
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
 
 import pytest
 
@@ -18,7 +19,11 @@ import pytest
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
 
 from llm import (as_bool, is_openai_compatible, build_api_request,
-                 extract_content, make_ssl_context, stream_response)
+                 extract_content, make_ssl_context, stream_response,
+                 ConnectionPool, BufferedSink, CancelToken, SSEDecoder, StopMatcher,
+                 build_models_request, check_endpoint, describe_endpoint_status,
+                 parse_model_list, prefix_cache_options, stream_usage_options, warm_up,
+                 EndpointStatus)
 
 
 # ---------------------------------------------------------------------------
@@ -57,6 +62,28 @@ class SSEHandler(BaseHTTPRequestHandler):
         pass  # suppress console noise
 
 
+class SlowSSEHandler(BaseHTTPRequestHandler):
+    """Sends one chunk, then stalls as if the model were still generating."""
+    stall_seconds = 5
+
+    def do_POST(self):
+        content_length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(content_length)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        self.wfile.write(COMPLETIONS_CHUNKS[0].encode("utf-8") + b"\n\n")
+        self.wfile.flush()
+        try:
+            time.sleep(self.__class__.stall_seconds)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except OSError:
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
 class ErrorHandler(BaseHTTPRequestHandler):
     """Returns HTTP 500 for error handling tests."""
     def do_POST(self):
@@ -69,8 +96,37 @@ class ErrorHandler(BaseHTTPRequestHandler):
         pass
 
 
-def start_mock_server(handler_class):
-    server = HTTPServer(("127.0.0.1", 0), handler_class)
+class KeepAliveSSEHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 SSE handler that keeps the connection open between requests."""
+    protocol_version = "HTTP/1.1"
+    chunks = []
+    status = 200
+    client_ports = []
+    drop_idle_connections = False
+
+    def do_POST(self):
+        content_length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(content_length)
+        self.__class__.client_ports.append(self.client_address[1])
+
+        body = b"".join(line.encode("utf-8") + b"\n\n" for line in self.__class__.chunks)
+        body += b"data: [DONE]\n\n"
+        self.send_response(self.__class__.status)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+        # Close without announcing it, like a server whose idle timeout expired
+        if self.__class__.drop_idle_connections:
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server(handler_class, server_class=HTTPServer):
+    server = server_class(("127.0.0.1", 0), handler_class)
     thread = threading.Thread(target=server.serve_forever)
     thread.daemon = True
     thread.start()
@@ -252,6 +308,75 @@ class TestExtractContent:
         content, _ = extract_content(chunk, "chat")
         assert content == ""
 
+    def test_chat_null_content(self):
+        chunk = {"choices": [{"delta": {"content": None}, "finish_reason": "stop"}]}
+        assert extract_content(chunk, "chat") == ("", "stop")
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — SSEDecoder
+# ---------------------------------------------------------------------------
+
+class TestSSEDecoder:
+
+    def test_single_event(self):
+        events = SSEDecoder().feed(b"data: hello\n\n")
+        assert [(e.event, e.data) for e in events] == [("message", "hello")]
+
+    def test_event_split_across_blocks(self):
+        decoder = SSEDecoder()
+        assert decoder.feed(b"da") == []
+        assert decoder.feed(b"ta: hel") == []
+        assert decoder.feed(b"lo\n") == []
+        assert [e.data for e in decoder.feed(b"\n")] == ["hello"]
+
+    def test_crlf_and_cr_line_endings(self):
+        events = SSEDecoder().feed(b"data: a\r\n\r\ndata: b\r\rdata: c\n\n")
+        assert [e.data for e in events] == ["a", "b", "c"]
+
+    def test_crlf_split_between_blocks(self):
+        decoder = SSEDecoder()
+        assert decoder.feed(b"data: a\r") == []
+        assert decoder.feed(b"\n\r") == []
+        assert [e.data for e in decoder.feed(b"\n")] == ["a"]
+
+    def test_multi_line_data(self):
+        events = SSEDecoder().feed(b"data: first\ndata:second\ndata\n\n")
+        assert events[0].data == "first\nsecond\n"
+
+    def test_event_and_id_fields(self):
+        decoder = SSEDecoder()
+        events = decoder.feed(b"event: error\nid: 7\nretry: 3000\ndata: x\n\n")
+        assert events[0].event == "error"
+        assert events[0].id == "7"
+        assert decoder.retry == 3000
+
+    def test_comments_and_empty_events_ignored(self):
+        events = SSEDecoder().feed(b": keep-alive\n\nevent: ping\n\ndata: x\n\n")
+        assert [(e.event, e.data) for e in events] == [("message", "x")]
+
+    def test_byte_order_mark(self):
+        assert SSEDecoder().feed(b"\xef\xbb\xbfdata: x\n\n")[0].data == "x"
+
+    def test_multibyte_character_split(self):
+        decoder = SSEDecoder()
+        encoded = "data: café\n\n".encode("utf-8")
+        assert decoder.feed(encoded[:10]) == []
+        assert decoder.feed(encoded[10:])[0].data == "café"
+
+    def test_close_completes_event_ending_in_cr(self):
+        decoder = SSEDecoder()
+        assert decoder.feed(b"data: tail\r\r") == []
+        assert [e.data for e in decoder.close()] == ["tail"]
+
+    def test_close_discards_incomplete_event(self):
+        decoder = SSEDecoder()
+        decoder.feed(b"data: tail\n")
+        assert decoder.close() == []
+        decoder = SSEDecoder()
+        decoder.feed(b"data: tail\r")
+        assert decoder.close() == []
+
 
 # ---------------------------------------------------------------------------
 # Unit Tests — build_api_request
@@ -259,6 +384,30 @@ class TestExtractContent:
 
 class TestBuildApiRequest:
 
+    def test_system_prompt_is_shared_prefix(self):
+        first = build_api_request("Cell one", endpoint="http://localhost:11434",
+                                  system_prompt="Be terse.")
+        second = build_api_request("Another cell", endpoint="http://localhost:11434",
+                                   system_prompt="Be terse.")
+        first_prompt = json.loads(first.data)["prompt"]
+        second_prompt = json.loads(second.data)["prompt"]
+        assert first_prompt.startswith("SYSTEM PROMPT\nBe terse.\nEND SYSTEM PROMPT\n")
+        assert second_prompt.startswith("SYSTEM PROMPT\nBe terse.\nEND SYSTEM PROMPT\n")
+
+    def test_options_added_to_body(self):
+        req = build_api_request("Hello", endpoint="http://localhost:11434",
+                                options={"cache_prompt": True, "keep_alive": "30m"})
+        body = json.loads(req.data)
+        assert body["cache_prompt"] is True
+        assert body["keep_alive"] == "30m"
+
+    def test_options_do_not_override(self):
+        req = build_api_request("Hello", endpoint="http://localhost:11434", max_tokens=50,
+                                options={"max_tokens": 9999, "stream": False})
+        body = json.loads(req.data)
+        assert body["max_tokens"] == 50
+        assert body["stream"] is True
+
     def test_ollama_completions(self):
         req = build_api_request(
             "Hello", endpoint="http://localhost:11434",
@@ -397,6 +546,58 @@ class TestBuildApiRequest:
         req = build_api_request("Hello", endpoint="http://localhost:11434")
         assert req.get_method() == "POST"
 
+    def test_stop_sequences(self):
+        req = build_api_request("Hello", endpoint="http://localhost:11434",
+                                stop=["END", "ORIGINAL VERSION:"])
+        assert json.loads(req.data)["stop"] == ["END", "ORIGINAL VERSION:"]
+
+    def test_no_stop_by_default(self):
+        req = build_api_request("Hello", endpoint="http://localhost:11434")
+        assert "stop" not in json.loads(req.data)
+
+    def test_openai_stop_limited_to_four(self):
+        req = build_api_request("Hello", endpoint="https://api.openai.com",
+                                stop=["a", "b", "c", "d", "e"])
+        assert json.loads(req.data)["stop"] == ["a", "b", "c", "d"]
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — prefix_cache_options
+# ---------------------------------------------------------------------------
+
+class TestPrefixCacheOptions:
+
+    def test_local_server(self):
+        assert prefix_cache_options("http://localhost:11434") == {"cache_prompt": True}
+
+    def test_keep_alive(self):
+        options = prefix_cache_options("http://localhost:11434", keep_alive=" 30m ")
+        assert options == {"cache_prompt": True, "keep_alive": "30m"}
+
+    def test_none_for_openai(self):
+        assert prefix_cache_options("https://api.openai.com", keep_alive="30m") == {}
+        assert prefix_cache_options("http://vllm:8000", openai_compatible=True) == {}
+
+    def test_none_for_openwebui(self):
+        assert prefix_cache_options("http://localhost:3000", is_openwebui=True) == {}
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — stream_usage_options
+# ---------------------------------------------------------------------------
+
+class TestStreamUsageOptions:
+
+    def test_requested_from_local_and_openai_servers(self):
+        expected = {"stream_options": {"include_usage": True}}
+        assert stream_usage_options("http://localhost:11434") == expected
+        assert stream_usage_options("https://api.openai.com") == expected
+        assert stream_usage_options("http://vllm:8000", openai_compatible=True) == expected
+
+    def test_none_for_openwebui(self):
+        assert stream_usage_options("http://localhost:3000", is_openwebui=True) == {}
+        assert stream_usage_options("http://open-webui:8080") == {}
+
 
 # ---------------------------------------------------------------------------
 # Unit Tests — make_ssl_context
@@ -421,6 +622,76 @@ class TestMakeSslContext:
         assert ctx.check_hostname is False
 
 
+# ---------------------------------------------------------------------------
+# Unit Tests — BufferedSink
+# ---------------------------------------------------------------------------
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestBufferedSink:
+
+    def test_buffers_until_size(self):
+        writes = []
+        sink = BufferedSink(writes.append, flush_interval=10, flush_chars=5,
+                            clock=FakeClock())
+        sink("ab")
+        sink("cd")
+        assert writes == []
+        sink("e")
+        assert writes == ["abcde"]
+
+    def test_flushes_after_interval(self):
+        writes = []
+        clock = FakeClock()
+        sink = BufferedSink(writes.append, flush_interval=0.1, flush_chars=1000,
+                            clock=clock)
+        sink("a")
+        assert writes == []
+        clock.now = 0.2
+        sink("b")
+        assert writes == ["ab"]
+
+    def test_flush_writes_remainder(self):
+        writes = []
+        sink = BufferedSink(writes.append, flush_interval=10, flush_chars=1000,
+                            clock=FakeClock())
+        sink("tail")
+        sink.flush()
+        sink.flush()
+        assert writes == ["tail"]
+
+    def test_discard_drops_pending_text(self):
+        writes, discarded = [], []
+        sink = BufferedSink(writes.append, flush_interval=10, flush_chars=1000,
+                            clock=FakeClock(), discard_fn=lambda: discarded.append(True))
+        sink("partial")
+        sink.discard()
+        sink.flush()
+        assert writes == []
+        assert discarded == [True]
+
+    def test_ignores_empty_chunks(self):
+        writes = []
+        sink = BufferedSink(writes.append, flush_interval=0, flush_chars=1)
+        sink("")
+        assert writes == []
+
+    def test_as_stream_callback(self, mock_completions_server):
+        _, port = mock_completions_server
+        writes = []
+        sink = BufferedSink(writes.append, flush_interval=10, flush_chars=1000)
+        request = build_api_request("Hello", endpoint=f"http://127.0.0.1:{port}")
+        stream_response(request, "completions", make_ssl_context(), sink)
+        sink.flush()
+        assert writes == ["Once upon a time"]
+
+
 # ---------------------------------------------------------------------------
 # Integration Tests — Ollama (completions)
 # ---------------------------------------------------------------------------
@@ -595,6 +866,16 @@ class TestStreamErrors:
         stream_response(request, "completions", ssl_ctx, accumulated.append)
         assert any("ERROR" in s for s in accumulated)
 
+    def test_on_error_reports_instead_of_appending(self, mock_error_server):
+        endpoint = f"http://127.0.0.1:{mock_error_server}"
+        request = build_api_request("Hello", endpoint=endpoint)
+        accumulated, errors = [], []
+        result = stream_response(request, "completions", make_ssl_context(),
+                                 accumulated.append, on_error=errors.append)
+        assert result is False
+        assert accumulated == []
+        assert errors[0].code == 500
+
     def test_bad_json_in_sse(self):
         class BadJsonHandler(SSEHandler):
             chunks = ['data: {not valid json}']
@@ -610,3 +891,416 @@ class TestStreamErrors:
             assert len(accumulated) > 0
         finally:
             server.shutdown()
+
+
+# ---------------------------------------------------------------------------
+# Integration Tests — Keep-alive connection pool
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def keep_alive_server():
+    class Handler(KeepAliveSSEHandler):
+        chunks = list(COMPLETIONS_CHUNKS)
+        client_ports = []
+    server, port = start_mock_server(Handler, ThreadingHTTPServer)
+    yield Handler, port
+    server.shutdown()
+
+
+class TestConnectionPool:
+
+    def _stream(self, port, pool):
+        request = build_api_request("Hello", endpoint=f"http://127.0.0.1:{port}")
+        accumulated = []
+        stream_response(request, "completions", make_ssl_context(),
+                        accumulated.append, pool=pool)
+        return "".join(accumulated)
+
+    def test_connection_reused(self, keep_alive_server):
+        handler, port = keep_alive_server
+        pool = ConnectionPool()
+        try:
+            assert self._stream(port, pool) == "Once upon a time"
+            assert self._stream(port, pool) == "Once upon a time"
+            assert len(handler.client_ports) == 2
+            assert len(set(handler.client_ports)) == 1
+            assert pool.idle_count() == 1
+        finally:
+            pool.clear()
+
+    def test_reserve_keeps_a_connection_per_worker(self):
+        pool = ConnectionPool(max_idle_per_host=2)
+        pool.reserve(5)
+        conns = [pool.acquire("http", "localhost:1", None)[0] for _ in range(5)]
+        for conn in conns:
+            pool.release(conn, "http", "localhost:1", None)
+        assert pool.idle_count() == 5
+        pool.reserve(1)
+        assert pool.max_idle_per_host == 5
+        pool.clear()
+
+    def test_not_pooled_when_server_closes(self, mock_completions_server):
+        _, port = mock_completions_server
+        pool = ConnectionPool()
+        assert self._stream(port, pool) == "Once upon a time"
+        assert pool.idle_count() == 0
+
+    def test_stale_connection_retried(self):
+        class Handler(KeepAliveSSEHandler):
+            chunks = list(COMPLETIONS_CHUNKS)
+            client_ports = []
+            drop_idle_connections = True
+        server, port = start_mock_server(Handler, ThreadingHTTPServer)
+        pool = ConnectionPool()
+        try:
+            assert self._stream(port, pool) == "Once upon a time"
+            assert pool.idle_count() == 1
+            assert self._stream(port, pool) == "Once upon a time"
+            assert len(set(Handler.client_ports)) == 2
+        finally:
+            pool.clear()
+            server.shutdown()
+
+    def test_http_error_keeps_connection(self):
+        class Handler(KeepAliveSSEHandler):
+            status = 503
+            client_ports = []
+        server, port = start_mock_server(Handler, ThreadingHTTPServer)
+        pool = ConnectionPool()
+        try:
+            text = self._stream(port, pool)
+            assert text.startswith("ERROR: HTTP Error 503")
+            assert pool.idle_count() == 1
+        finally:
+            pool.clear()
+            server.shutdown()
+
+    def test_key_separates_ssl_settings(self):
+        verified = make_ssl_context(False)
+        unverified = make_ssl_context(True)
+        assert (ConnectionPool.key_for("https", "host:443", verified)
+                != ConnectionPool.key_for("https", "host:443", unverified))
+        assert (ConnectionPool.key_for("https", "host:443", verified)
+                == ConnectionPool.key_for("https", "HOST:443", make_ssl_context(False)))
+
+
+# ---------------------------------------------------------------------------
+# Unit / Integration Tests — Cancellation
+# ---------------------------------------------------------------------------
+
+class TestCancelToken:
+
+    def test_callbacks_run_on_cancel(self):
+        token = CancelToken()
+        calls = []
+        token.add_callback(lambda: calls.append(1))
+        assert not token.cancelled
+        token.cancel()
+        assert token.cancelled
+        assert calls == [1]
+
+    def test_callback_added_after_cancel_runs_immediately(self):
+        token = CancelToken()
+        token.cancel()
+        calls = []
+        token.add_callback(lambda: calls.append(1))
+        assert calls == [1]
+
+    def test_removed_callback_not_run(self):
+        token = CancelToken()
+        calls = []
+        callback = lambda: calls.append(1)
+        token.add_callback(callback)
+        token.remove_callback(callback)
+        token.cancel()
+        assert calls == []
+
+
+class TestStreamCancel:
+
+    def test_cancel_before_start(self, mock_completions_server):
+        handler, port = mock_completions_server
+        token = CancelToken()
+        token.cancel()
+        request = build_api_request("Hello", endpoint=f"http://127.0.0.1:{port}")
+        accumulated = []
+        stream_response(request, "completions", make_ssl_context(),
+                        accumulated.append, cancel=token)
+        assert accumulated == []
+        assert handler.captured_requests == []
+
+    def test_cancel_unblocks_stalled_stream(self):
+        server, port = start_mock_server(SlowSSEHandler, ThreadingHTTPServer)
+        try:
+            token = CancelToken()
+            request = build_api_request("Hello", endpoint=f"http://127.0.0.1:{port}")
+            accumulated = []
+
+            def on_chunk(text):
+                accumulated.append(text)
+                threading.Timer(0.1, token.cancel).start()
+
+            started = time.monotonic()
+            stream_response(request, "completions", make_ssl_context(),
+                            on_chunk, cancel=token)
+            assert time.monotonic() - started < SlowSSEHandler.stall_seconds
+            assert accumulated == ["Once "]
+        finally:
+            server.shutdown()
+
+
+# ---------------------------------------------------------------------------
+# Integration Tests — SSE framing
+# ---------------------------------------------------------------------------
+
+class RawSSEHandler(BaseHTTPRequestHandler):
+    """Writes the raw body bytes as given, to exercise SSE framing."""
+    body = b""
+
+    def do_POST(self):
+        content_length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(content_length)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        self.wfile.write(self.__class__.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestStreamFraming:
+
+    def _stream(self, body):
+        class Handler(RawSSEHandler):
+            pass
+        Handler.body = body
+        server, port = start_mock_server(Handler)
+        try:
+            request = build_api_request("Hello", endpoint=f"http://127.0.0.1:{port}")
+            accumulated = []
+            stream_response(request, "completions", make_ssl_context(), accumulated.append)
+            return "".join(accumulated)
+        finally:
+            server.shutdown()
+
+    def test_crlf_framing(self):
+        body = (b'data: {"choices":[{"text":"a","finish_reason":null}]}\r\n\r\n'
+                b'data: {"choices":[{"text":"b","finish_reason":null}]}\r\n\r\n'
+                b'data: [DONE]\r\n\r\n')
+        assert self._stream(body) == "ab"
+
+    def test_multi_line_data_event(self):
+        body = (b'data: {"choices":\ndata: [{"text":"joined","finish_reason":null}]}\n\n'
+                b'data: [DONE]\n\n')
+        assert self._stream(body) == "joined"
+
+    def test_comments_ignored(self):
+        body = (b': ping\n\n'
+                b'data: {"choices":[{"text":"x","finish_reason":"stop"}]}\n\n')
+        assert self._stream(body) == "x"
+
+    def test_stream_without_done(self):
+        body = b'data: {"choices":[{"text":"x","finish_reason":null}]}\n\n'
+        assert self._stream(body) == "x"
+
+
+# ---------------------------------------------------------------------------
+# Stop sequences
+# ---------------------------------------------------------------------------
+
+class TestStopMatcher:
+
+    def test_no_stop(self):
+        matcher = StopMatcher(["END"])
+        assert matcher.feed("hello ") == ("hello ", False)
+
+    def test_stop_in_chunk(self):
+        matcher = StopMatcher(["END"])
+        assert matcher.feed("done.END more") == ("done.", True)
+
+    def test_stop_split_across_chunks(self):
+        matcher = StopMatcher(["END OF DOCUMENT"])
+        assert matcher.feed("text\nEND O") == ("text\n", False)
+        assert matcher.feed("F DOC") == ("", False)
+        assert matcher.feed("UMENT trailing") == ("", True)
+
+    def test_false_start_released(self):
+        matcher = StopMatcher(["END"])
+        assert matcher.feed("the EN") == ("the ", False)
+        assert matcher.feed("D") == ("", True)
+        matcher = StopMatcher(["END"])
+        matcher.feed("the EN")
+        assert matcher.feed("ding") == ("ENding", False)
+
+    def test_earliest_stop_wins(self):
+        matcher = StopMatcher(["B", "A"])
+        assert matcher.feed("xAyB") == ("x", True)
+
+    def test_flush_returns_held_text(self):
+        matcher = StopMatcher(["END"])
+        matcher.feed("the E")
+        assert matcher.flush() == "E"
+
+    def test_string_setting(self):
+        assert StopMatcher("END").stops == ["END"]
+
+
+class StopThenStallHandler(BaseHTTPRequestHandler):
+    """Sends a stop sequence split over two events, then keeps generating slowly."""
+
+    def do_POST(self):
+        content_length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(content_length)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for text in ["Edited text.\nEND OF ", "DOCUMENT\nNote: I changed"]:
+            chunk = json.dumps({"choices": [{"text": text, "finish_reason": None}]})
+            self.wfile.write(b"data: " + chunk.encode("utf-8") + b"\n\n")
+            self.wfile.flush()
+        try:
+            time.sleep(SlowSSEHandler.stall_seconds)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except OSError:
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestStreamStop:
+
+    def test_truncates_and_closes(self):
+        server, port = start_mock_server(StopThenStallHandler, ThreadingHTTPServer)
+        try:
+            request = build_api_request("Hello", endpoint=f"http://127.0.0.1:{port}",
+                                        stop=["END OF DOCUMENT"])
+            accumulated = []
+            started = time.monotonic()
+            completed = stream_response(request, "completions", make_ssl_context(),
+                                        accumulated.append, stop=["END OF DOCUMENT"])
+            assert time.monotonic() - started < SlowSSEHandler.stall_seconds
+            assert completed
+            assert "".join(accumulated) == "Edited text.\n"
+        finally:
+            server.shutdown()
+
+    def test_held_text_delivered_at_end(self, mock_completions_server):
+        handler, port = mock_completions_server
+        request = build_api_request("Hello", endpoint=f"http://127.0.0.1:{port}")
+        accumulated = []
+        assert stream_response(request, "completions", make_ssl_context(),
+                               accumulated.append, stop=["a timeless"])
+        assert "".join(accumulated) == "Once upon a time"
+
+
+# ---------------------------------------------------------------------------
+# Health check and warm-up
+# ---------------------------------------------------------------------------
+
+class ModelsHandler(BaseHTTPRequestHandler):
+    """Serves GET /v1/models and counts generation requests."""
+    body = b'{"object": "list", "data": [{"id": "llama3"}, {"id": "mistral"}]}'
+    status = 200
+    posts = []
+
+    def do_GET(self):
+        self.send_response(self.__class__.status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(self.__class__.body)
+
+    def do_POST(self):
+        content_length = int(self.headers.get("Content-Length", 0))
+        self.__class__.posts.append(json.loads(self.rfile.read(content_length)))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        self.wfile.write(COMPLETIONS_CHUNKS[2].encode("utf-8") + b"\n\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHealthCheck:
+
+    def test_models_url(self):
+        assert build_models_request("http://localhost:11434/").full_url == \
+            "http://localhost:11434/v1/models"
+        assert build_models_request("http://localhost:3000", is_openwebui=True).full_url == \
+            "http://localhost:3000/api/models"
+
+    def test_models_request_auth(self):
+        req = build_models_request("https://api.openai.com", api_key="sk-test")
+        assert req.get_header("Authorization") == "Bearer sk-test"
+        assert req.get_method() == "GET"
+
+    def test_parse_openai_list(self):
+        assert parse_model_list(b'{"data": [{"id": "gpt-4o"}, {"id": "o1"}]}') == ["gpt-4o", "o1"]
+
+    def test_parse_ollama_list(self):
+        assert parse_model_list(b'{"models": [{"name": "llama3:8b"}]}') == ["llama3:8b"]
+
+    def test_parse_garbage(self):
+        assert parse_model_list(b"<html>") == []
+        assert parse_model_list(b"[1, 2]") == []
+
+    def test_reachable(self):
+        class Handler(ModelsHandler):
+            pass
+        server, port = start_mock_server(Handler)
+        try:
+            status = check_endpoint(build_models_request(f"http://127.0.0.1:{port}"),
+                                    make_ssl_context())
+            assert status.reachable
+            assert status.status == 200
+            assert status.models == ["llama3", "mistral"]
+            assert status.rtt_ms >= 0
+        finally:
+            server.shutdown()
+
+    def test_http_error_is_reachable(self):
+        class Handler(ModelsHandler):
+            status = 404
+            body = b"not found"
+        server, port = start_mock_server(Handler)
+        try:
+            status = check_endpoint(build_models_request(f"http://127.0.0.1:{port}"),
+                                    make_ssl_context())
+            assert status.reachable
+            assert status.status == 404
+            assert status.models == []
+        finally:
+            server.shutdown()
+
+    def test_unreachable(self):
+        server, port = start_mock_server(ModelsHandler)
+        server.shutdown()
+        server.server_close()
+        status = check_endpoint(build_models_request(f"http://127.0.0.1:{port}"),
+                                make_ssl_context(), timeout=2)
+        assert not status.reachable
+        assert status.error
+
+    def test_describe(self):
+        status = EndpointStatus(True, 200, 12.3, ["llama3", "mistral"], None)
+        assert describe_endpoint_status(status) == \
+            "Reachable in 12 ms, 2 model(s): llama3, mistral"
+        assert "Model 'phi' not found" in describe_endpoint_status(status, "phi")
+        assert "not found" not in describe_endpoint_status(status, "llama3")
+        down = EndpointStatus(False, None, None, [], "Connection refused")
+        assert describe_endpoint_status(down) == "Not reachable: Connection refused"
+
+    def test_warm_up_sends_minimal_request(self):
+        class Handler(ModelsHandler):
+            posts = []
+        server, port = start_mock_server(Handler)
+        try:
+            request = build_api_request("Hello", f"http://127.0.0.1:{port}", max_tokens=1)
+            completed, elapsed_ms = warm_up(request, "completions", make_ssl_context())
+            assert completed
+            assert elapsed_ms >= 0
+            assert Handler.posts[0]["max_tokens"] == 1
+        finally:
+            server.shutdown()
@@ -0,0 +1,180 @@
+"""
+Test suite for LocalWriter request metrics.
+Tests pythonpath/metrics.py directly — no UNO dependencies required.
+
+Run: pytest test_metrics.py -v
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
+
+from llm import build_api_request, make_ssl_context, stream_response, ConnectionPool
+from metrics import (RequestMetrics, MetricsRecorder, load_records, percentile,
+                     summarize)
+from test_llm import (SSEHandler, KeepAliveSSEHandler, ErrorHandler, COMPLETIONS_CHUNKS,
+                      start_mock_server)
+from http.server import ThreadingHTTPServer
+
+
+# include_usage responses: the usage comes in a chunk of its own after the finish_reason one
+TRAILING_USAGE_CHUNKS = [
+    'data: {"choices":[{"text":"Hi","finish_reason":null}]}',
+    'data: {"choices":[{"text":"!","finish_reason":"stop"}]}',
+    'data: {"choices":[],"usage":{"prompt_tokens":3,"completion_tokens":4}}',
+    'data: [DONE]',
+]
+
+
+def stream_with_metrics(port, pool=None):
+    metrics = RequestMetrics(backend="Ollama", model="llama2")
+    request = build_api_request("Hello", endpoint=f"http://127.0.0.1:{port}")
+    accumulated = []
+    stream_response(request, "completions", make_ssl_context(), accumulated.append,
+                    pool=pool, metrics=metrics)
+    return metrics, "".join(accumulated)
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — percentile / summarize
+# ---------------------------------------------------------------------------
+
+class TestSummary:
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 95) == 95
+        assert percentile([7], 95) == 7
+        assert percentile([], 50) is None
+
+    def test_summarize(self):
+        records = [
+            {"type": "request", "outcome": "ok", "backend": "Ollama", "total_ms": 100.0},
+            {"type": "request", "outcome": "ok", "backend": "Ollama", "total_ms": 300.0},
+            {"type": "request", "outcome": "error", "backend": "OpenAI", "total_ms": 200.0},
+            {"type": "progress", "completed": 3},
+        ]
+        summary = summarize(records)
+        assert summary["requests"] == 3
+        assert summary["outcomes"] == {"ok": 2, "error": 1}
+        assert summary["backends"] == {"Ollama": 2, "OpenAI": 1}
+        assert summary["total_ms"] == {"p50": 200.0, "p95": 300.0, "count": 3}
+        assert summary["ttft_ms"]["count"] == 0
+
+    def test_recorder_appends_json_lines(self, tmp_path):
+        path = str(tmp_path / "sub" / "metrics.jsonl")
+        recorder = MetricsRecorder(path)
+        metrics = RequestMetrics(backend="Ollama")
+        metrics.finish("ok")
+        recorder.record(metrics)
+        recorder.record({"type": "progress", "completed": 1})
+        records = load_records(path)
+        assert [r["type"] for r in records] == ["request", "progress"]
+        assert records[0]["backend"] == "Ollama"
+        assert records[0]["outcome"] == "ok"
+
+    def test_load_skips_bad_lines(self, tmp_path):
+        path = tmp_path / "metrics.jsonl"
+        path.write_text('{"type": "request"}\nnot json\n')
+        assert len(load_records(str(path))) == 1
+
+    def test_tokens_prefer_server_usage(self):
+        metrics = RequestMetrics()
+        metrics.content()
+        metrics.content()
+        assert metrics.tokens == 2
+        metrics.completion_tokens = 5
+        assert metrics.tokens == 5
+
+
+# ---------------------------------------------------------------------------
+# Integration Tests — metrics recorded by stream_response
+# ---------------------------------------------------------------------------
+
+class TestStreamMetrics:
+
+    def test_fresh_connection(self):
+        class Handler(SSEHandler):
+            chunks = list(COMPLETIONS_CHUNKS)
+            captured_requests = []
+
+        server, port = start_mock_server(Handler)
+        try:
+            metrics, text = stream_with_metrics(port)
+        finally:
+            server.shutdown()
+        assert text == "Once upon a time"
+        record = metrics.as_dict()
+        assert record["outcome"] == "ok"
+        assert record["status"] == 200
+        assert record["backend"] == "Ollama"
+        assert record["url"].endswith("/v1/completions")
+        assert record["reused_connection"] is False
+        assert record["dns_ms"] is not None
+        assert record["connect_ms"] is not None
+        assert record["ttfb_ms"] <= record["ttft_ms"] <= record["total_ms"]
+        assert record["chunks"] == 3
+        assert record["tokens"] == 3
+        assert record["bytes_received"] > 0
+        json.dumps(record)
+
+    def test_reused_connection(self):
+        class Handler(KeepAliveSSEHandler):
+            chunks = list(COMPLETIONS_CHUNKS)
+            client_ports = []
+
+        server, port = start_mock_server(Handler, ThreadingHTTPServer)
+        pool = ConnectionPool()
+        try:
+            stream_with_metrics(port, pool)
+            metrics, _ = stream_with_metrics(port, pool)
+        finally:
+            pool.clear()
+            server.shutdown()
+        assert metrics.reused_connection is True
+        assert metrics.dns_ms is None
+        assert metrics.connect_ms is None
+
+    def test_usage_reported_by_server(self):
+        class Handler(SSEHandler):
+            chunks = [
+                'data: {"choices":[{"text":"Hi","finish_reason":null}]}',
+                'data: {"choices":[{"text":"!","finish_reason":"stop"}],'
+                '"usage":{"prompt_tokens":3,"completion_tokens":4}}',
+            ]
+            captured_requests = []
+
+        server, port = start_mock_server(Handler)
+        try:
+            metrics, _ = stream_with_metrics(port)
+        finally:
+            server.shutdown()
+        assert metrics.tokens == 4
+
+    def test_trailing_usage_chunk(self):
+        class Handler(SSEHandler):
+            chunks = list(TRAILING_USAGE_CHUNKS)
+            captured_requests = []
+
+        server, port = start_mock_server(Handler)
+        try:
+            metrics, text = stream_with_metrics(port)
+        finally:
+            server.shutdown()
+        assert text == "Hi!"
+        assert metrics.completion_tokens == 4
+
+    def test_http_error(self):
+        server, port = start_mock_server(ErrorHandler)
+        try:
+            metrics, _ = stream_with_metrics(port)
+        finally:
+            server.shutdown()
+        assert metrics.outcome == "error"
+        assert metrics.status == 500
+        assert "500" in metrics.error
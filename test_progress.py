@@ -0,0 +1,99 @@
+"""
+Test suite for LocalWriter job progress.
+Tests pythonpath/progress.py directly — no UNO dependencies required.
+
+Run: pytest test_progress.py -v
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
+
+from progress import Progress, format_duration, format_progress
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def tracked(interval=0.5):
+    clock = Clock()
+    progress = Progress(clock)
+    snapshots = []
+    progress.add_listener(snapshots.append, interval)
+    return progress, clock, snapshots
+
+
+class TestProgress:
+
+    def test_throughput_and_eta(self):
+        progress, clock, snapshots = tracked()
+        progress.start(100)
+        clock.now += 10
+        progress.advance(20, tokens=600)
+        snapshot = snapshots[-1]
+        assert (snapshot["done"], snapshot["total"]) == (20, 100)
+        assert snapshot["items_per_second"] == 2.0
+        assert snapshot["tokens_per_second"] == 60.0
+        assert snapshot["eta_s"] == 40.0
+        assert snapshot["type"] == "progress"
+
+    def test_updates_are_rate_limited(self):
+        progress, clock, snapshots = tracked(interval=1.0)
+        progress.start(1000)
+        for _ in range(20):
+            clock.now += 0.25
+            progress.advance()
+        # start, then one update per second of the five
+        assert len(snapshots) == 6
+        assert snapshots[-1]["done"] == 20
+
+    def test_start_and_finish_always_reported(self):
+        progress, clock, snapshots = tracked(interval=60.0)
+        progress.start(3)
+        progress.advance(3)
+        progress.finish()
+        assert [s["done"] for s in snapshots] == [0, 3]
+        assert snapshots[-1]["finished"]
+
+    def test_listeners_have_their_own_interval(self):
+        clock = Clock()
+        progress = Progress(clock)
+        fast, slow = [], []
+        progress.add_listener(fast.append, 0.5)
+        progress.add_listener(slow.append, 10.0)
+        progress.start(100)
+        for _ in range(20):
+            clock.now += 1
+            progress.advance()
+        assert (len(fast), len(slow)) == (21, 3)
+
+    def test_no_eta_before_first_item(self):
+        progress, clock, snapshots = tracked()
+        progress.start(10)
+        assert snapshots[0]["eta_s"] is None
+        assert snapshots[0]["items_per_second"] is None
+
+
+class TestFormat:
+
+    def test_duration(self):
+        assert format_duration(12) == "12s"
+        assert format_duration(137) == "2m 17s"
+        assert format_duration(7260) == "2h 01m"
+
+    def test_progress_line(self):
+        progress, clock, snapshots = tracked()
+        progress.start(300)
+        assert format_progress(snapshots[-1]) == "0/300"
+        clock.now += 6
+        progress.advance(12, tokens=210)
+        assert format_progress(snapshots[-1]) == "12/300 - 2.0/s - 35 tokens/s - ETA 2m 24s"
+        progress.finish()
+        assert "ETA" not in format_progress(snapshots[-1])
@@ -0,0 +1,153 @@
+"""
+Test suite for the LocalWriter response cache.
+Tests pythonpath/response_cache.py directly — no UNO dependencies required.
+
+Run: pytest test_response_cache.py -v
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
+
+from llm import build_api_request, make_ssl_context
+from batch import collect_response
+from response_cache import ResponseCache, stream_with_cache
+from test_llm import SSEHandler, COMPLETIONS_CHUNKS, start_mock_server
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+
+def make_request(prompt="Hello", model="llama2", max_tokens=70):
+    return build_api_request(prompt, endpoint="http://localhost:11434",
+                             model=model, max_tokens=max_tokens)
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — ResponseCache
+# ---------------------------------------------------------------------------
+
+class TestResponseCache:
+
+    def test_key_depends_on_body_and_url(self):
+        key = ResponseCache.key_for(make_request())
+        assert key == ResponseCache.key_for(make_request())
+        assert key != ResponseCache.key_for(make_request(prompt="Bye"))
+        assert key != ResponseCache.key_for(make_request(model="gemma3"))
+        assert key != ResponseCache.key_for(make_request(max_tokens=10))
+        other_url = build_api_request("Hello", endpoint="http://localhost:1234",
+                                      model="llama2")
+        assert key != ResponseCache.key_for(other_url)
+
+    def test_miss_then_hit(self, cache_dir):
+        cache = ResponseCache(cache_dir)
+        assert cache.get("abc") is None
+        cache.put("abc", "Once upon a time")
+        assert cache.get("abc") == "Once upon a time"
+
+    def test_persists_across_instances(self, cache_dir):
+        ResponseCache(cache_dir).put("abc", "text")
+        assert ResponseCache(cache_dir).get("abc") == "text"
+
+    def test_ttl_expiry(self, cache_dir):
+        clock = FakeClock()
+        cache = ResponseCache(cache_dir, ttl=60, clock=clock)
+        cache.put("abc", "text")
+        clock.now = os.stat(os.path.join(cache_dir, "abc.txt")).st_mtime + 61
+        assert cache.get("abc") is None
+        assert not os.path.exists(os.path.join(cache_dir, "abc.txt"))
+
+    def test_lru_eviction(self, cache_dir):
+        cache = ResponseCache(cache_dir, max_bytes=10)
+        cache.put("a", "1234")
+        cache.put("b", "1234")
+        cache.get("a")  # "b" is now least recently used
+        cache.put("c", "1234")
+        assert cache.get("b") is None
+        assert cache.get("a") == "1234"
+        assert cache.get("c") == "1234"
+
+    def test_clear(self, cache_dir):
+        cache = ResponseCache(cache_dir)
+        cache.put("a", "x")
+        cache.clear()
+        assert cache.get("a") is None
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — stream_with_cache
+# ---------------------------------------------------------------------------
+
+class TestStreamWithCache:
+
+    def test_replays_cached_text(self, cache_dir):
+        cache = ResponseCache(cache_dir)
+        request = make_request()
+        calls = []
+
+        def stream(callback):
+            calls.append(1)
+            callback("Once ")
+            callback("upon")
+            return True
+
+        first, second = [], []
+        assert stream_with_cache(cache, request, first.append, stream)
+        assert stream_with_cache(cache, request, second.append, stream)
+        assert first == ["Once ", "upon"]
+        assert second == ["Once upon"]
+        assert len(calls) == 1
+
+    def test_failed_stream_not_cached(self, cache_dir):
+        cache = ResponseCache(cache_dir)
+        request = make_request()
+
+        def stream(callback):
+            callback("ERROR: HTTP Error 503")
+            return False
+
+        stream_with_cache(cache, request, lambda c: None, stream)
+        assert cache.get(ResponseCache.key_for(request)) is None
+
+    def test_no_cache(self):
+        out = []
+        assert stream_with_cache(None, make_request(), out.append,
+                                 lambda callback: callback("x") or True)
+        assert out == ["x"]
+
+
+# ---------------------------------------------------------------------------
+# Integration Tests — cached requests against the mock server
+# ---------------------------------------------------------------------------
+
+class TestCachedRequests:
+
+    def test_second_request_skips_backend(self, cache_dir):
+        class Handler(SSEHandler):
+            chunks = list(COMPLETIONS_CHUNKS)
+            captured_requests = []
+
+        server, port = start_mock_server(Handler)
+        try:
+            cache = ResponseCache(cache_dir)
+            request = build_api_request("N/A", endpoint=f"http://127.0.0.1:{port}")
+            ssl_ctx = make_ssl_context()
+            first = collect_response(request, "completions", ssl_ctx, cache=cache)
+            second = collect_response(request, "completions", ssl_ctx, cache=cache)
+            assert first == second == "Once upon a time"
+            assert len(Handler.captured_requests) == 1
+        finally:
+            server.shutdown()
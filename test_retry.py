@@ -0,0 +1,308 @@
+"""
+Test suite for LocalWriter request retries.
+Tests pythonpath/retry.py directly — no UNO dependencies required.
+
+Run: pytest test_retry.py -v
+"""
+
+import os
+import ssl
+import sys
+import threading
+import time
+import urllib.error
+from email.message import Message
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
+
+from llm import build_api_request, make_ssl_context, CancelToken
+from balancer import EndpointBalancer
+from batch import collect_response
+from metrics import RequestMetrics
+from retry import (RetryPolicy, Throttle, is_rate_limited, parse_duration, retry_after,
+                   stream_with_retry)
+from test_llm import SSEHandler, COMPLETIONS_CHUNKS, FakeClock, start_mock_server
+
+
+class FlakyHandler(SSEHandler):
+    """Answers the first `failures` requests with `status` and `headers`, then streams."""
+    chunks = list(COMPLETIONS_CHUNKS)
+    failures = 0
+    status = 503
+    headers_to_send = {}
+
+    def do_POST(self):
+        cls = self.__class__
+        if cls.failures > 0:
+            cls.failures -= 1
+            content_length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(content_length)
+            cls.captured_requests.append(None)
+            self.send_response(cls.status)
+            for name, value in cls.headers_to_send.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            self.wfile.write(b"Try again")
+            return
+        super().do_POST()
+
+
+def serve_flaky(failures, status=503, headers=None):
+    class Handler(FlakyHandler):
+        captured_requests = []
+    Handler.failures = failures
+    Handler.status = status
+    Handler.headers_to_send = dict(headers or {})
+    server, port = start_mock_server(Handler, ThreadingHTTPServer)
+    return server, Handler, f"http://127.0.0.1:{port}"
+
+
+def fast_policy(**kwargs):
+    kwargs.setdefault("base_delay", 0.01)
+    kwargs.setdefault("random", lambda: 0.0)
+    return RetryPolicy(**kwargs)
+
+
+def stream(policy, endpoint, **kwargs):
+    request = build_api_request("Hello", endpoint=endpoint)
+    accumulated = []
+    result = stream_with_retry(policy, request, "completions", make_ssl_context(),
+                               accumulated.append, **kwargs)
+    return result, "".join(accumulated)
+
+
+def http_error(code, headers=None):
+    message = Message()
+    for name, value in (headers or {}).items():
+        message[name] = value
+    return urllib.error.HTTPError("http://a", code, "error", message, None)
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — header parsing
+# ---------------------------------------------------------------------------
+
+class TestParseDuration:
+
+    def test_seconds(self):
+        assert parse_duration("20") == 20.0
+        assert parse_duration("1.5") == 1.5
+
+    def test_go_style(self):
+        assert parse_duration("6m0s") == 360.0
+        assert parse_duration("1h2m3s") == 3723.0
+        assert abs(parse_duration("59ms") - 0.059) < 1e-9
+        assert parse_duration("1.5s") == 1.5
+
+    def test_unreadable(self):
+        assert parse_duration("soon") is None
+        assert parse_duration("5 minutes") is None
+
+
+class TestRetryAfter:
+
+    def test_seconds(self):
+        assert retry_after({"Retry-After": "7"}) == 7.0
+
+    def test_http_date(self):
+        headers = {"Retry-After": "Wed, 21 Oct 2015 07:28:10 GMT"}
+        assert retry_after(headers, now=1445412480.0) == 10.0
+
+    def test_milliseconds(self):
+        assert retry_after({"retry-after-ms": "250"}) == 0.25
+
+    def test_openai_reset_headers(self):
+        headers = {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "2s",
+                   "x-ratelimit-remaining-tokens": "1500", "x-ratelimit-reset-tokens": "9s"}
+        assert retry_after(headers) == 2.0
+
+    def test_reset_timestamp(self):
+        assert retry_after({"x-ratelimit-reset": "1700000030"}, now=1700000000.0) == 30.0
+
+    def test_no_hint(self):
+        assert retry_after({}) is None
+        assert retry_after(None) is None
+        assert retry_after({"x-ratelimit-remaining-requests": "10",
+                            "x-ratelimit-reset-requests": "2s"}) is None
+
+    def test_is_rate_limited(self):
+        assert is_rate_limited(http_error(429))
+        assert is_rate_limited(http_error(503, {"Retry-After": "3"}))
+        assert not is_rate_limited(http_error(503))
+        assert not is_rate_limited(ConnectionResetError())
+
+
+# ---------------------------------------------------------------------------
+# Unit Tests — RetryPolicy / Throttle
+# ---------------------------------------------------------------------------
+
+class TestRetryPolicy:
+
+    def test_exponential_backoff_with_jitter(self):
+        policy = RetryPolicy(max_retries=5, base_delay=1.0, max_delay=30.0, random=lambda: 1.0)
+        assert [policy.delay(n, http_error(503)) for n in range(5)] == [1, 2, 4, 8, 16]
+        policy.random = lambda: 0.0
+        assert policy.delay(2, http_error(503)) == 2.0
+
+    def test_capped_at_max_delay(self):
+        policy = RetryPolicy(max_retries=20, base_delay=1.0, max_delay=30.0, random=lambda: 1.0)
+        assert policy.delay(10, http_error(503)) == 30.0
+
+    def test_gives_up_after_max_retries(self):
+        policy = RetryPolicy(max_retries=2)
+        assert policy.delay(1, http_error(503)) is not None
+        assert policy.delay(2, http_error(503)) is None
+
+    def test_client_errors_not_retried(self):
+        assert RetryPolicy().delay(0, http_error(400)) is None
+        assert RetryPolicy().delay(0, ValueError("bad")) is None
+
+    def test_honours_retry_after(self):
+        policy = RetryPolicy(base_delay=1.0, random=lambda: 0.5)
+        assert policy.delay(0, http_error(429, {"Retry-After": "12"})) == 12.5
+
+    def test_too_long_retry_after_gives_up(self):
+        policy = RetryPolicy(max_wait=60)
+        assert policy.delay(0, http_error(429, {"Retry-After": "3600"})) is None
+
+
+class TestThrottle:
+
+    def test_pause_extends_only(self):
+        clock = FakeClock()
+        throttle = Throttle(clock)
+        throttle.pause(10)
+        throttle.pause(5)
+        assert throttle.remaining() == 10
+        clock.now += 4
+        assert throttle.remaining() == 6
+
+    def test_wait_blocks_until_resumed(self):
+        throttle = Throttle()
+        throttle.pause(0.1)
+        started = time.monotonic()
+        assert throttle.wait()
+        assert time.monotonic() - started >= 0.09
+
+    def test_wait_returns_on_cancel(self):
+        throttle = Throttle()
+        throttle.pause(5)
+        token = CancelToken()
+        threading.Timer(0.05, token.cancel).start()
+        started = time.monotonic()
+        assert not throttle.wait(token)
+        assert time.monotonic() - started < 1
+
+
+# ---------------------------------------------------------------------------
+# Integration Tests — stream_with_retry
+# ---------------------------------------------------------------------------
+
+class TestStreamWithRetry:
+
+    def test_retries_server_error(self):
+        server, handler, endpoint = serve_flaky(2)
+        try:
+            metrics = RequestMetrics()
+            result, text = stream(fast_policy(), endpoint, metrics=metrics)
+            assert result is True
+            assert text == "Once upon a time"
+            assert len(handler.captured_requests) == 3
+            assert metrics.retries == 2
+            assert metrics.outcome == "ok"
+        finally:
+            server.shutdown()
+
+    def test_gives_up_with_error_text(self):
+        server, handler, endpoint = serve_flaky(5)
+        try:
+            result, text = stream(fast_policy(max_retries=2), endpoint)
+            assert result is False
+            assert text.startswith("ERROR:")
+            assert text.count("ERROR:") == 1
+            assert len(handler.captured_requests) == 3
+        finally:
+            server.shutdown()
+
+    def test_on_error_instead_of_text(self):
+        server, handler, endpoint = serve_flaky(5)
+        try:
+            errors = []
+            result, text = stream(fast_policy(max_retries=1), endpoint, on_error=errors.append)
+            assert text == ""
+            assert errors[0].code == 503
+        finally:
+            server.shutdown()
+
+    def test_client_error_not_retried(self):
+        server, handler, endpoint = serve_flaky(1, status=400)
+        try:
+            result, text = stream(fast_policy(), endpoint)
+            assert text.startswith("ERROR:")
+            assert len(handler.captured_requests) == 1
+        finally:
+            server.shutdown()
+
+    def test_certificate_error_not_retried(self):
+        calls = []
+
+        def fail(request, api_type, ssl_context, append_callback, on_error=None, **kwargs):
+            calls.append(request)
+            on_error(ssl.SSLCertVerificationError("certificate verify failed"))
+            return False
+
+        errors = []
+        result = stream_with_retry(fast_policy(), "request", "completions", None,
+                                   lambda text: None, stream=fail, on_error=errors.append)
+        assert result is False
+        assert len(calls) == 1
+        assert isinstance(errors[0], ssl.SSLCertVerificationError)
+
+    def test_rate_limit_pauses_shared_throttle(self):
+        server, handler, endpoint = serve_flaky(1, status=429, headers={"Retry-After": "0.2"})
+        try:
+            throttle = Throttle()
+            started = time.monotonic()
+            result, text = stream(fast_policy(throttle=throttle), endpoint)
+            assert text == "Once upon a time"
+            assert time.monotonic() - started >= 0.19
+        finally:
+            server.shutdown()
+
+    def test_paused_throttle_holds_other_requests(self):
+        server, handler, endpoint = serve_flaky(0)
+        try:
+            throttle = Throttle()
+            throttle.pause(0.2)
+            started = time.monotonic()
+            assert stream(fast_policy(throttle=throttle), endpoint)[1] == "Once upon a time"
+            assert time.monotonic() - started >= 0.19
+        finally:
+            server.shutdown()
+
+    def test_cancel_during_backoff(self):
+        server, handler, endpoint = serve_flaky(5)
+        try:
+            token = CancelToken()
+            threading.Timer(0.1, token.cancel).start()
+            started = time.monotonic()
+            result, text = stream(RetryPolicy(base_delay=10, random=lambda: 0.0), endpoint,
+                                  cancel=token)
+            assert result is False
+            assert text == ""
+            assert time.monotonic() - started < 2
+        finally:
+            server.shutdown()
+
+    def test_collect_response_with_retry_and_balancer(self):
+        server, handler, endpoint = serve_flaky(1)
+        try:
+            balancer = EndpointBalancer(["http://127.0.0.1:1", endpoint])
+            request = build_api_request("Hello", endpoint=endpoint)
+            text = collect_response(request, "completions", make_ssl_context(),
+                                    balancer=balancer, retry=fast_policy())
+            assert text == "Once upon a time"
+        finally:
+            server.shutdown()
@@ -0,0 +1,124 @@
+"""
+Test suite for LocalWriter token estimates.
+Tests pythonpath/tokens.py directly — no UNO dependencies required.
+
+Run: pytest test_tokens.py -v
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "pythonpath"))
+
+from tokens import TokenCalibration, TokenEstimator, estimate_tokens
+
+
+class TestEstimateTokens:
+
+    def test_four_bytes_per_token(self):
+        assert estimate_tokens("abcdefgh") == 2
+
+    def test_rounds_up(self):
+        assert estimate_tokens("abcde") == 2
+
+    def test_empty(self):
+        assert estimate_tokens("") == 0
+
+    def test_multibyte_text_counts_more(self):
+        assert estimate_tokens("日本語のテキスト") > estimate_tokens("abcdefgh")
+
+    def test_well_below_character_count(self):
+        text = "The quick brown fox jumps over the lazy dog. " * 20
+        assert estimate_tokens(text) < len(text) / 3
+
+
+class TestTokenEstimator:
+
+    def test_budget_adds_margin_and_extra(self):
+        estimator = TokenEstimator()
+        assert estimator.budget("x" * 400) == 125
+        assert estimator.budget("x" * 400, extra=10) == 135
+
+    def test_budget_ignores_negative_extra(self):
+        assert TokenEstimator().budget("x" * 400, extra=-50) == 125
+
+    def test_observe_moves_towards_measured_ratio(self):
+        estimator = TokenEstimator()
+        assert estimator.observe("x" * 600, 300)  # 2 bytes per token
+        assert estimator.bytes_per_token == 3.0
+        for _ in range(50):
+            estimator.observe("x" * 600, 300)
+        assert abs(estimator.bytes_per_token - 2.0) < 0.05
+
+    def test_short_responses_ignored(self):
+        estimator = TokenEstimator()
+        assert not estimator.observe("Hi", 1)
+        assert estimator.bytes_per_token == 4.0
+
+    def test_missing_usage_ignored(self):
+        estimator = TokenEstimator()
+        assert not estimator.observe("x" * 600, 0)
+        assert not estimator.observe("x" * 600, None)
+
+    def test_implausible_ratio_clamped(self):
+        estimator = TokenEstimator()
+        estimator.observe("x" * 1000, 1)
+        assert estimator.bytes_per_token <= 16.0
+
+    def test_subclass_plugs_in_exact_counter(self):
+        class WordEstimator(TokenEstimator):
+            def count(self, text):
+                return len(text.split())
+
+        assert WordEstimator().budget("one two three four", margin=1.0) == 4
+
+
+class TestTokenCalibration:
+
+    def test_per_model(self):
+        calibration = TokenCalibration()
+        calibration.observe("small", "x" * 600, 300)
+        assert calibration.estimator("small").bytes_per_token == 3.0
+        assert calibration.estimator("other").bytes_per_token == 4.0
+
+    def test_saved_and_reloaded(self, tmp_path):
+        path = str(tmp_path / "token_calibration.json")
+        TokenCalibration(path).observe("llama", "x" * 600, 300)
+        with open(path) as f:
+            assert json.load(f)["llama"] == {"bytes_per_token": 3.0, "samples": 1}
+        reloaded = TokenCalibration(path).estimator("llama")
+        assert reloaded.bytes_per_token == 3.0
+        assert reloaded.samples == 1
+
+    def test_saves_are_rate_limited(self, tmp_path):
+        path = str(tmp_path / "token_calibration.json")
+        now = [0.0]
+        calibration = TokenCalibration(path, save_interval=30.0, clock=lambda: now[0])
+        calibration.observe("llama", "x" * 600, 300)
+        calibration.observe("llama", "x" * 600, 150)
+        with open(path) as f:
+            assert json.load(f)["llama"]["samples"] == 1
+        calibration.save()
+        with open(path) as f:
+            assert json.load(f)["llama"]["samples"] == 2
+        now[0] = 31.0
+        calibration.observe("llama", "x" * 600, 300)
+        with open(path) as f:
+            assert json.load(f)["llama"]["samples"] == 3
+
+    def test_creates_missing_directory(self, tmp_path):
+        path = str(tmp_path / "missing" / "token_calibration.json")
+        TokenCalibration(path).observe("llama", "x" * 600, 300)
+        assert TokenCalibration(path).estimator("llama").samples == 1
+
+    def test_corrupt_entry_uses_default(self, tmp_path):
+        path = tmp_path / "token_calibration.json"
+        path.write_text(json.dumps({"llama": {"bytes_per_token": "lots"}}))
+        assert TokenCalibration(str(path)).estimator("llama").bytes_per_token == 4.0
+
+    def test_set_estimator(self):
+        calibration = TokenCalibration()
+        custom = TokenEstimator(2.5)
+        calibration.set_estimator("m", custom)
+        assert calibration.estimator("m") is custom
@@ -0,0 +1,38 @@
+# Startup job (Jobs.xcu) that warms up the model when warm_up_on_start is set.
+# It is kept apart from main.py so that LibreOffice, which runs it at every
+# start, only loads the request pipeline when the setting is on.
+import os
+
+import uno
+import unohelper
+from com.sun.star.task import XJob
+
+from config_store import as_bool, get_store
+
+
+class WarmUpJob(unohelper.Base, XJob):
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    def config_path(self):
+        path_settings = self.ctx.getServiceManager().createInstanceWithContext(
+            "com.sun.star.util.PathSettings", self.ctx)
+        user_config_path = getattr(path_settings, "UserConfig")
+        if user_config_path.startswith('file://'):
+            user_config_path = str(uno.fileUrlToSystemPath(user_config_path))
+        return os.path.join(user_config_path, "localwriter.json")
+
+    def execute(self, args):
+        """XJob entry point, run when LibreOffice starts."""
+        if not as_bool(get_store(self.config_path()).get("warm_up_on_start", False)):
+            return
+        job = self.ctx.getServiceManager().createInstanceWithContext(
+            "org.extension.sample.do", self.ctx)
+        job.execute(args)
+
+
+g_ImplementationHelper = unohelper.ImplementationHelper()
+g_ImplementationHelper.addImplementation(
+    WarmUpJob,
+    "org.extension.sample.warmup",
+    ("com.sun.star.task.Job",), )